@@ -1,14 +1,146 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from django.db.models import Count
 from .models import (
     Branch, CustomerCategory, ServiceType, TransactionType,TransactionRange, 
     InstrumentType, GeographicalLocation, ChannelUsed,
-    CustomerData, TransactionData, DataUploadLog,TotalUser, TotalTransaction
+    CustomerData, TransactionData, DataUploadLog,TotalUser, TotalTransaction,
+    FiscalCalendar, ArchivedMonth, MonthSnapshot, DataAnomaly,
+    ReconciliationMismatch
 )
+from .events import notify_data_changed
+from .fiscal import calendar_month
+from django.contrib.admin.views.main import ChangeList
+from .paginators import EstimatedCountPaginator, mark_unfiltered_listing
+from .snapshots import copy_rows, current_snapshot, data_type_for, new_snapshot, publish, rollback
+from datetime import datetime, timedelta
 import nepali_datetime
+
+
+class FactChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if not (self.has_active_filters or self.query):
+            # Lets EstimatedCountPaginator count from the snapshot row counts
+            mark_unfiltered_listing(queryset)
+        return queryset
+
+
+class FactTableAdmin(admin.ModelAdmin):
+    """Changelist settings for the large monthly fact tables"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Field compared exactly with search terms that are not a month, in place
+    # of search_fields' lookups (whose '=' is a case-insensitive comparison
+    # that no plain index can serve)
+    exact_search_field = None
+
+    def get_changelist(self, request, **kwargs):
+        return FactChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        # Searching a month ('YYYY-MM') filters on the indexed month_year
+        # range instead of casting every date to text
+        for fmt in ('%Y-%m', '%Y-%m-%d'):
+            try:
+                month = datetime.strptime(term, fmt).date().replace(day=1)
+            except ValueError:
+                continue
+            next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+            return queryset.filter(month_year__gte=month, month_year__lt=next_month), False
+        if term and self.exact_search_field:
+            return queryset.filter(**{self.exact_search_field: term}), False
+        return super().get_search_results(request, queryset, search_term)
+
+    # Uploaded versions are never modified. The first admin edit of a month
+    # publishes a copy of its current rows as a new admin_edits version;
+    # later edits change that version's rows in place while it is both
+    # current and the month's latest, so each edit costs a few rows rather
+    # than a whole month. A version restored by a rollback gets a new copy.
+
+    def _edit_month(self, month_year, exclude=(), add=None):
+        data_type = data_type_for(self.model)
+        month = month_year.replace(day=1)
+        current = current_snapshot(data_type, month)
+        if current is not None and current.admin_edits and not MonthSnapshot.objects.filter(
+            data_type=data_type, month_year=month, version__gt=current.version
+        ).exists():
+            snapshot = current
+            rows = self.model.all_versions.filter(snapshot=snapshot)
+            removed = rows.filter(pk__in=exclude).delete()[0]
+            key = add is not None and self._key_of(add)
+            if key:
+                # An added row replaces the row with the same key
+                removed += rows.filter(**key).delete()[0]
+            row_count = snapshot.row_count - removed
+        else:
+            snapshot = new_snapshot(data_type, month, admin_edits=True)
+            row_count = 0
+        if add is not None:
+            add.pk = None
+            add.snapshot = snapshot
+            add.month_year = month
+            add.save()
+            row_count += 1
+        if snapshot is not current and current is not None:
+            # Copied after the added row, which takes the place of a copied row with the same key
+            row_count += copy_rows(current, snapshot, exclude)
+        publish(snapshot, row_count)
+        notify_data_changed(snapshot)
+
+    def _key_of(self, obj):
+        """Lookups for the rows sharing obj's unique key within its version"""
+        key = {}
+        for fields in self.model._meta.unique_together:
+            for name in fields:
+                if name != 'snapshot':
+                    field = self.model._meta.get_field(name)
+                    key[field.attname] = getattr(obj, field.attname)
+        return key
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if not change:
+                self._edit_month(obj.month_year, add=obj)
+                return
+            old_month = self.model.all_versions.values_list('month_year', flat=True).get(pk=obj.pk)
+            if old_month.replace(day=1) != obj.month_year.replace(day=1):
+                self._edit_month(old_month, exclude=[obj.pk])
+                self._edit_month(obj.month_year, add=obj)
+            else:
+                self._edit_month(obj.month_year, exclude=[obj.pk], add=obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            self._edit_month(obj.month_year, exclude=[obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        months = {}
+        for pk, month_year in queryset.values_list('pk', 'month_year'):
+            months.setdefault(month_year.replace(day=1), []).append(pk)
+        with transaction.atomic():
+            for month, pks in months.items():
+                self._edit_month(month, exclude=pks)
+
+
+class FiscalPeriodAdmin(FactTableAdmin):
+    """Fills fiscal_year/fiscal_quarter from the fiscal calendar on save"""
+    readonly_fields = ['fiscal_year', 'fiscal_quarter']
+    # Uses the fiscal_year, fiscal_quarter, month_year index
+    exact_search_field = 'fiscal_year'
+
+    def save_model(self, request, obj, form, change):
+        fiscal_month = calendar_month(obj.month_year)
+        obj.fiscal_year = fiscal_month.fiscal_year
+        obj.fiscal_quarter = fiscal_month.fiscal_quarter
+        super().save_model(request, obj, form, change)
+
+
 @admin.register(Branch)
 class BranchAdmin(admin.ModelAdmin):
     list_display = ['branch_code', 'branch_name']
-    search_fields = ['branch_code', 'branch_name']
+    search_fields = ['^branch_code', '^branch_name']
 
 @admin.register(CustomerCategory)
 class CustomerCategoryAdmin(admin.ModelAdmin):
@@ -45,37 +177,141 @@ class ChannelUsedAdmin(admin.ModelAdmin):
     search_fields = ['channel_name']
 
 @admin.register(CustomerData)
-class CustomerDataAdmin(admin.ModelAdmin):
+class CustomerDataAdmin(FactTableAdmin):
     list_display = ['branch_code', 'customer_category', 'service_type', 'status', 'number_of_customers', 'month_year']
     list_filter = ['status', 'month_year', 'customer_category', 'service_type']
-    search_fields = ['branch_code__branch_code', 'branch_code__branch_name']
-    date_hierarchy = 'month_year'
+    list_select_related = ['branch_code', 'customer_category', 'service_type']
+    search_fields = ['^branch_code__branch_code', '^branch_code__branch_name']
+    autocomplete_fields = ['branch_code', 'customer_category', 'service_type']
 
 @admin.register(TransactionData)
-class TransactionDataAdmin(admin.ModelAdmin):
+class TransactionDataAdmin(FactTableAdmin):
     list_display = ['range_of_transactions', 'form_of_instrument', 'type_of_transaction', 'number_of_transactions', 'amount', 'month_year']
     list_filter = ['month_year', 'form_of_instrument', 'type_of_transaction', 'geographical_location', 'channel_used']
-    search_fields = ['range_of_transactions']
-    date_hierarchy = 'month_year'
+    list_select_related = ['form_of_instrument', 'type_of_transaction']
+    search_fields = ['^range_of_transactions']
+    autocomplete_fields = ['form_of_instrument', 'type_of_transaction', 'geographical_location', 'channel_used']
+
+class DataAnomalyInline(admin.TabularInline):
+    model = DataAnomaly
+    fields = ['series', 'measure', 'value', 'expected', 'score']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    ordering = ['-score']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class ReconciliationMismatchInline(admin.TabularInline):
+    model = ReconciliationMismatch
+    fields = ['dimensions', 'measure', 'expected', 'actual', 'difference']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    ordering = ['dimensions', 'measure']
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(DataUploadLog)
 class DataUploadLogAdmin(admin.ModelAdmin):
-    list_display = ['upload_date', 'month_year', 'data_type', 'file_name', 'records_uploaded', 'status']
+    list_display = ['upload_date', 'month_year', 'data_type', 'file_name', 'records_uploaded', 'status', 'anomaly_count', 'mismatch_count']
     list_filter = ['status', 'data_type', 'month_year']
     search_fields = ['file_name']
     date_hierarchy = 'upload_date'
     readonly_fields = ['upload_date']
+    inlines = [DataAnomalyInline, ReconciliationMismatchInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            anomaly_total=Count('anomalies', distinct=True),
+            mismatch_total=Count('mismatches', distinct=True),
+        )
+
+    @admin.display(description='Anomalies', ordering='anomaly_total')
+    def anomaly_count(self, obj):
+        return obj.anomaly_total
+
+    @admin.display(description='Mismatches', ordering='mismatch_total')
+    def mismatch_count(self, obj):
+        return obj.mismatch_total
+
+@admin.register(DataAnomaly)
+class DataAnomalyAdmin(admin.ModelAdmin):
+    list_display = ['month_year', 'data_type', 'series', 'measure', 'value', 'expected', 'score', 'upload_log']
+    list_filter = ['data_type', 'measure', 'month_year']
+    search_fields = ['series']
+    list_select_related = ['upload_log']
+
+@admin.register(ReconciliationMismatch)
+class ReconciliationMismatchAdmin(admin.ModelAdmin):
+    list_display = ['month_year', 'data_type', 'dimensions', 'measure', 'expected', 'actual', 'difference', 'upload_log']
+    list_filter = ['data_type', 'measure', 'month_year']
+    search_fields = ['dimensions']
+    list_select_related = ['upload_log']
 
 @admin.register(TotalUser)
-class TotalUserAdmin(admin.ModelAdmin):
-    list_display = ['id','fiscal_year','month_year', 'service_type', 'status', 'count', 'created_at', 'updated_at']
+class TotalUserAdmin(FiscalPeriodAdmin):
+    list_display = ['id','fiscal_year','fiscal_quarter','month_year', 'service_type', 'status', 'count', 'created_at', 'updated_at']
     list_filter = ['month_year']
-    search_fields = ['month_year']
-    date_hierarchy = 'month_year'
+    list_select_related = ['service_type']
+    search_fields = ['=fiscal_year']
+    autocomplete_fields = ['service_type']
 
 @admin.register(TotalTransaction)
-class TotalTransactionAdmin(admin.ModelAdmin):
-    list_display = ['id','fiscal_year', 'month_year', 'transaction_range', 'type_of_transaction','form_of_instrument', 'geographical_location', 'channel_used', 'number_of_transactions','amount', 'created_at', 'updated_at']
+class TotalTransactionAdmin(FiscalPeriodAdmin):
+    list_display = ['id','fiscal_year', 'fiscal_quarter', 'month_year', 'transaction_range', 'type_of_transaction','form_of_instrument', 'geographical_location', 'channel_used', 'number_of_transactions','amount', 'created_at', 'updated_at']
     list_filter = ['month_year']
-    search_fields = ['month_year']
-    date_hierarchy = 'month_year'
+    list_select_related = ['transaction_range', 'type_of_transaction', 'form_of_instrument', 'geographical_location', 'channel_used']
+    search_fields = ['=fiscal_year']
+    autocomplete_fields = ['transaction_range', 'type_of_transaction', 'form_of_instrument', 'geographical_location', 'channel_used']
+
+@admin.register(FiscalCalendar)
+class FiscalCalendarAdmin(admin.ModelAdmin):
+    list_display = ['month_year', 'fiscal_year', 'fiscal_quarter', 'fiscal_month', 'nepali_year', 'nepali_month_name']
+    list_filter = ['fiscal_quarter']
+    search_fields = ['=fiscal_year']
+
+@admin.register(MonthSnapshot)
+class MonthSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['data_type', 'month_year', 'version', 'is_current', 'row_count', 'upload_log', 'created_at']
+    list_filter = ['data_type', 'month_year']
+    list_select_related = ['current', 'upload_log']
+    readonly_fields = ['data_type', 'month_year', 'version', 'upload_log', 'derived_from', 'admin_edits', 'row_count', 'created_at']
+    actions = ['make_current', 'roll_back_month']
+
+    @admin.display(boolean=True, description='Current')
+    def is_current(self, obj):
+        return hasattr(obj, 'current')
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Make the selected version current')
+    def make_current(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one version.', messages.ERROR)
+            return
+        snapshot = queryset.get()
+        publish(snapshot)
+        notify_data_changed(snapshot)
+        self.message_user(request, f"{snapshot} is now current.")
+
+    @admin.action(description="Roll the selected versions' months back to their previous version")
+    def roll_back_month(self, request, queryset):
+        for data_type, month_year in set(queryset.values_list('data_type', 'month_year')):
+            try:
+                snapshots = rollback(data_type, month_year)
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+                continue
+            for snapshot in snapshots:
+                notify_data_changed(snapshot)
+            self.message_user(request, f"Rolled back to {' and '.join(str(snapshot) for snapshot in snapshots)}.")
+
+@admin.register(ArchivedMonth)
+class ArchivedMonthAdmin(admin.ModelAdmin):
+    list_display = ['data_type', 'month_year', 'row_count', 'file_name', 'archived_at']
+    list_filter = ['data_type']
+    readonly_fields = ['data_type', 'month_year', 'file_name', 'checksum', 'row_count', 'archived_at']
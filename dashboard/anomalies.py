@@ -0,0 +1,162 @@
+"""Post-ingest anomaly detection on uploaded months
+
+A month's values are compared with the trailing ANOMALY_HISTORY_MONTHS of
+the same series (one series per combination of dimension columns). All
+series are scored together: one query pivots the history to a series x
+month matrix per measure and returns it as a single float8 buffer, which
+NumPy reads without converting each value, and a robust z-score (distance
+from the history median in units of scaled MAD) is computed for every
+series in one vectorized pass.
+"""
+from datetime import date
+
+import numpy as np
+from django.db import connections, router, transaction
+
+from .models import CurrentSnapshot, CustomerData, DataAnomaly, TransactionData
+
+ANOMALY_HISTORY_MONTHS = 12
+# Series need this many earlier months before they are scored
+ANOMALY_MIN_HISTORY = 3
+ANOMALY_Z_THRESHOLD = 3.5
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+# Lower bound on the scale as a fraction of the median, so flat series do not
+# flag every small change. The scale is also at least sqrt(median), the
+# natural noise of small counts.
+RELATIVE_SCALE_FLOOR = 0.05
+
+ANOMALY_SPECS = {
+    'CUSTOMER': {
+        'model': CustomerData,
+        'keys': ['branch_code_id', 'customer_category_id', 'service_type_id', 'status'],
+        'measures': ['number_of_customers'],
+    },
+    'TRANSACTION': {
+        'model': TransactionData,
+        'keys': [
+            'range_of_transactions', 'form_of_instrument_id', 'type_of_transaction_id',
+            'geographical_location_id', 'channel_used_id',
+        ],
+        'measures': ['number_of_transactions', 'amount'],
+    },
+}
+
+
+# Groups the history into one row per series with a value this month and
+# packs each measure's month values (NaN where missing) as big-endian
+# float8s; the rows are then aggregated so every key comes back as one
+# array and every measure as one series x month buffer
+HISTORY_SQL = """
+SELECT {key_arrays}, {matrix_buffers}
+FROM (
+    SELECT {keys}, {pivots}
+    FROM {fact_table}
+    WHERE month_year >= %(month_0)s AND month_year < %(month_{months})s
+      AND snapshot_id IN (SELECT snapshot_id FROM {current_table})
+    GROUP BY {keys}
+    HAVING COUNT(*) FILTER (WHERE month_year >= %(month_{current})s) > 0
+) AS series
+"""
+# Enough for the series to be grouped in a hash table instead of an on-disk sort
+ANOMALY_WORK_MEM = '64MB'
+
+
+def _month_index(month_year):
+    return month_year.year * 12 + month_year.month - 1
+
+
+def robust_scores(matrix, min_history=ANOMALY_MIN_HISTORY):
+    """Score the last column of a series x month matrix against the earlier columns
+
+    Missing months are NaN. Returns (scored series indices, expected values, scores).
+    """
+    history, current = matrix[:, :-1], matrix[:, -1]
+    scored = ((~np.isnan(history)).sum(axis=1) >= min_history) & ~np.isnan(current)
+    history, current = history[scored], current[scored]
+
+    median = np.nanmedian(history, axis=1)
+    mad = np.nanmedian(np.abs(history - median[:, None]), axis=1)
+    scale = np.maximum.reduce([
+        MAD_SCALE * mad, RELATIVE_SCALE_FLOOR * np.abs(median), np.sqrt(np.abs(median))
+    ])
+    scale[scale == 0] = 1.0
+    return np.flatnonzero(scored), median, (current - median) / scale
+
+
+def _series_labels(model, key_names, key_rows):
+    """Readable labels for the flagged series' dimension tuples"""
+    names = {}
+    for position, key_name in enumerate(key_names):
+        if key_name.endswith('_id'):
+            related = model._meta.get_field(key_name[:-3]).related_model
+            ids = {row[position] for row in key_rows}
+            names[position] = {pk: str(obj) for pk, obj in related.objects.in_bulk(ids).items()}
+    return [
+        ' / '.join(str(names[position].get(value, value)) if position in names else str(value)
+                   for position, value in enumerate(row))[:255]
+        for row in key_rows
+    ]
+
+
+def detect_anomalies(data_type, month_year, snapshot, upload_log=None):
+    """Flag and store the month's values that deviate from their series' history
+
+    Returns the number of flagged values.
+    """
+    spec = ANOMALY_SPECS[data_type]
+    model, key_names, measures = spec['model'], spec['keys'], spec['measures']
+    month = month_year.replace(day=1)
+    start_index = _month_index(month) - ANOMALY_HISTORY_MONTHS
+
+    months = ANOMALY_HISTORY_MONTHS + 1
+    sql = HISTORY_SQL.format(
+        keys=', '.join(key_names),
+        pivots=', '.join(
+            ' || '.join(
+                f"float8send(COALESCE(SUM({measure}::float8) FILTER ("
+                f"WHERE month_year >= %(month_{index})s AND month_year < %(month_{index + 1})s), 'NaN'))"
+                for index in range(months)
+            ) + f' AS {measure}'
+            for measure in measures
+        ),
+        key_arrays=', '.join(f'ARRAY_AGG({key})' for key in key_names),
+        matrix_buffers=', '.join(f"STRING_AGG({measure}, ''::bytea)" for measure in measures),
+        months=months,
+        current=months - 1,
+        fact_table=model._meta.db_table,
+        current_table=CurrentSnapshot._meta.db_table,
+    )
+    params = {}
+    for index in range(months + 1):
+        month_index = start_index + index
+        params[f'month_{index}'] = date(month_index // 12, month_index % 12 + 1, 1)
+    with transaction.atomic(using=router.db_for_read(model)):
+        with connections[router.db_for_read(model)].cursor() as cursor:
+            cursor.execute('SET LOCAL work_mem = %s', [ANOMALY_WORK_MEM])
+            cursor.execute(sql, params)
+            columns = cursor.fetchone()
+    key_columns, buffers = columns[:len(key_names)], columns[len(key_names):]
+
+    anomalies = []
+    if key_columns[0]:
+        for measure, buffer in zip(measures, buffers):
+            matrix = np.frombuffer(buffer, dtype='>f8').reshape(-1, months)
+            series, expected, scores = robust_scores(matrix)
+            flagged = np.abs(scores) >= ANOMALY_Z_THRESHOLD
+            flagged_series = series[flagged]
+            key_rows = [tuple(column[index] for column in key_columns) for index in flagged_series.tolist()]
+            labels = _series_labels(model, key_names, key_rows)
+            for label, index, expected_value, score in zip(
+                labels, flagged_series, expected[flagged], scores[flagged]
+            ):
+                anomalies.append(DataAnomaly(
+                    data_type=data_type, month_year=month, snapshot=snapshot, upload_log=upload_log,
+                    series=label, measure=measure, value=float(matrix[index, -1]),
+                    expected=float(expected_value), score=round(float(score), 2),
+                ))
+
+    with transaction.atomic():
+        DataAnomaly.objects.filter(snapshot=snapshot).delete()
+        DataAnomaly.objects.bulk_create(anomalies)
+    return len(anomalies)
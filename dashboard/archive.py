@@ -0,0 +1,238 @@
+"""Cold storage of old CustomerData/TransactionData months as compressed column files
+
+Each archived month is one NumPy .npz file under MEDIA_ROOT/archive with
+one array per column, recorded in ArchivedMonth with its SHA-256 and its
+totals per status or transaction type. The chart APIs read archived
+months back through the aggregate helpers below, so callers see the same
+totals whether a month is hot or archived. Unfiltered reads use the
+stored totals; only filtered ones open the files.
+"""
+import hashlib
+import os
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import ArchivedMonth, CustomerData, TransactionData, TransactionType
+from .snapshots import current_snapshot, drop_month
+
+ARCHIVE_DIR = 'archive'
+# Decoded archive files kept in memory per process, for each data type
+ARCHIVE_CACHE_MONTHS = 24
+
+# Archived columns per data type: column name -> (values_list field, dtype).
+# Column names match the lookups used by the chart API filters.
+ARCHIVE_COLUMNS = {
+    'CUSTOMER': {
+        'branch_code_id': ('branch_code_id', np.int64),
+        'customer_category_id': ('customer_category_id', np.int64),
+        'service_type_id': ('service_type_id', np.int64),
+        'status': ('status', np.str_),
+        'number_of_customers': ('number_of_customers', np.int64),
+    },
+    'TRANSACTION': {
+        'range_of_transactions': ('range_of_transactions', np.str_),
+        'form_of_instrument_id': ('form_of_instrument_id', np.int64),
+        'type_of_transaction_id': ('type_of_transaction_id', np.int64),
+        'geographical_location_id': ('geographical_location_id', np.int64),
+        'channel_used_id': ('channel_used_id', np.int64),
+        'number_of_transactions': ('number_of_transactions', np.int64),
+        # Stored as integer paisa so archived amounts stay exact
+        'amount_cents': ('amount', np.int64),
+    },
+}
+ARCHIVE_MODELS = {'CUSTOMER': CustomerData, 'TRANSACTION': TransactionData}
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as archive_file:
+        for chunk in iter(lambda: archive_file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def archive_path(data_type, month_year):
+    return Path(ARCHIVE_DIR) / data_type.lower() / f"{month_year:%Y-%m}.npz"
+
+
+def _control_totals(data_type, columns):
+    """Row count and summed measures used to verify an archive file"""
+    if data_type == 'CUSTOMER':
+        return len(columns['status']), int(columns['number_of_customers'].sum())
+    return len(columns['channel_used_id']), int(columns['number_of_transactions'].sum()), int(columns['amount_cents'].sum())
+
+
+def month_totals(data_type, columns):
+    """Totals of an archived month's columns, as stored in ArchivedMonth.totals
+
+    Customers: {'status': {status: customers}}. Transactions:
+    {'type': {type id: [amount in paisa, count]}}.
+    """
+    if data_type == 'CUSTOMER':
+        statuses, (totals,) = _group_sum(columns['status'], columns['number_of_customers'])
+        return {'status': dict(zip(statuses.tolist(), totals.tolist()))}
+    type_ids, (cents, counts) = _group_sum(
+        columns['type_of_transaction_id'], columns['amount_cents'], columns['number_of_transactions']
+    )
+    return {'type': {str(type_id): [cent, count] for type_id, cent, count in zip(type_ids.tolist(), cents.tolist(), counts.tolist())}}
+
+
+def archive_month(data_type, month_year):
+    """Write a month's current version to an archive file, verify it and remove the month from the hot table
+
+    The file holds every row of the current snapshot, whatever day of the
+    month it is dated, so it covers exactly the visible rows drop_month
+    deletes.
+    """
+    month_year = month_year.replace(day=1)
+    model = ARCHIVE_MODELS[data_type]
+    spec = ARCHIVE_COLUMNS[data_type]
+    snapshot = current_snapshot(data_type, month_year)
+    if snapshot is None:
+        raise ValueError(f"{data_type} {month_year:%Y-%m} has no current version to archive")
+    queryset = model.all_versions.filter(snapshot=snapshot)
+
+    rows = list(queryset.values_list(*(field for field, _ in spec.values())))
+    columns = {}
+    for index, (name, (field, dtype)) in enumerate(spec.items()):
+        values = [row[index] for row in rows]
+        if name == 'amount_cents':
+            values = [int(value * 100) for value in values]
+        columns[name] = np.array(values, dtype=dtype)
+
+    # Check the file against totals computed by the database, not from the same rows
+    if data_type == 'CUSTOMER':
+        expected = (queryset.count(), queryset.aggregate(total=Sum('number_of_customers'))['total'] or 0)
+    else:
+        sums = queryset.aggregate(count=Sum('number_of_transactions'), amount=Sum('amount'))
+        expected = (queryset.count(), sums['count'] or 0, int((sums['amount'] or Decimal('0')) * 100))
+
+    relative_path = archive_path(data_type, month_year)
+    full_path = Path(settings.MEDIA_ROOT) / relative_path
+    full_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = full_path.with_suffix('.tmp.npz')
+    np.savez_compressed(temp_path, **columns)
+
+    with np.load(temp_path) as written:
+        if _control_totals(data_type, written) != expected:
+            temp_path.unlink()
+            raise ValueError(f"Archive verification failed for {data_type} {month_year:%Y-%m}")
+    os.replace(temp_path, full_path)
+    checksum = file_checksum(full_path)
+
+    with transaction.atomic():
+        ArchivedMonth.objects.update_or_create(
+            data_type=data_type,
+            month_year=month_year,
+            defaults={
+                'file_name': str(relative_path), 'checksum': checksum, 'row_count': len(rows),
+                'totals': month_totals(data_type, columns),
+            },
+        )
+        # Older versions of an archived month can no longer be rolled back to
+        drop_month(data_type, month_year)
+    return len(rows)
+
+
+def drop_archive(data_type, month_year):
+    """Forget an archived month, e.g. because it was uploaded again"""
+    for archived in ArchivedMonth.objects.filter(data_type=data_type, month_year=month_year):
+        (Path(settings.MEDIA_ROOT) / archived.file_name).unlink(missing_ok=True)
+        archived.delete()
+
+
+def _read_columns(file_name, checksum):
+    path = Path(settings.MEDIA_ROOT) / file_name
+    if file_checksum(path) != checksum:
+        raise ValueError(f"Archive file {file_name} does not match its checksum")
+    with np.load(path) as archive_file:
+        return {name: archive_file[name] for name in archive_file.files}
+
+
+# One cache per data type, so reading one type's months never evicts the other's
+_column_caches = {
+    data_type: lru_cache(maxsize=ARCHIVE_CACHE_MONTHS)(_read_columns) for data_type in ARCHIVE_COLUMNS
+}
+
+
+def archived_months(data_type, start=None, end=None):
+    months = ArchivedMonth.objects.filter(data_type=data_type).order_by('month_year')
+    if start:
+        months = months.filter(month_year__gte=start)
+    if end:
+        months = months.filter(month_year__lte=end)
+    return months
+
+
+def _filtered_columns(archived, filters):
+    columns = _column_caches[archived.data_type](archived.file_name, archived.checksum)
+    mask = np.ones(archived.row_count, dtype=bool)
+    for column, value in (filters or {}).items():
+        if column not in columns:
+            continue
+        target = columns[column]
+        mask &= target == (value if target.dtype.kind == 'U' else int(value))
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def _group_sum(keys, *measures):
+    """Exact integer sums of each measure per distinct key"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = []
+    for measure in measures:
+        totals = np.zeros(len(unique), dtype=np.int64)
+        np.add.at(totals, inverse, measure)
+        sums.append(totals)
+    return unique, sums
+
+
+def _archived_totals(archived, filters):
+    """An archived month's month_totals(): stored, or computed from its file when filtered"""
+    if archived.totals and not filters:
+        return archived.totals
+    return month_totals(archived.data_type, _filtered_columns(archived, filters))
+
+
+def customer_aggregates(start=None, end=None, filters=None):
+    """Archived customer totals: ({month: customers}, {status: customers})"""
+    by_month, by_status = {}, {}
+    for archived in archived_months('CUSTOMER', start, end):
+        statuses = _archived_totals(archived, filters)['status']
+        if not statuses:
+            continue
+        by_month[archived.month_year] = sum(statuses.values())
+        for status, total in statuses.items():
+            by_status[status] = by_status.get(status, 0) + total
+    return by_month, by_status
+
+
+def transaction_aggregates(start=None, end=None, filters=None):
+    """Archived transaction totals: ({month: (amount, count)}, {type name: (amount, count)})
+
+    Amounts are returned as Decimal.
+    """
+    by_month, by_type_id = {}, {}
+    for archived in archived_months('TRANSACTION', start, end):
+        types = _archived_totals(archived, filters)['type']
+        if not types:
+            continue
+        by_month[archived.month_year] = (
+            Decimal(sum(cents for cents, _ in types.values())) / 100,
+            sum(count for _, count in types.values()),
+        )
+        for type_id, (type_cents, type_count) in types.items():
+            amount, count = by_type_id.get(int(type_id), (0, 0))
+            by_type_id[int(type_id)] = (amount + type_cents, count + type_count)
+
+    names = dict(TransactionType.objects.filter(pk__in=by_type_id).values_list('pk', 'transaction_type_name'))
+    by_type = {}
+    for type_id, (cents, count) in by_type_id.items():
+        amount, total = by_type.get(names.get(type_id), (Decimal('0'), 0))
+        by_type[names.get(type_id)] = (amount + Decimal(cents) / 100, total + count)
+    return by_month, by_type
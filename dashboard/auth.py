@@ -0,0 +1,69 @@
+"""Authentication backend that keeps recently seen users in memory
+
+AuthenticationMiddleware loads request.user through the backend's
+get_user() on every request. CachedModelBackend answers it from a
+per-process cache for USER_CACHE_TTL seconds, permissions included, so a
+warm request makes no auth_user query. A process drops its entry as soon
+as the user is saved or logs out; other processes catch up within the TTL.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+_users = {}
+_users_lock = threading.Lock()
+
+
+def forget_user(user_id=None):
+    """Drop one user, or every user, from this process's cache"""
+    with _users_lock:
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(str(user_id), None)
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        now = time.monotonic()
+        with _users_lock:
+            cached = _users.get(str(user_id))
+        if cached is None or cached[0] <= now:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            # Fill the permission caches once so they are reused with the user
+            self.get_all_permissions(user)
+            cached = (now + settings.USER_CACHE_TTL, user)
+            with _users_lock:
+                _users[str(user_id)] = cached
+        # Each request gets its own copy; the permission caches are shared read-only
+        return copy.copy(cached[1])
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def _forget_saved_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def _forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver(m2m_changed)
+def _forget_on_permission_change(sender, **kwargs):
+    # Group or permission membership changed; cheaper to start over than to work out who
+    User = get_user_model()
+    if sender in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+        forget_user()
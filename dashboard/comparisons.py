@@ -0,0 +1,107 @@
+"""Month-over-month and year-over-year comparisons computed in one SQL pass
+
+Months are compared through RANGE window frames over the month rather
+than plain LAG offsets, so a missing month yields NULL instead of
+silently comparing against an older one.
+"""
+from datetime import date
+
+from django.db import connections, router
+
+from .models import (
+    CurrentSnapshot, ServiceType, InstrumentType, GeographicalLocation, ChannelUsed,
+    TotalUser, TotalTransaction
+)
+
+COMPARISON_SQL = """
+WITH monthly AS (
+    SELECT DATE_TRUNC('month', month_year)::date AS month, {dimension} AS dimension_id, {group_extra}
+           {metric_sums}
+    FROM {fact_table}
+    WHERE month_year >= %(start)s AND month_year < %(end)s
+      AND snapshot_id IN (SELECT snapshot_id FROM {current_table})
+    GROUP BY 1, 2{group_extra_keys}
+), compared AS (
+    SELECT month, dimension_id{extra_select},
+           {metric_windows}
+    FROM monthly
+    WINDOW w AS (PARTITION BY dimension_id{extra_partition} ORDER BY month)
+)
+SELECT d.{label} AS name{extra_select},
+       {metric_columns}
+FROM compared c
+JOIN {dimension_table} d ON d.id = c.dimension_id
+WHERE c.month = %(month)s
+ORDER BY d.{label}{extra_select}
+"""
+
+METRIC_WINDOW = (
+    "{metric}, "
+    "FIRST_VALUE({metric}) OVER (w RANGE BETWEEN INTERVAL '1 month' PRECEDING AND INTERVAL '1 month' PRECEDING) AS {metric}_previous, "
+    "FIRST_VALUE({metric}) OVER (w RANGE BETWEEN INTERVAL '12 months' PRECEDING AND INTERVAL '12 months' PRECEDING) AS {metric}_last_year"
+)
+
+METRIC_COLUMNS = (
+    "c.{metric}, c.{metric}_previous, c.{metric}_last_year, "
+    "ROUND((100.0 * (c.{metric} - c.{metric}_previous) / NULLIF(c.{metric}_previous, 0))::numeric, 2)::float8 AS {metric}_mom_pct, "
+    "ROUND((100.0 * (c.{metric} - c.{metric}_last_year) / NULLIF(c.{metric}_last_year, 0))::numeric, 2)::float8 AS {metric}_yoy_pct"
+)
+
+# Transaction comparison dimensions: name -> (fact column, dimension model, label column)
+TRANSACTION_DIMENSIONS = {
+    'instrument': ('form_of_instrument_id', InstrumentType, 'instrument_type_name'),
+    'channel': ('channel_used_id', ChannelUsed, 'channel_name'),
+    'location': ('geographical_location_id', GeographicalLocation, 'location_name'),
+}
+
+
+def shift_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _compare(fact_model, dimension_column, dimension_model, label, metrics, month_year, extra_key=None, using=None):
+    month = month_year.replace(day=1)
+    using = using or router.db_for_read(fact_model)
+    sql = COMPARISON_SQL.format(
+        dimension=dimension_column,
+        group_extra=f'{extra_key},' if extra_key else '',
+        group_extra_keys=', 3' if extra_key else '',
+        extra_select=f', {extra_key}' if extra_key else '',
+        extra_partition=f', {extra_key}' if extra_key else '',
+        metric_sums=', '.join(f'{expression} AS {metric}' for metric, expression in metrics.items()),
+        metric_windows=', '.join(METRIC_WINDOW.format(metric=metric) for metric in metrics),
+        metric_columns=', '.join(METRIC_COLUMNS.format(metric=metric) for metric in metrics),
+        fact_table=fact_model._meta.db_table,
+        current_table=CurrentSnapshot._meta.db_table,
+        dimension_table=dimension_model._meta.db_table,
+        label=label,
+    )
+    params = {
+        'start': shift_months(month, -12),
+        'end': shift_months(month, 1),
+        'month': month,
+    }
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column.name for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def compare_total_users(month_year, using=None):
+    """Active/inactive users per service type against last month and last fiscal year"""
+    return _compare(
+        TotalUser, 'service_type_id', ServiceType, 'service_name',
+        {'users': 'SUM(count)'}, month_year, extra_key='status', using=using
+    )
+
+
+def compare_total_transactions(month_year, by='instrument', using=None):
+    """Transaction count and amount per instrument, channel or location against
+    last month and last fiscal year"""
+    dimension_column, dimension_model, label = TRANSACTION_DIMENSIONS[by]
+    return _compare(
+        TotalTransaction, dimension_column, dimension_model, label,
+        {'transactions': 'SUM(number_of_transactions)', 'amount': 'SUM(amount)::float8'},
+        month_year, using=using
+    )
@@ -0,0 +1,135 @@
+"""Merging of duplicate master (dimension) rows
+
+Master rows whose names differ only in case or surrounding spaces are
+duplicates. For each master table one temporary id map (duplicate id ->
+lowest id of its group) is built, and every fact table foreign key is
+re-pointed through it with one UPDATE per column. Fact rows that would
+then collide on their unique key are folded into one row first by
+summing their measures, and the row counts of the snapshots they
+belonged to are recomputed. Finally the duplicates are deleted and the
+kept names trimmed, so the case-insensitive unique constraints can be
+added.
+"""
+from django.db import connection, transaction
+
+from .models import (
+    Branch, ChannelUsed, CustomerCategory, CustomerData, GeographicalLocation, InstrumentType, MonthSnapshot,
+    ServiceType, TransactionData, TransactionRange, TransactionType
+)
+
+# Master model -> natural key field, unique ignoring case
+MASTER_KEYS = {
+    Branch: 'branch_code',
+    CustomerCategory: 'category_name',
+    ServiceType: 'service_name',
+    TransactionRange: 'range_name',
+    TransactionType: 'transaction_type_name',
+    InstrumentType: 'instrument_type_name',
+    GeographicalLocation: 'location_name',
+    ChannelUsed: 'channel_name',
+}
+# Fact models whose unique keys include master foreign keys -> measures summed on merge
+FACT_MEASURES = {
+    CustomerData: ['number_of_customers'],
+    TransactionData: ['number_of_transactions', 'amount'],
+}
+
+DEDUPE_MAP_SQL = """
+CREATE TEMPORARY TABLE dedupe_map ON COMMIT DROP AS
+SELECT id AS old_id, canonical_id
+FROM (
+    SELECT id, MIN(id) OVER (PARTITION BY UPPER(TRIM({key}))) AS canonical_id
+    FROM {master_table}
+) grouped
+WHERE id <> canonical_id
+"""
+
+# Sums the measures of rows that will share a unique key into the lowest id and deletes the rest
+FOLD_COLLISIONS_SQL = """
+WITH keyed AS (
+    SELECT f.id, {partition_columns}, {measure_columns}
+    FROM {fact_table} f
+    LEFT JOIN dedupe_map m ON m.old_id = f.{column}
+    WHERE f.{column} IN (SELECT old_id FROM dedupe_map UNION SELECT canonical_id FROM dedupe_map)
+), grouped AS (
+    SELECT id, MIN(id) OVER w AS keep_id, COUNT(*) OVER w AS row_count, {measure_sums}
+    FROM keyed
+    WINDOW w AS (PARTITION BY {partition_names})
+), folded AS (
+    UPDATE {fact_table} f SET {measure_updates}
+    FROM grouped g
+    WHERE f.id = g.id AND g.id = g.keep_id AND g.row_count > 1
+)
+DELETE FROM {fact_table} f
+USING grouped g
+WHERE f.id = g.id AND g.id <> g.keep_id
+RETURNING f.snapshot_id
+"""
+
+# Folded rows are gone from their snapshots, so their counts are taken again
+ROW_COUNT_SQL = """
+UPDATE {snapshot_table} s
+SET row_count = (SELECT COUNT(*) FROM {fact_table} f WHERE f.snapshot_id = s.id)
+WHERE s.id = ANY(%s)
+"""
+
+
+def _fold_collisions(cursor, fact_model, field):
+    """Fold the rows that re-pointing field would make collide; returns their snapshot ids"""
+    unique_fields = next(
+        (fields for fields in fact_model._meta.unique_together if field.name in fields), None
+    )
+    if unique_fields is None:
+        return []
+    columns = [fact_model._meta.get_field(name).column for name in unique_fields]
+    measures = FACT_MEASURES[fact_model]
+    cursor.execute(FOLD_COLLISIONS_SQL.format(
+        fact_table=fact_model._meta.db_table,
+        column=field.column,
+        partition_columns=', '.join(
+            f'COALESCE(m.canonical_id, f.{column}) AS {column}' if column == field.column else f'f.{column}'
+            for column in columns
+        ),
+        partition_names=', '.join(columns),
+        measure_columns=', '.join(f'f.{measure}' for measure in measures),
+        measure_sums=', '.join(f'SUM({measure}) OVER w AS {measure}' for measure in measures),
+        measure_updates=', '.join(f'{measure} = g.{measure}' for measure in measures),
+    ))
+    return [snapshot_id for snapshot_id, in cursor.fetchall()]
+
+
+def dedupe_master(model, dry_run=False):
+    """Merge one master table's duplicates into their lowest id
+
+    Returns {'duplicates': rows removed, 'repointed': fact rows re-pointed,
+    'folded': fact rows summed into another row}.
+    """
+    key = MASTER_KEYS[model]
+    master_table = model._meta.db_table
+    stats = {'duplicates': 0, 'repointed': 0, 'folded': 0}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(DEDUPE_MAP_SQL.format(key=key, master_table=master_table))
+        cursor.execute('SELECT COUNT(*) FROM dedupe_map')
+        stats['duplicates'] = cursor.fetchone()[0]
+        if stats['duplicates'] and not dry_run:
+            for relation in model._meta.related_objects:
+                if not relation.one_to_many:
+                    continue
+                fact_model, field = relation.related_model, relation.field
+                if fact_model in FACT_MEASURES:
+                    snapshot_ids = _fold_collisions(cursor, fact_model, field)
+                    stats['folded'] += len(snapshot_ids)
+                    if snapshot_ids:
+                        cursor.execute(ROW_COUNT_SQL.format(
+                            snapshot_table=MonthSnapshot._meta.db_table, fact_table=fact_model._meta.db_table,
+                        ), [sorted(set(snapshot_ids))])
+                cursor.execute(
+                    f'UPDATE {fact_model._meta.db_table} f SET {field.column} = m.canonical_id '
+                    f'FROM dedupe_map m WHERE f.{field.column} = m.old_id'
+                )
+                stats['repointed'] += cursor.rowcount
+            cursor.execute(f'DELETE FROM {master_table} WHERE id IN (SELECT old_id FROM dedupe_map)')
+        if not dry_run:
+            cursor.execute(f'UPDATE {master_table} SET {key} = TRIM({key}) WHERE {key} <> TRIM({key})')
+        cursor.execute('DROP TABLE dedupe_map')
+    return stats
@@ -0,0 +1,152 @@
+"""Data-change notifications over Postgres LISTEN/NOTIFY, streamed as Server-Sent Events
+
+Each process holds a single LISTEN connection, opened while at least one
+stream is open, and fans its notifications out to the streams. Streams
+occupy a server thread each, so a process serves at most
+EVENT_STREAMS_MAX_CONCURRENT of them and turns the rest away.
+"""
+import json
+import queue
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+DATA_CHANGED_CHANNEL = 'dashboard_data_changed'
+
+# Send a keepalive comment when nothing happened for this long
+KEEPALIVE_SECONDS = 15
+# Close streams after this long; EventSource reconnects by itself
+MAX_STREAM_SECONDS = 600
+# Wait before reopening the LISTEN connection after it failed
+RECONNECT_SECONDS = 5
+
+
+def notify_data_changed(snapshot, using=DEFAULT_DB_ALIAS):
+    """Announce a month's newly current MonthSnapshot once the current transaction commits"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    payload = json.dumps({
+        'data_type': snapshot.data_type,
+        'month_year': snapshot.month_year.strftime('%Y-%m'),
+        'version': snapshot.version,
+    })
+
+    def send():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [DATA_CHANGED_CHANNEL, payload])
+
+    transaction.on_commit(send, using=using)
+
+
+class _Listener:
+    """The process's LISTEN connection, shared by every open stream"""
+
+    def __init__(self, using):
+        self.using = using
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+
+    def subscribe(self):
+        subscriber = queue.SimpleQueue()
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='data-changed-listener', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def _has_subscribers(self):
+        with self.lock:
+            if not self.subscribers:
+                # Checked and cleared under the lock so subscribe() starts a new thread
+                self.thread = None
+            return bool(self.subscribers)
+
+    def _run(self):
+        django_connection = connections[self.using]
+        while self._has_subscribers():
+            try:
+                listener = django_connection.get_new_connection(django_connection.get_connection_params())
+            except Exception:
+                time.sleep(RECONNECT_SECONDS)
+                continue
+            try:
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {DATA_CHANGED_CHANNEL}')
+                while self._has_subscribers():
+                    readable, _, _ = select.select([listener], [], [], KEEPALIVE_SECONDS)
+                    if not readable:
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        payload = listener.notifies.pop(0).payload
+                        with self.lock:
+                            for subscriber in self.subscribers:
+                                subscriber.put(payload)
+                else:
+                    return
+            except Exception:
+                time.sleep(RECONNECT_SECONDS)
+            finally:
+                listener.close()
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+_stream_slots = threading.BoundedSemaphore(settings.EVENT_STREAMS_MAX_CONCURRENT)
+
+
+def _listener(using):
+    with _listeners_lock:
+        if using not in _listeners:
+            _listeners[using] = _Listener(using)
+        return _listeners[using]
+
+
+class DataChangedStream:
+    """Iterable of SSE messages for each data change until the stream expires
+
+    Closing it (StreamingHttpResponse does) frees its slot even if it was
+    never iterated.
+    """
+
+    def __init__(self, using):
+        self.listener = _listener(using)
+        self.subscriber = self.listener.subscribe()
+        self.closed = False
+
+    def __iter__(self):
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                payload = self.subscriber.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            version = json.loads(payload).get('version')
+            event_id = f'id: {version}\n' if version is not None else ''
+            yield f'{event_id}event: data-updated\ndata: {payload}\n\n'
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.listener.unsubscribe(self.subscriber)
+            _stream_slots.release()
+
+
+def data_changed_events(using=DEFAULT_DB_ALIAS):
+    """Open a DataChangedStream, or return None if this process serves its maximum"""
+    if not _stream_slots.acquire(blocking=False):
+        return None
+    return DataChangedStream(using)
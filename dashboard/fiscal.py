@@ -0,0 +1,122 @@
+import calendar
+
+import nepali_datetime
+from django.db.models import F, Max
+
+from .models import FiscalCalendar
+
+# Nepali fiscal years start on 1 Shrawan, the 4th Bikram Sambat month
+FISCAL_YEAR_START_MONTH = 4
+
+# FiscalCalendar fields each rollup period is grouped by
+PERIOD_FIELDS = {
+    'quarter': ['fiscal_year', 'fiscal_quarter'],
+    'year': ['fiscal_year'],
+}
+
+
+def month_end(month_year):
+    """Return the last day of the Gregorian month containing month_year"""
+    return month_year.replace(day=calendar.monthrange(month_year.year, month_year.month)[1])
+
+
+def fiscal_period(month_year):
+    """Return the FiscalCalendar attributes of the reporting month containing month_year
+
+    A Gregorian month is assigned to the Nepali month (and so fiscal year)
+    its month-end falls in, matching month-end reporting.
+    """
+    bs_date = nepali_datetime.date.from_datetime_date(month_end(month_year))
+    start_year = bs_date.year if bs_date.month >= FISCAL_YEAR_START_MONTH else bs_date.year - 1
+    fiscal_month = (bs_date.month - FISCAL_YEAR_START_MONTH) % 12 + 1
+    return {
+        'month_year': month_year.replace(day=1),
+        'fiscal_year': f"{start_year}/{(start_year + 1) % 100:02d}",
+        'fiscal_year_start': start_year,
+        'fiscal_quarter': (fiscal_month - 1) // 3 + 1,
+        'fiscal_month': fiscal_month,
+        'nepali_year': bs_date.year,
+        'nepali_month': bs_date.month,
+        'nepali_month_name': bs_date.strftime('%B'),
+    }
+
+
+def calendar_month(month_year):
+    """Return the FiscalCalendar row for a month
+
+    Months outside the calendar built by build_fiscal_calendar are computed
+    as an unsaved row, so this never writes.
+    """
+    month_year = month_year.replace(day=1)
+    return (
+        FiscalCalendar.objects.filter(month_year=month_year).first()
+        or FiscalCalendar(**fiscal_period(month_year))
+    )
+
+
+def period_totals(queryset, period, stock=False, **aggregates):
+    """Aggregate a CustomerData/TransactionData queryset per fiscal quarter or year
+
+    One GROUP BY over the rows joined to FiscalCalendar through their
+    fiscal_month. Flows are aggregated over the whole period; for stocks
+    only the period's latest month is. Returns dicts with the period's
+    fields, its period_end month and the aggregates, ordered by period.
+    """
+    fields = {field: F(f'fiscal_month__{field}') for field in PERIOD_FIELDS[period]}
+    if stock:
+        period_ends = queryset.values(**fields).annotate(period_end=Max('month_year')).values('period_end')
+        queryset = queryset.filter(month_year__in=period_ends)
+    return list(
+        queryset.values(**fields).annotate(period_end=Max('month_year'), **aggregates).order_by(*fields)
+    )
+
+
+def merge_period_totals(rows, archived, sum_fields=()):
+    """Merge rolled-up archived months into period_totals rows
+
+    Archived months are older than those in the database, so a period's
+    stocks come from its database rows when it has any.
+    """
+    def key(row):
+        return row['fiscal_year'], row.get('fiscal_quarter')
+
+    merged = {key(row): row for row in archived}
+    for row in rows:
+        earlier = merged.get(key(row))
+        if earlier:
+            for field in sum_fields:
+                row[field] = (row[field] or 0) + (earlier[field] or 0)
+        merged[key(row)] = row
+    return sorted(merged.values(), key=lambda row: (row['fiscal_year'] is None, key(row)))
+
+
+def rollup_by_period(rows, period, sum_fields=(), last_fields=()):
+    """Roll month-level aggregate rows up to fiscal quarters or years
+
+    rows are dicts with a 'month_year' key sorted by month. sum_fields are
+    flows added across the period; last_fields are stocks that report the
+    period's latest month. Meant for short series such as archived months;
+    query the database with period_totals.
+    """
+    rows = list(rows)
+    months = {
+        month.month_year: month
+        for month in FiscalCalendar.objects.filter(month_year__in=[row['month_year'].replace(day=1) for row in rows])
+    }
+    periods = {}
+    for row in rows:
+        month = months.get(row['month_year'].replace(day=1)) or FiscalCalendar(**fiscal_period(row['month_year']))
+        key = (month.fiscal_year, month.fiscal_quarter if period == 'quarter' else None)
+        if key not in periods:
+            periods[key] = {'fiscal_year': month.fiscal_year, 'period_end': row['month_year']}
+            if period == 'quarter':
+                periods[key]['fiscal_quarter'] = month.fiscal_quarter
+            for field in sum_fields:
+                periods[key][field] = 0
+        rolled = periods[key]
+        rolled['period_end'] = row['month_year']
+        for field in sum_fields:
+            rolled[field] += row[field] or 0
+        for field in last_fields:
+            rolled[field] = row[field]
+    return list(periods.values())
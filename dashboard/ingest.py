@@ -0,0 +1,175 @@
+"""Bulk loading and derivation of the monthly TotalUser/TotalTransaction tables"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .fiscal import calendar_month
+from .snapshots import current_snapshot, new_snapshot, publish
+from .uploads import batched
+from .models import (
+    ServiceType, TransactionRange, TransactionType, InstrumentType,
+    GeographicalLocation, ChannelUsed, CustomerData, TransactionData,
+    TotalUser, TotalTransaction
+)
+
+BULK_BATCH_SIZE = 5000
+
+
+class DimensionCache:
+    """Resolves dimension names to primary keys with a single query per table
+
+    Names match ignoring case, like the master tables' unique constraints.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {name.upper(): pk for pk, name in model.objects.values_list('pk', field)}
+
+    def get(self, name, **defaults):
+        name = name.strip()
+        key = name.upper()
+        if key not in self.ids:
+            # get_or_create re-reads the row if a concurrent upload inserts the name first
+            dimension, _ = self.model.objects.get_or_create(
+                **{f'{self.field}__iexact': name}, defaults={self.field: name, **defaults}
+            )
+            self.ids[key] = dimension.pk
+        return self.ids[key]
+
+
+def process_total_user_data(rows, month_year):
+    """Bulk load a month of TotalUser rows, replacing any existing rows for that month"""
+    try:
+        fiscal_month = calendar_month(month_year)
+        records_uploaded = 0
+
+        with transaction.atomic():
+            services = DimensionCache(ServiceType, 'service_name')
+            snapshot = new_snapshot('TOTAL_USER', month_year)
+            for batch in batched(rows, BULK_BATCH_SIZE):
+                TotalUser.all_versions.bulk_create([
+                    TotalUser(
+                        fiscal_year=fiscal_month.fiscal_year,
+                        fiscal_quarter=fiscal_month.fiscal_quarter,
+                        month_year=month_year,
+                        snapshot=snapshot,
+                        service_type_id=services.get(row['service_type']),
+                        status=row['status'].strip().lower(),
+                        count=int(row['count']),
+                    )
+                    for row in batch
+                ])
+                records_uploaded += len(batch)
+            publish(snapshot, records_uploaded)
+
+        return {'status': 'SUCCESS', 'records_uploaded': records_uploaded, 'snapshot': snapshot}
+
+    except Exception as e:
+        return {'status': 'FAILED', 'records_uploaded': 0, 'error_message': str(e)}
+
+
+def process_total_transaction_data(rows, month_year):
+    """Bulk load a month of TotalTransaction rows, replacing any existing rows for that month"""
+    try:
+        fiscal_month = calendar_month(month_year)
+        records_uploaded = 0
+
+        with transaction.atomic():
+            ranges = DimensionCache(TransactionRange, 'range_name')
+            types = DimensionCache(TransactionType, 'transaction_type_name')
+            instruments = DimensionCache(InstrumentType, 'instrument_type_name')
+            locations = DimensionCache(GeographicalLocation, 'location_name')
+            channels = DimensionCache(ChannelUsed, 'channel_name')
+            snapshot = new_snapshot('TOTAL_TRANSACTION', month_year)
+            for batch in batched(rows, BULK_BATCH_SIZE):
+                TotalTransaction.all_versions.bulk_create([
+                    TotalTransaction(
+                        fiscal_year=fiscal_month.fiscal_year,
+                        fiscal_quarter=fiscal_month.fiscal_quarter,
+                        month_year=month_year,
+                        snapshot=snapshot,
+                        transaction_range_id=ranges.get(row['range_of_transactions']),
+                        type_of_transaction_id=types.get(row['type_of_transaction']),
+                        form_of_instrument_id=instruments.get(row['form_of_instrument']),
+                        geographical_location_id=locations.get(row['geographical_location']),
+                        channel_used_id=channels.get(row['channel_used']),
+                        number_of_transactions=int(row['number_of_transactions']),
+                        amount=Decimal(row['amount']),
+                    )
+                    for row in batch
+                ])
+                records_uploaded += len(batch)
+            publish(snapshot, records_uploaded)
+
+        return {'status': 'SUCCESS', 'records_uploaded': records_uploaded, 'snapshot': snapshot}
+
+    except Exception as e:
+        return {'status': 'FAILED', 'records_uploaded': 0, 'error_message': str(e)}
+
+
+def derive_total_users(month_year, upload_log=None):
+    """Publish a new TotalUser version for a month built from the current CustomerData
+    with one INSERT ... SELECT; ValueError if the month has no CustomerData"""
+    now = timezone.now()
+    fiscal_month = calendar_month(month_year)
+    with transaction.atomic(), connection.cursor() as cursor:
+        source = current_snapshot('CUSTOMER', month_year)
+        if source is None:
+            raise ValueError(f"No Customer Data uploaded for {month_year:%Y-%m} to derive total users from")
+        snapshot = new_snapshot('TOTAL_USER', month_year, upload_log, derived_from=source)
+        cursor.execute(f"""
+            INSERT INTO {TotalUser._meta.db_table}
+                (fiscal_year, fiscal_quarter, month_year, service_type_id, status, count, snapshot_id, created_at, updated_at)
+            SELECT %s, %s, month_year, service_type_id, LOWER(status), SUM(number_of_customers), %s, %s, %s
+            FROM {CustomerData._meta.db_table}
+            WHERE snapshot_id = %s
+            GROUP BY month_year, service_type_id, LOWER(status)
+        """, [fiscal_month.fiscal_year, fiscal_month.fiscal_quarter, snapshot.pk, now, now, source.pk])
+        publish(snapshot, cursor.rowcount)
+        return cursor.rowcount
+
+
+def derive_total_transactions(month_year, upload_log=None):
+    """Publish a new TotalTransaction version for a month built from the current
+    TransactionData with one INSERT ... SELECT; ValueError if the month has no TransactionData"""
+    now = timezone.now()
+    fiscal_month = calendar_month(month_year)
+    range_table = TransactionRange._meta.db_table
+    detail_table = TransactionData._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        source = current_snapshot('TRANSACTION', month_year)
+        if source is None:
+            raise ValueError(f"No Transaction Data uploaded for {month_year:%Y-%m} to derive total transactions from")
+        source_id = source.pk
+        # TransactionData keeps the range as text; make sure every range has a dimension row
+        cursor.execute(f"""
+            INSERT INTO {range_table} (range_name)
+            SELECT MIN(TRIM(d.range_of_transactions))
+            FROM {detail_table} d
+            WHERE d.snapshot_id = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM {range_table} r WHERE UPPER(r.range_name) = UPPER(TRIM(d.range_of_transactions))
+              )
+            GROUP BY UPPER(TRIM(d.range_of_transactions))
+            ON CONFLICT DO NOTHING
+        """, [source_id])
+
+        snapshot = new_snapshot('TOTAL_TRANSACTION', month_year, upload_log, derived_from=source)
+        cursor.execute(f"""
+            INSERT INTO {TotalTransaction._meta.db_table}
+                (fiscal_year, fiscal_quarter, month_year, transaction_range_id, type_of_transaction_id,
+                 form_of_instrument_id, geographical_location_id, channel_used_id,
+                 number_of_transactions, amount, snapshot_id, created_at, updated_at)
+            SELECT %s, %s, d.month_year, r.id, d.type_of_transaction_id,
+                   d.form_of_instrument_id, d.geographical_location_id, d.channel_used_id,
+                   SUM(d.number_of_transactions), SUM(d.amount), %s, %s, %s
+            FROM {detail_table} d
+            JOIN {range_table} r ON UPPER(r.range_name) = UPPER(TRIM(d.range_of_transactions))
+            WHERE d.snapshot_id = %s
+            GROUP BY d.month_year, r.id, d.type_of_transaction_id, d.form_of_instrument_id,
+                     d.geographical_location_id, d.channel_used_id
+        """, [fiscal_month.fiscal_year, fiscal_month.fiscal_quarter, snapshot.pk, now, now, source_id])
+        publish(snapshot, cursor.rowcount)
+        return cursor.rowcount
@@ -0,0 +1,91 @@
+"""Branch rankings over Customer Data computed in one SQL pass
+
+Branches are ranked by customers, share of the month's total or growth
+over the previous month. Only the month and the month before it are read,
+so LAG always compares with the previous calendar month, and the rank
+filter lets Postgres stop the window scan once the top N are known. The
+month/service type/status index covering number_of_customers keeps the
+scan to the filtered slice of the month.
+"""
+from django.db import connections, router
+
+from .comparisons import shift_months
+from .models import Branch, CurrentSnapshot, CustomerData
+
+LEADERBOARD_SQL = """
+WITH monthly AS (
+    SELECT DATE_TRUNC('month', month_year)::date AS month, branch_code_id AS branch_id,
+           SUM(number_of_customers) AS customers
+    FROM {fact_table}
+    WHERE month_year >= %(start)s AND month_year < %(end)s
+      AND snapshot_id IN (SELECT snapshot_id FROM {current_table})
+      {filters}
+    GROUP BY 1, 2
+), compared AS (
+    SELECT month, branch_id, customers,
+           customers - LAG(customers) OVER (PARTITION BY branch_id ORDER BY month) AS growth,
+           ROUND((100.0 * (customers - LAG(customers) OVER (PARTITION BY branch_id ORDER BY month))
+                  / NULLIF(LAG(customers) OVER (PARTITION BY branch_id ORDER BY month), 0))::numeric, 2)::float8 AS growth_pct,
+           ROUND((100.0 * customers / NULLIF(SUM(customers) OVER (PARTITION BY month), 0))::numeric, 2)::float8 AS share
+    FROM monthly
+), ranked AS (
+    SELECT branch_id, customers, share, growth, growth_pct,
+           RANK() OVER (ORDER BY {metric} {direction}) AS rank
+    FROM compared
+    WHERE month = %(month)s AND {metric} IS NOT NULL
+)
+SELECT r.rank, b.branch_code, b.branch_name, r.customers, r.share, r.growth, r.growth_pct
+FROM ranked r
+JOIN {branch_table} b ON b.id = r.branch_id
+WHERE r.rank <= %(limit)s
+ORDER BY r.rank, b.branch_code
+"""
+
+# Ranking metric -> column of the compared CTE
+LEADERBOARD_METRICS = {
+    'customers': 'customers',
+    'share': 'share',
+    'growth': 'growth',
+    'growth_pct': 'growth_pct',
+}
+# Query string filter -> Customer Data column
+LEADERBOARD_FILTERS = {
+    'customer_category': 'customer_category_id',
+    'service_type': 'service_type_id',
+    'status': 'status',
+}
+LEADERBOARD_MAX_LIMIT = 100
+
+
+def branch_leaderboard(month_year, metric='customers', order='top', limit=10, filters=None, using=None):
+    """Top (or bottom) branches for a month by the given metric
+
+    filters maps LEADERBOARD_FILTERS keys to values. Growth is against the
+    previous month; branches without that month are left out of growth
+    rankings.
+    """
+    month = month_year.replace(day=1)
+    using = using or router.db_for_read(CustomerData)
+    params = {
+        'start': shift_months(month, -1),
+        'end': shift_months(month, 1),
+        'month': month,
+        'limit': limit,
+    }
+    conditions = []
+    for name, value in (filters or {}).items():
+        conditions.append(f'AND {LEADERBOARD_FILTERS[name]} = %({name})s')
+        params[name] = value
+
+    sql = LEADERBOARD_SQL.format(
+        fact_table=CustomerData._meta.db_table,
+        current_table=CurrentSnapshot._meta.db_table,
+        branch_table=Branch._meta.db_table,
+        filters='\n      '.join(conditions),
+        metric=LEADERBOARD_METRICS[metric],
+        direction='DESC' if order == 'top' else 'ASC',
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column.name for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
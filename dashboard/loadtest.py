@@ -0,0 +1,268 @@
+"""Concurrent load test of the dashboard endpoints over plain HTTP
+
+Each virtual user logs in through the login form with its own cookie jar
+and then replays a weighted mix of scenarios against a running server
+until the run time is up. Only the standard library is used so the tool
+runs anywhere the project does.
+"""
+import http.cookiejar
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+# Scenario name -> default weight in the request mix
+DEFAULT_MIX = {
+    'dashboard_home': 30,
+    'api_dashboard_data': 25,
+    'data_tables': 15,
+    'total_transaction_summary': 25,
+    'data_upload': 5,
+}
+
+REQUEST_TIMEOUT = 60
+
+
+class LoadTestError(Exception):
+    pass
+
+
+class VirtualUser:
+    """One logged-in analyst session"""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+        self.username = username
+        self.password = password
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, params=None, data=None, content_type=None):
+        """Return (status, final url, body) for a GET, or a POST when data is given"""
+        url = self.base_url + path
+        if params:
+            url += '?' + urlencode(params)
+        headers = {'Accept-Encoding': 'identity'}
+        if data is not None:
+            headers['X-CSRFToken'] = self.csrf_token()
+            headers['Referer'] = url
+            headers['Content-Type'] = content_type or 'application/x-www-form-urlencoded'
+        try:
+            with self.opener.open(Request(url, data=data, headers=headers), timeout=REQUEST_TIMEOUT) as response:
+                return response.status, response.url, response.read()
+        except HTTPError as e:
+            return e.code, url, e.read()
+
+    def login(self):
+        self.request('/login/')
+        status, url, _ = self.request('/login/', data=urlencode({
+            'username': self.username,
+            'password': self.password,
+            'csrfmiddlewaretoken': self.csrf_token(),
+        }).encode())
+        if status != 200 or url.rstrip('/').endswith('/login'):
+            raise LoadTestError(f"Login failed for {self.username} (HTTP {status})")
+
+
+def multipart_body(fields, files):
+    """Encode form fields and {name: (file name, bytes)} as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (file_name, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{file_name}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Scenarios:
+    """Builds the requests for each scenario from the seeded data"""
+
+    def __init__(self, months, summary_filters, max_page, upload):
+        self.months = months
+        self.summary_filters = summary_filters
+        self.max_page = max_page
+        self.upload = upload
+
+    def dashboard_home(self, user):
+        params = {'month_year': random.choice(self.months)} if self.months else None
+        return user.request('/', params)
+
+    def api_dashboard_data(self, user):
+        return user.request('/api/dashboard-data/', {'period': random.choice(['month', 'quarter', 'year'])})
+
+    def data_tables(self, user):
+        return user.request('/data-tables/', {
+            'type': random.choice(['customer', 'transaction']),
+            'page': random.randint(1, self.max_page),
+        })
+
+    def total_transaction_summary(self, user):
+        params = {}
+        for name, values in self.summary_filters.items():
+            if values and random.random() < 0.5:
+                params[name] = random.choice(values)
+        return user.request('/total-transaction-summary/', params)
+
+    def data_upload(self, user):
+        data_type, month_year, file_name, content = self.upload
+        body, content_type = multipart_body(
+            # Uploads may name master values the database has not seen yet
+            {'csrfmiddlewaretoken': user.csrf_token(), 'data_type': data_type, 'month_year': month_year,
+             'allow_new_values': 'on'},
+            {'data_file': (file_name, content)},
+        )
+        return user.request('/data-upload/', data=body, content_type=content_type)
+
+
+def is_error(status, url, body):
+    if status >= 400:
+        return True
+    # Expired sessions are redirected to the login page instead of failing
+    if url.rstrip('/').endswith('/login'):
+        return True
+    return b'Upload failed' in body
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_load_test(base_url, username, password, scenarios, mix, users, duration, ramp_up=0, think_time=0):
+    """Run the mix with `users` concurrent sessions for `duration` seconds and return the results"""
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    failures = []
+    lock = threading.Lock()
+
+    # Users log in during ramp-up; the measured window starts once all have tried
+    window = {}
+
+    def start_window():
+        window['start'] = time.perf_counter()
+        window['deadline'] = window['start'] + duration
+
+    ready = threading.Barrier(users, action=start_window)
+
+    def worker(index):
+        time.sleep(ramp_up * index / max(users, 1))
+        user = VirtualUser(base_url, username, password)
+        try:
+            user.login()
+        except Exception as e:
+            with lock:
+                failures.append(str(e))
+            ready.wait()
+            return
+        ready.wait()
+        while time.perf_counter() < window['deadline']:
+            name = random.choices(names, weights)[0]
+            began = time.perf_counter()
+            try:
+                failed = is_error(*getattr(scenarios, name)(user))
+            except Exception:
+                failed = True
+            elapsed = (time.perf_counter() - began) * 1000
+            with lock:
+                samples[name].append(elapsed)
+                errors[name] += failed
+            if think_time:
+                time.sleep(random.uniform(0, 2 * think_time))
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - window['start']
+
+    endpoints = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        count = len(latencies)
+        endpoints[name] = {
+            'requests': count,
+            'errors': errors[name],
+            'error_rate': round(errors[name] / count, 4) if count else 0.0,
+            'throughput_rps': round(count / duration, 2) if duration else 0.0,
+            'p50_ms': _rounded(percentile(latencies, 50)),
+            'p95_ms': _rounded(percentile(latencies, 95)),
+            'p99_ms': _rounded(percentile(latencies, 99)),
+            'max_ms': _rounded(latencies[-1] if latencies else None),
+        }
+    total = sum(result['requests'] for result in endpoints.values())
+    return {
+        'config': {
+            'base_url': base_url,
+            'users': users,
+            'duration_seconds': duration,
+            'ramp_up_seconds': ramp_up,
+            'think_time_seconds': think_time,
+            'mix': mix,
+        },
+        'summary': {
+            'requests': total,
+            'errors': sum(result['errors'] for result in endpoints.values()),
+            'throughput_rps': round(total / duration, 2) if duration else 0.0,
+            'wall_time_seconds': round(wall_time, 1),
+            'login_failures': len(failures),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def _rounded(value):
+    return None if value is None else round(value, 1)
+
+
+def write_results(results, path):
+    # Sorted keys and one value per line keep result files readable in a diff
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+        results_file.write('\n')
+
+
+def compare_results(baseline, current, tolerance):
+    """Return a list of regressions of current against baseline
+
+    An endpoint regresses when its p95 or p99 grows, or its throughput
+    drops, by more than `tolerance` (a fraction), or its error rate rises.
+    """
+    regressions = []
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before or not result['requests']:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if before[metric] and result[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before[metric]} -> {result[metric]}")
+        if before['throughput_rps'] and result['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput_rps {before['throughput_rps']} -> {result['throughput_rps']}"
+            )
+        if result['error_rate'] > before['error_rate']:
+            regressions.append(f"{name}: error_rate {before['error_rate']} -> {result['error_rate']}")
+    return regressions
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard.archive import ARCHIVE_MODELS, archive_month
+
+
+class Command(BaseCommand):
+    help = "Move CustomerData/TransactionData months older than the retention window to archive files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retain-months', type=int, default=13,
+            help='Number of most recent months to keep in the database (default: 13)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        index = today.year * 12 + today.month - 1 - (options['retain_months'] - 1)
+        cutoff = date(index // 12, index % 12 + 1, 1)
+
+        for data_type, model in ARCHIVE_MODELS.items():
+            months = model.objects.filter(month_year__lt=cutoff).dates('month_year', 'month')
+            for month_year in months:
+                if options['dry_run']:
+                    self.stdout.write(f"Would archive {data_type} {month_year:%Y-%m}")
+                    continue
+                rows = archive_month(data_type, month_year)
+                self.stdout.write(f"Archived {data_type} {month_year:%Y-%m}: {rows} rows")
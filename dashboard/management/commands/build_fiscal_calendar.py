@@ -0,0 +1,40 @@
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.fiscal import fiscal_period
+from dashboard.models import FiscalCalendar
+
+
+class Command(BaseCommand):
+    help = "Generate the FiscalCalendar rows mapping each month to its Nepali fiscal period"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', default='2015-01', help='First month, as YYYY-MM (default: 2015-01)')
+        parser.add_argument('--end', default='2035-12', help='Last month, as YYYY-MM (default: 2035-12)')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m').date()
+            end = datetime.strptime(options['end'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('Invalid month format. Use YYYY-MM.')
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+
+        months = []
+        month = start
+        while month <= end:
+            months.append(FiscalCalendar(**fiscal_period(month)))
+            month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+        FiscalCalendar.objects.bulk_create(
+            months,
+            update_conflicts=True,
+            unique_fields=['month_year'],
+            update_fields=[
+                'fiscal_year', 'fiscal_year_start', 'fiscal_quarter', 'fiscal_month',
+                'nepali_year', 'nepali_month', 'nepali_month_name',
+            ],
+        )
+        self.stdout.write(f"Fiscal calendar written for {len(months)} months ({start:%Y-%m} to {end:%Y-%m})")
@@ -0,0 +1,29 @@
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.reports import report_pack
+
+
+class Command(BaseCommand):
+    help = "Build a month's MIS report pack (XLSX workbook and zip of CSVs), reusing it if the data has not changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help='Month to report on, as YYYY-MM')
+        parser.add_argument('--output-dir', help='Also copy the pack files into this directory')
+
+    def handle(self, *args, **options):
+        try:
+            month_year = datetime.strptime(options['month_year'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('Invalid month format. Use YYYY-MM.')
+
+        paths = report_pack(month_year)
+        output_dir = options['output_dir']
+        for extension, path in paths.items():
+            if output_dir:
+                Path(output_dir).mkdir(parents=True, exist_ok=True)
+                path = Path(shutil.copy(path, Path(output_dir) / f"mis_report_{month_year:%Y-%m}.{extension}"))
+            self.stdout.write(str(path))
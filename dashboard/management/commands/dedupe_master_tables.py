@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.dedupe import MASTER_KEYS, dedupe_master
+from dashboard.models import ArchivedMonth
+
+
+class Command(BaseCommand):
+    help = "Merge master rows whose names differ only in case or spaces, re-pointing the fact tables to the kept row"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count the duplicates')
+
+    def handle(self, *args, **options):
+        merged = 0
+        for model in MASTER_KEYS:
+            stats = dedupe_master(model, dry_run=options['dry_run'])
+            name = model._meta.verbose_name_plural
+            if options['dry_run']:
+                self.stdout.write(f"{name}: {stats['duplicates']} duplicates")
+            else:
+                self.stdout.write(
+                    f"{name}: removed {stats['duplicates']} duplicates, re-pointed {stats['repointed']} rows, "
+                    f"folded {stats['folded']} colliding rows"
+                )
+            merged += stats['duplicates']
+        if merged and not options['dry_run'] and ArchivedMonth.objects.exists():
+            self.stdout.write(self.style.WARNING(
+                'Archived months still hold the removed ids; re-upload and re-archive them to pick up the merge.'
+            ))
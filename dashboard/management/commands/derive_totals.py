@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.ingest import derive_total_users, derive_total_transactions
+
+
+class Command(BaseCommand):
+    help = "Derive a month's TotalUser/TotalTransaction rows from the detailed upload tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help='Month to derive, as YYYY-MM')
+        parser.add_argument(
+            '--type', choices=['users', 'transactions', 'all'], default='all',
+            help='Which total table to rebuild (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            month_year = datetime.strptime(options['month_year'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('Invalid month format. Use YYYY-MM.')
+
+        derivations = [
+            ('users', 'TotalUser', derive_total_users),
+            ('transactions', 'TotalTransaction', derive_total_transactions),
+        ]
+        for choice, label, derive in derivations:
+            if options['type'] not in (choice, 'all'):
+                continue
+            try:
+                rows = derive(month_year)
+            except ValueError as e:
+                # The month's existing totals are left as they are
+                self.stderr.write(f"{label}: {e}; existing totals kept")
+                continue
+            self.stdout.write(f"{label}: {rows} rows derived for {month_year:%Y-%m}")
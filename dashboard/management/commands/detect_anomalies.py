@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.anomalies import ANOMALY_SPECS, detect_anomalies
+from dashboard.snapshots import current_snapshot
+
+
+class Command(BaseCommand):
+    help = "Score a month's current Customer/Transaction Data against earlier months and store the anomalies"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help='Month to check, as YYYY-MM')
+        parser.add_argument(
+            '--type', choices=['customer', 'transaction', 'all'], default='all',
+            help='Which detail data to check (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            month_year = datetime.strptime(options['month_year'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('Invalid month format. Use YYYY-MM.')
+
+        for data_type in ANOMALY_SPECS:
+            if options['type'] not in ('all', data_type.lower()):
+                continue
+            snapshot = current_snapshot(data_type, month_year)
+            if snapshot is None:
+                self.stdout.write(f"No {data_type} data for {month_year:%Y-%m}")
+                continue
+            flagged = detect_anomalies(data_type, month_year, snapshot, snapshot.upload_log)
+            self.stdout.write(f"{data_type} {month_year:%Y-%m}: {flagged} anomalies")
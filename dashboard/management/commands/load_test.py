@@ -0,0 +1,168 @@
+import json
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from dashboard.dedupe import MASTER_KEYS
+from dashboard.loadtest import DEFAULT_MIX, Scenarios, compare_results, run_load_test, write_results
+from dashboard.models import (
+    ChannelUsed, DataUploadLog, GeographicalLocation, InstrumentType, MonthSnapshot, TotalTransaction,
+    TotalUser, TransactionRange, TransactionType
+)
+from dashboard.snapshots import DERIVED_TYPES, drop_month
+
+# Small Total User file uploaded by the data_upload scenario
+DEFAULT_UPLOAD = b"Service type,Status,Count\nLoad test,active,1\nLoad test,inactive,1\n"
+
+
+class Command(BaseCommand):
+    help = "Replay a weighted mix of dashboard requests with concurrent users against a running server"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to test (default: %(default)s)')
+        parser.add_argument('--username', default='admin')
+        parser.add_argument(
+            '--password', default=os.environ.get('LOADTEST_PASSWORD'),
+            help='Password for --username (default: $LOADTEST_PASSWORD)'
+        )
+        parser.add_argument('--users', type=int, default=50, help='Concurrent users (default: 50)')
+        parser.add_argument('--duration', type=int, default=60, help='Seconds to run after ramp-up (default: 60)')
+        parser.add_argument('--ramp-up', type=int, default=10, help='Seconds over which users log in (default: 10)')
+        parser.add_argument('--think-time', type=float, default=0.5, help='Mean pause between requests in seconds')
+        parser.add_argument(
+            '--mix', action='append', default=[], metavar='SCENARIO=WEIGHT',
+            help=f"Override a scenario weight; scenarios: {', '.join(DEFAULT_MIX)}"
+        )
+        parser.add_argument('--max-page', type=int, default=200, help='Deepest data_tables page requested')
+        parser.add_argument('--upload-type', default='TOTAL_USER', help='Data type for the data_upload scenario')
+        parser.add_argument('--upload-file', help='File for the data_upload scenario (default: a two-row Total User CSV)')
+        parser.add_argument(
+            '--upload-month', default='2000-01',
+            help='Month the data_upload scenario writes to; it must hold no data and is removed '
+                 'again after the run (default: %(default)s)'
+        )
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline results JSON to check for regressions')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Allowed fractional latency/throughput change against --compare (default: 0.2)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['password']:
+            raise CommandError('Pass --password or set LOADTEST_PASSWORD.')
+
+        mix = dict(DEFAULT_MIX)
+        for override in options['mix']:
+            name, _, weight = override.partition('=')
+            if name not in DEFAULT_MIX or not weight.isdigit():
+                raise CommandError(f"Invalid --mix {override!r}; use SCENARIO=WEIGHT with one of {', '.join(DEFAULT_MIX)}")
+            mix[name] = int(weight)
+
+        if options['upload_file']:
+            with open(options['upload_file'], 'rb') as upload_file:
+                upload = (options['upload_type'], options['upload_month'],
+                          os.path.basename(options['upload_file']), upload_file.read())
+        else:
+            upload = (options['upload_type'], options['upload_month'], 'load_test.csv', DEFAULT_UPLOAD)
+        writes = mix['data_upload'] > 0
+        if writes:
+            upload_types, upload_month = self.upload_target(options['upload_type'], options['upload_month'])
+            master_ids = {model: model.objects.aggregate(last=Max('pk'))['last'] or 0 for model in MASTER_KEYS}
+
+        scenarios = Scenarios(
+            months=[f"{month:%Y-%m}" for month in TotalUser.objects.dates('month_year', 'month')],
+            summary_filters=self.summary_filters(),
+            max_page=options['max_page'],
+            upload=upload,
+        )
+
+        self.stdout.write(
+            f"Running {options['users']} users for {options['duration']}s against {options['base_url']}..."
+        )
+        try:
+            results = run_load_test(
+                options['base_url'], options['username'], options['password'], scenarios, mix,
+                users=options['users'], duration=options['duration'],
+                ramp_up=options['ramp_up'], think_time=options['think_time'],
+            )
+        finally:
+            if writes:
+                self.remove_uploads(upload_types, upload_month, master_ids)
+        self.report(results)
+
+        if options['output']:
+            write_results(results, options['output'])
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                regressions = compare_results(json.load(baseline_file), results, options['tolerance'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(f"REGRESSION {regression}")
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def upload_target(self, data_type, month):
+        """Data types and month the data_upload scenario writes, refusing months that hold data"""
+        try:
+            month_year = datetime.strptime(month, '%Y-%m').date()
+        except ValueError:
+            raise CommandError(f"Invalid --upload-month {month!r}; use YYYY-MM.")
+        data_types = [data_type] + ([DERIVED_TYPES[data_type]] if data_type in DERIVED_TYPES else [])
+        if MonthSnapshot.objects.filter(data_type__in=data_types, month_year=month_year).exists():
+            raise CommandError(
+                f"{month} already has {data_type} data, which the run would remove afterwards; "
+                f"pass an empty --upload-month or --mix data_upload=0."
+            )
+        return data_types, month_year
+
+    def remove_uploads(self, data_types, month_year, master_ids):
+        """Delete what the data_upload scenario wrote: the month, its upload logs and new master rows"""
+        for data_type in data_types:
+            # Rows, anomalies and reconciliation mismatches go with their snapshots
+            drop_month(data_type, month_year)
+        DataUploadLog.objects.filter(data_type__in=data_types, month_year=month_year).delete()
+        removed = 0
+        for model, last_id in master_ids.items():
+            # Only values nothing else refers to, in case a real upload picked one up meanwhile
+            unused = {rel.name + '__isnull': True for rel in model._meta.related_objects}
+            removed += model.objects.filter(pk__gt=last_id, **unused).delete()[1].get(model._meta.label, 0)
+        self.stdout.write(f"Removed the {month_year:%Y-%m} uploads and {removed} new master value(s)")
+
+    def summary_filters(self):
+        """Filter values for total_transaction_summary taken from the seeded data"""
+        counts = list(
+            TotalTransaction.objects.order_by('number_of_transactions')
+            .values_list('number_of_transactions', flat=True)[:1000]
+        )
+        return {
+            'transaction_range': list(TransactionRange.objects.values_list('pk', flat=True)),
+            'type_of_transaction': list(TransactionType.objects.values_list('pk', flat=True)),
+            'form_of_instrument': list(InstrumentType.objects.values_list('pk', flat=True)),
+            'geographical_location': list(GeographicalLocation.objects.values_list('pk', flat=True)),
+            'channel_used': list(ChannelUsed.objects.values_list('pk', flat=True)),
+            'min_transactions': counts[::100],
+        }
+
+    def report(self, results):
+        summary = results['summary']
+        self.stdout.write(
+            f"{summary['requests']} requests, {summary['errors']} errors, "
+            f"{summary['throughput_rps']} req/s, {summary['login_failures']} login failures"
+        )
+        self.stdout.write(
+            f"{'endpoint':<28}{'requests':>9}{'req/s':>8}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        for name, result in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<28}{result['requests']:>9}{result['throughput_rps']:>8}"
+                f"{result['error_rate']:>8.1%}{_ms(result['p50_ms']):>9}{_ms(result['p95_ms']):>9}{_ms(result['p99_ms']):>9}"
+            )
+
+
+def _ms(value):
+    return '-' if value is None else value
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard.snapshots import prune_snapshots
+
+
+class Command(BaseCommand):
+    help = "Delete superseded month snapshots older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int, default=settings.SNAPSHOT_RETENTION_DAYS,
+            help='Keep superseded versions for this many days (default: SNAPSHOT_RETENTION_DAYS)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='List the versions that would be deleted')
+
+    def handle(self, *args, **options):
+        pruned = prune_snapshots(options['retention_days'], dry_run=options['dry_run'])
+        for snapshot in pruned:
+            action = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(f"{action} {snapshot} ({snapshot.row_count} rows)")
+        if not options['dry_run']:
+            self.stdout.write(f"Pruned {len(pruned)} snapshot(s)")
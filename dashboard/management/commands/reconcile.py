@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.reconciliation import RECONCILIATION_SPECS, reconcile_month
+
+
+class Command(BaseCommand):
+    help = "Compare a month's current detail data with its totals and store the mismatches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help='Month to reconcile, as YYYY-MM')
+        parser.add_argument(
+            '--type', choices=['customer', 'transaction', 'all'], default='all',
+            help='Customer Data vs Total Users, Transaction Data vs Total Transactions, or both (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            month_year = datetime.strptime(options['month_year'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('Invalid month format. Use YYYY-MM.')
+
+        for data_type in RECONCILIATION_SPECS:
+            if options['type'] not in ('all', data_type.lower()):
+                continue
+            mismatches = reconcile_month(data_type, month_year)
+            if mismatches is None:
+                self.stdout.write(f"{data_type} {month_year:%Y-%m}: detail or total data missing, nothing to compare")
+            else:
+                self.stdout.write(f"{data_type} {month_year:%Y-%m}: {mismatches} mismatches")
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:08
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('branch_code'), name='text_pattern_ops'), name='branch_code_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('branch_name'), name='text_pattern_ops'), name='branch_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerdata',
+            index=models.Index(fields=['month_year'], name='customerdata_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='totaltransaction',
+            index=models.Index(fields=['month_year'], name='totaltx_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='totaluser',
+            index=models.Index(fields=['month_year'], name='totaluser_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactiondata',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('range_of_transactions'), name='text_pattern_ops'), name='txdata_range_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:09
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_fact_table_admin_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='branch',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('branch_code'), name='gin_trgm_ops'), name='branch_code_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('branch_name'), name='gin_trgm_ops'), name='branch_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='channelused',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('channel_name'), name='gin_trgm_ops'), name='channel_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customercategory',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('category_name'), name='gin_trgm_ops'), name='category_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geographicallocation',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('location_name'), name='gin_trgm_ops'), name='location_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrumenttype',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('instrument_type_name'), name='gin_trgm_ops'), name='instrument_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicetype',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('service_name'), name='gin_trgm_ops'), name='service_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionrange',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('range_name'), name='gin_trgm_ops'), name='range_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactiontype',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('transaction_type_name'), name='gin_trgm_ops'), name='tx_type_name_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_master_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='datauploadlog',
+            name='data_type',
+            field=models.CharField(choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data'), ('TOTAL_USER', 'Total User Data'), ('TOTAL_TRANSACTION', 'Total Transaction Data')], max_length=20),
+        ),
+    ]
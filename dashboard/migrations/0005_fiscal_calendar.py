@@ -0,0 +1,69 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:13
+
+from django.db import migrations, models
+
+
+def backfill_fiscal_periods(apps, schema_editor):
+    from dashboard.fiscal import fiscal_period
+
+    FiscalCalendar = apps.get_model('dashboard', 'FiscalCalendar')
+    for model_name in ('TotalUser', 'TotalTransaction'):
+        model = apps.get_model('dashboard', model_name)
+        for month_year in model.objects.values_list('month_year', flat=True).distinct():
+            period = fiscal_period(month_year)
+            FiscalCalendar.objects.get_or_create(month_year=period.pop('month_year'), defaults=period)
+            model.objects.filter(month_year=month_year).update(
+                fiscal_year=period['fiscal_year'],
+                fiscal_quarter=period['fiscal_quarter'],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_total_upload_types'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FiscalCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_year', models.DateField(unique=True)),
+                ('fiscal_year', models.CharField(max_length=10)),
+                ('fiscal_year_start', models.PositiveIntegerField()),
+                ('fiscal_quarter', models.PositiveSmallIntegerField()),
+                ('fiscal_month', models.PositiveSmallIntegerField()),
+                ('nepali_year', models.PositiveIntegerField()),
+                ('nepali_month', models.PositiveSmallIntegerField()),
+                ('nepali_month_name', models.CharField(max_length=20)),
+            ],
+            options={
+                'verbose_name_plural': 'Fiscal Calendar',
+                'ordering': ['month_year'],
+            },
+        ),
+        migrations.AddField(
+            model_name='totaltransaction',
+            name='fiscal_quarter',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='totaluser',
+            name='fiscal_quarter',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='totaltransaction',
+            index=models.Index(fields=['fiscal_year', 'fiscal_quarter', 'month_year'], name='totaltx_fiscal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='totaluser',
+            index=models.Index(fields=['fiscal_year', 'fiscal_quarter', 'month_year'], name='totaluser_fiscal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fiscalcalendar',
+            index=models.Index(fields=['fiscal_year_start', 'fiscal_quarter'], name='fiscalcal_period_idx'),
+        ),
+        migrations.RunPython(backfill_fiscal_periods, migrations.RunPython.noop),
+    ]
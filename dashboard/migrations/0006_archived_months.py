@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_fiscal_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data')], max_length=20)),
+                ('month_year', models.DateField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('checksum', models.CharField(max_length=64)),
+                ('row_count', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived Months',
+                'unique_together': {('data_type', 'month_year')},
+            },
+        ),
+    ]
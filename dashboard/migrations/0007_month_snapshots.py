@@ -0,0 +1,171 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+FACT_MODELS = {
+    'CUSTOMER': 'CustomerData',
+    'TRANSACTION': 'TransactionData',
+    'TOTAL_USER': 'TotalUser',
+    'TOTAL_TRANSACTION': 'TotalTransaction',
+}
+
+# Detail model -> (key columns, measure columns); rows dated on different
+# days of a month were distinct before, and are one row of the month now
+DETAIL_KEYS = {
+    'CustomerData': (['branch_code_id', 'customer_category_id', 'service_type_id', 'status'], ['number_of_customers']),
+    'TransactionData': (
+        ['range_of_transactions', 'form_of_instrument_id', 'type_of_transaction_id', 'geographical_location_id',
+         'channel_used_id'],
+        ['number_of_transactions', 'amount'],
+    ),
+}
+
+
+def fold_days(model, schema_editor):
+    """Sum rows sharing a key within one month into the lowest id and delete the rest"""
+    keys, measures = DETAIL_KEYS[model.__name__]
+    table = model._meta.db_table
+    same_key = ' AND '.join(f'b.{column} = a.{column}' for column in keys)
+    same_month = "date_trunc('month', b.month_year) = date_trunc('month', a.month_year)"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} AS a SET {', '.join(f'{column} = s.{column}' for column in measures)}
+            FROM (
+                SELECT MIN(id) AS id, {', '.join(f'SUM({column}) AS {column}' for column in measures)}
+                FROM {table}
+                GROUP BY date_trunc('month', month_year), {', '.join(keys)}
+                HAVING COUNT(*) > 1
+            ) AS s
+            WHERE a.id = s.id
+        """)
+        cursor.execute(f"""
+            DELETE FROM {table} AS a USING {table} AS b
+            WHERE b.id < a.id AND {same_month} AND {same_key}
+        """)
+
+
+def backfill_snapshots(apps, schema_editor):
+    """Make the rows already loaded for each month its first, current snapshot
+
+    Months are keyed by their first day, which rows dated on other days of
+    the month are moved to.
+    """
+    MonthSnapshot = apps.get_model('dashboard', 'MonthSnapshot')
+    CurrentSnapshot = apps.get_model('dashboard', 'CurrentSnapshot')
+    DataUploadLog = apps.get_model('dashboard', 'DataUploadLog')
+    for data_type, model_name in FACT_MODELS.items():
+        model = apps.get_model('dashboard', model_name)
+        if model_name in DETAIL_KEYS:
+            fold_days(model, schema_editor)
+        model.objects.exclude(month_year__day=1).update(month_year=TruncMonth('month_year'))
+        months = model.objects.values('month_year').annotate(rows=Count('id')).order_by('month_year')
+        for month in months:
+            upload_log = DataUploadLog.objects.filter(
+                data_type=data_type, month_year=month['month_year'], status='SUCCESS'
+            ).order_by('-upload_date').first()
+            snapshot = MonthSnapshot.objects.create(
+                data_type=data_type, month_year=month['month_year'], version=1,
+                upload_log=upload_log, row_count=month['rows'],
+            )
+            CurrentSnapshot.objects.create(data_type=data_type, month_year=month['month_year'], snapshot=snapshot)
+            model.objects.filter(month_year=month['month_year']).update(snapshot=snapshot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_archived_months'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data'), ('TOTAL_USER', 'Total User Data'), ('TOTAL_TRANSACTION', 'Total Transaction Data')], max_length=20)),
+                ('month_year', models.DateField()),
+                ('version', models.PositiveIntegerField()),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('upload_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='snapshots', to='dashboard.datauploadlog')),
+            ],
+            options={
+                'verbose_name_plural': 'Month Snapshots',
+                'ordering': ['data_type', '-month_year', '-version'],
+                'unique_together': {('data_type', 'month_year', 'version')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CurrentSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data'), ('TOTAL_USER', 'Total User Data'), ('TOTAL_TRANSACTION', 'Total Transaction Data')], max_length=20)),
+                ('month_year', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('snapshot', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='current', to='dashboard.monthsnapshot')),
+            ],
+            options={
+                'unique_together': {('data_type', 'month_year')},
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='customerdata',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='transactiondata',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='customerdata',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.AddField(
+            model_name='totaltransaction',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.AddField(
+            model_name='totaluser',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.AddField(
+            model_name='transactiondata',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customerdata',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.AlterField(
+            model_name='totaltransaction',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.AlterField(
+            model_name='totaluser',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.AlterField(
+            model_name='transactiondata',
+            name='snapshot',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='dashboard.monthsnapshot'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='customerdata',
+            unique_together={('snapshot', 'branch_code', 'customer_category', 'service_type', 'status')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='transactiondata',
+            unique_together={('snapshot', 'range_of_transactions', 'form_of_instrument', 'type_of_transaction', 'geographical_location', 'channel_used')},
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_month_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data')], max_length=20)),
+                ('month_year', models.DateField()),
+                ('series', models.CharField(max_length=255)),
+                ('measure', models.CharField(max_length=30)),
+                ('value', models.FloatField()),
+                ('expected', models.FloatField()),
+                ('score', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='dashboard.monthsnapshot')),
+                ('upload_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='dashboard.datauploadlog')),
+            ],
+            options={
+                'verbose_name_plural': 'Data Anomalies',
+                'indexes': [models.Index(fields=['month_year', 'data_type'], name='anomaly_month_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_data_anomalies'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerdata',
+            index=models.Index(fields=['month_year', 'service_type', 'status', '-number_of_customers'], include=('branch_code', 'customer_category', 'snapshot'), name='customerdata_rank_idx'),
+        ),
+    ]
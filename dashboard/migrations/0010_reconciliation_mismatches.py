@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_customer_rank_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationMismatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(choices=[('CUSTOMER', 'Customer Data vs Total Users'), ('TRANSACTION', 'Transaction Data vs Total Transactions')], max_length=20)),
+                ('month_year', models.DateField()),
+                ('dimensions', models.CharField(max_length=255)),
+                ('measure', models.CharField(max_length=30)),
+                ('expected', models.DecimalField(decimal_places=2, max_digits=17)),
+                ('actual', models.DecimalField(decimal_places=2, max_digits=17)),
+                ('difference', models.DecimalField(decimal_places=2, max_digits=17)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('detail_snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detail_mismatches', to='dashboard.monthsnapshot')),
+                ('total_snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='total_mismatches', to='dashboard.monthsnapshot')),
+                ('upload_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='mismatches', to='dashboard.datauploadlog')),
+            ],
+            options={
+                'verbose_name_plural': 'Reconciliation Mismatches',
+                'indexes': [models.Index(fields=['month_year', 'data_type'], name='mismatch_month_idx')],
+            },
+        ),
+    ]
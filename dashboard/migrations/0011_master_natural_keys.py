@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:39
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Upper
+
+MASTER_KEYS = {
+    'Branch': 'branch_code',
+    'CustomerCategory': 'category_name',
+    'ServiceType': 'service_name',
+    'TransactionRange': 'range_name',
+    'TransactionType': 'transaction_type_name',
+    'InstrumentType': 'instrument_type_name',
+    'GeographicalLocation': 'location_name',
+    'ChannelUsed': 'channel_name',
+}
+
+
+def check_no_duplicates(apps, schema_editor):
+    """Stop with instructions rather than a bare IntegrityError when duplicates remain"""
+    for model_name, key in MASTER_KEYS.items():
+        model = apps.get_model('dashboard', model_name)
+        duplicated = model.objects.values(name=Upper(key)).annotate(rows=Count('id')).filter(rows__gt=1)
+        if duplicated.exists():
+            raise RuntimeError(
+                f"{model_name} has names that differ only in case. "
+                "Run 'python manage.py dedupe_master_tables' and migrate again."
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_reconciliation_mismatches'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='branch',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('branch_code'), name='branch_code_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='channelused',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('channel_name'), name='channel_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='customercategory',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('category_name'), name='category_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='geographicallocation',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('location_name'), name='location_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='instrumenttype',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('instrument_type_name'), name='instrument_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='servicetype',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('service_name'), name='service_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='transactionrange',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('range_name'), name='range_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='transactiontype',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('transaction_type_name'), name='tx_type_name_ci_unique'),
+        ),
+    ]
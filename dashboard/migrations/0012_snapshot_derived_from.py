@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_master_natural_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthsnapshot',
+            name='derived_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='derived', to='dashboard.monthsnapshot'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_snapshot_derived_from'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerdata',
+            name='fiscal_month',
+            field=models.ForeignObject(editable=False, from_fields=['month_year'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='dashboard.fiscalcalendar', to_fields=['month_year']),
+        ),
+        migrations.AddField(
+            model_name='transactiondata',
+            name='fiscal_month',
+            field=models.ForeignObject(editable=False, from_fields=['month_year'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='dashboard.fiscalcalendar', to_fields=['month_year']),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:11
+
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    """Store the totals of months archived before they were kept with the month"""
+    import numpy as np
+
+    from dashboard.archive import month_totals
+
+    ArchivedMonth = apps.get_model('dashboard', 'ArchivedMonth')
+    for archived in ArchivedMonth.objects.filter(totals={}):
+        path = Path(settings.MEDIA_ROOT) / archived.file_name
+        if not path.exists():
+            # Left empty; the month is then read from its file, which reports the problem
+            continue
+        with np.load(path) as archive_file:
+            archived.totals = month_totals(archived.data_type, archive_file)
+        archived.save(update_fields=['totals'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_detail_fiscal_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedmonth',
+            name='totals',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:16
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.db.models.functions import TruncMonth
+
+FACT_MODELS = {
+    'CUSTOMER': 'CustomerData',
+    'TRANSACTION': 'TransactionData',
+    'TOTAL_USER': 'TotalUser',
+    'TOTAL_TRANSACTION': 'TotalTransaction',
+}
+# Detail model -> (key columns, measure columns), as in 0007
+DETAIL_KEYS = {
+    'CustomerData': (['branch_code_id', 'customer_category_id', 'service_type_id', 'status'], ['number_of_customers']),
+    'TransactionData': (
+        ['range_of_transactions', 'form_of_instrument_id', 'type_of_transaction_id', 'geographical_location_id',
+         'channel_used_id'],
+        ['number_of_transactions', 'amount'],
+    ),
+}
+
+
+def merge_rows(model, snapshot_ids, target, schema_editor):
+    """Copy the rows of several snapshots into target, summing detail rows that share a key"""
+    table = model._meta.db_table
+    if model.__name__ in DETAIL_KEYS:
+        keys, measures = DETAIL_KEYS[model.__name__]
+        sql = f"""
+            INSERT INTO {table} ({', '.join(keys + measures)}, month_year, snapshot_id, created_at, updated_at)
+            SELECT {', '.join(keys)}, {', '.join(f'SUM({column})' for column in measures)}, %s, %s,
+                   MIN(created_at), MAX(updated_at)
+            FROM {table} WHERE snapshot_id = ANY(%s)
+            GROUP BY {', '.join(keys)}
+        """
+    else:
+        columns = ', '.join(
+            field.column for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in ('snapshot', 'month_year')
+        )
+        sql = f"""
+            INSERT INTO {table} ({columns}, month_year, snapshot_id)
+            SELECT {columns}, %s, %s FROM {table} WHERE snapshot_id = ANY(%s)
+        """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql, [target.month_year, target.pk, list(snapshot_ids)])
+
+
+def merge_month_days(apps, schema_editor):
+    """Key the snapshots backfilled on other days of a month by its first day
+
+    Before 0007 grouped by month, each day a month had rows on became a
+    current snapshot of its own, so the month was counted once per day.
+    Those snapshots become earlier versions of the month. If the month's
+    current version is still the backfilled one, the days' rows are merged
+    into a new current version; a later version replaced the whole month
+    and stays current.
+    """
+    MonthSnapshot = apps.get_model('dashboard', 'MonthSnapshot')
+    CurrentSnapshot = apps.get_model('dashboard', 'CurrentSnapshot')
+    for data_type, model_name in FACT_MODELS.items():
+        model = apps.get_model('dashboard', model_name)
+        stray_days = MonthSnapshot.objects.filter(data_type=data_type).exclude(month_year__day=1)
+        months = sorted({day.replace(day=1) for day in stray_days.values_list('month_year', flat=True)})
+        for month in months:
+            next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+            in_month = MonthSnapshot.objects.filter(data_type=data_type, month_year__gte=month, month_year__lt=next_month)
+            first = CurrentSnapshot.objects.filter(data_type=data_type, month_year=month).select_related('snapshot').first()
+            strays = CurrentSnapshot.objects.filter(data_type=data_type, month_year__gt=month, month_year__lt=next_month)
+            parts = []
+            if first is None or first.snapshot.version == 1:
+                parts = list(strays.values_list('snapshot_id', flat=True)) + ([first.snapshot_id] if first else [])
+            strays.delete()
+
+            version = in_month.filter(month_year=month).aggregate(latest=Max('version'))['latest'] or 0
+            for snapshot in in_month.exclude(month_year=month).order_by('created_at', 'pk'):
+                version += 1
+                snapshot.month_year = month
+                snapshot.version = version
+                snapshot.save(update_fields=['month_year', 'version'])
+
+            if len(parts) > 1:
+                merged = MonthSnapshot.objects.create(data_type=data_type, month_year=month, version=version + 1)
+                merge_rows(model, parts, merged, schema_editor)
+                parts = [merged.pk]
+            if parts:
+                CurrentSnapshot.objects.update_or_create(
+                    data_type=data_type, month_year=month, defaults={'snapshot_id': parts[0]}
+                )
+
+        # Includes rows copied into first-day snapshots by admin edits
+        model.objects.exclude(month_year__day=1).update(month_year=TruncMonth('month_year'))
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {MonthSnapshot._meta.db_table} AS s SET row_count = c.rows
+                FROM (SELECT snapshot_id, COUNT(*) AS rows FROM {model._meta.db_table} GROUP BY snapshot_id) AS c
+                WHERE s.id = c.snapshot_id AND s.row_count <> c.rows
+            """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_archived_month_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthsnapshot',
+            name='admin_edits',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(merge_month_days, migrations.RunPython.noop),
+    ]
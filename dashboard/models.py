@@ -1,7 +1,18 @@
 from django.db import models
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+class CurrentSnapshotManager(models.Manager):
+    """Rows belonging to each month's current snapshot"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            snapshot__in=CurrentSnapshot.objects.values('snapshot_id')
+        )
+
+
 class Branch(models.Model):
     branch_code = models.CharField(max_length=20)
     branch_name = models.CharField(max_length=100)
@@ -11,6 +22,18 @@ class Branch(models.Model):
     
     class Meta:
         verbose_name_plural = "Branches"
+        constraints = [
+            # Natural keys ignore case; the index also serves the iexact lookups made on upload
+            models.UniqueConstraint(Upper('branch_code'), name='branch_code_ci_unique'),
+        ]
+        indexes = [
+            # Serve the admin's prefix (istartswith) searches
+            models.Index(OpClass(Upper('branch_code'), name='text_pattern_ops'), name='branch_code_prefix_idx'),
+            models.Index(OpClass(Upper('branch_name'), name='text_pattern_ops'), name='branch_name_prefix_idx'),
+            # Serve the master parameter API's substring (icontains) searches
+            GinIndex(OpClass(Upper('branch_code'), name='gin_trgm_ops'), name='branch_code_trgm_idx'),
+            GinIndex(OpClass(Upper('branch_name'), name='gin_trgm_ops'), name='branch_name_trgm_idx'),
+        ]
 
 class CustomerCategory(models.Model):
     category_name = models.CharField(max_length=50)
@@ -20,6 +43,12 @@ class CustomerCategory(models.Model):
     
     class Meta:
         verbose_name_plural = "Customer Categories"
+        constraints = [
+            models.UniqueConstraint(Upper('category_name'), name='category_name_ci_unique'),
+        ]
+        indexes = [
+            GinIndex(OpClass(Upper('category_name'), name='gin_trgm_ops'), name='category_name_trgm_idx'),
+        ]
 
 class ServiceType(models.Model):
     service_name = models.CharField(max_length=50)
@@ -29,6 +58,12 @@ class ServiceType(models.Model):
     
     class Meta:
         verbose_name_plural = "Service Types"
+        constraints = [
+            models.UniqueConstraint(Upper('service_name'), name='service_name_ci_unique'),
+        ]
+        indexes = [
+            GinIndex(OpClass(Upper('service_name'), name='gin_trgm_ops'), name='service_name_trgm_idx'),
+        ]
 
 class TransactionRange(models.Model):
     range_name = models.CharField(max_length=50)
@@ -38,6 +73,12 @@ class TransactionRange(models.Model):
     
     class Meta:
         verbose_name_plural = "Transaction Ranges"
+        constraints = [
+            models.UniqueConstraint(Upper('range_name'), name='range_name_ci_unique'),
+        ]
+        indexes = [
+            GinIndex(OpClass(Upper('range_name'), name='gin_trgm_ops'), name='range_name_trgm_idx'),
+        ]
 
 class TransactionType(models.Model):
     transaction_type_name = models.CharField(max_length=50)
@@ -47,6 +88,12 @@ class TransactionType(models.Model):
     
     class Meta:
         verbose_name_plural = "Transaction Types"
+        constraints = [
+            models.UniqueConstraint(Upper('transaction_type_name'), name='tx_type_name_ci_unique'),
+        ]
+        indexes = [
+            GinIndex(OpClass(Upper('transaction_type_name'), name='gin_trgm_ops'), name='tx_type_name_trgm_idx'),
+        ]
 
 class InstrumentType(models.Model):
     instrument_type_name = models.CharField(max_length=50)
@@ -56,6 +103,12 @@ class InstrumentType(models.Model):
     
     class Meta:
         verbose_name_plural = "Instrument Types"
+        constraints = [
+            models.UniqueConstraint(Upper('instrument_type_name'), name='instrument_name_ci_unique'),
+        ]
+        indexes = [
+            GinIndex(OpClass(Upper('instrument_type_name'), name='gin_trgm_ops'), name='instrument_name_trgm_idx'),
+        ]
 
 class GeographicalLocation(models.Model):
     location_name = models.CharField(max_length=50)
@@ -65,6 +118,12 @@ class GeographicalLocation(models.Model):
     
     class Meta:
         verbose_name_plural = "Geographical Locations"
+        constraints = [
+            models.UniqueConstraint(Upper('location_name'), name='location_name_ci_unique'),
+        ]
+        indexes = [
+            GinIndex(OpClass(Upper('location_name'), name='gin_trgm_ops'), name='location_name_trgm_idx'),
+        ]
 
 class ChannelUsed(models.Model):
     channel_name = models.CharField(max_length=50)
@@ -74,6 +133,32 @@ class ChannelUsed(models.Model):
     
     class Meta:
         verbose_name_plural = "Channels Used"
+        constraints = [
+            models.UniqueConstraint(Upper('channel_name'), name='channel_name_ci_unique'),
+        ]
+        indexes = [
+            GinIndex(OpClass(Upper('channel_name'), name='gin_trgm_ops'), name='channel_name_trgm_idx'),
+        ]
+
+class FiscalCalendar(models.Model):
+    month_year = models.DateField(unique=True)
+    fiscal_year = models.CharField(max_length=10)
+    fiscal_year_start = models.PositiveIntegerField()
+    fiscal_quarter = models.PositiveSmallIntegerField()
+    fiscal_month = models.PositiveSmallIntegerField()
+    nepali_year = models.PositiveIntegerField()
+    nepali_month = models.PositiveSmallIntegerField()
+    nepali_month_name = models.CharField(max_length=20)
+
+    def __str__(self):
+        return f"{self.month_year:%Y-%m} - {self.fiscal_year} Q{self.fiscal_quarter}"
+
+    class Meta:
+        verbose_name_plural = "Fiscal Calendar"
+        ordering = ['month_year']
+        indexes = [
+            models.Index(fields=['fiscal_year_start', 'fiscal_quarter'], name='fiscalcal_period_idx'),
+        ]
 
 class CustomerData(models.Model):
     branch_code = models.ForeignKey(Branch, on_delete=models.CASCADE)
@@ -82,15 +167,34 @@ class CustomerData(models.Model):
     status = models.CharField(max_length=20, choices=[('ACTIVE', 'Active'), ('INACTIVE', 'Inactive')])
     number_of_customers = models.IntegerField(validators=[MinValueValidator(0)])
     month_year = models.DateField()
+    snapshot = models.ForeignKey('MonthSnapshot', on_delete=models.CASCADE, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # The month's fiscal period, joined on month_year (no column of its own)
+    fiscal_month = models.ForeignObject(
+        FiscalCalendar, on_delete=models.DO_NOTHING, from_fields=['month_year'], to_fields=['month_year'],
+        null=True, editable=False, related_name='+',
+    )
+
+    # Read views see the current snapshot only; ingest and clean-up use all_versions
+    objects = CurrentSnapshotManager()
+    all_versions = models.Manager()
     
     def __str__(self):
         return f"{self.branch_code} - {self.customer_category} - {self.month_year}"
     
     class Meta:
         verbose_name_plural = "Customer Data"
-        unique_together = ['branch_code', 'customer_category', 'service_type', 'status', 'month_year']
+        unique_together = ['snapshot', 'branch_code', 'customer_category', 'service_type', 'status']
+        indexes = [
+            models.Index(fields=['month_year'], name='customerdata_month_idx'),
+            # Branch leaderboard: the month's filtered slice is read from the index alone
+            models.Index(
+                fields=['month_year', 'service_type', 'status', '-number_of_customers'],
+                include=['branch_code', 'customer_category', 'snapshot'],
+                name='customerdata_rank_idx',
+            ),
+        ]
 
 class TransactionData(models.Model):
     month_year = models.DateField()
@@ -101,20 +205,32 @@ class TransactionData(models.Model):
     channel_used = models.ForeignKey(ChannelUsed, on_delete=models.CASCADE)
     number_of_transactions = models.IntegerField(validators=[MinValueValidator(0)])
     amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))])
+    snapshot = models.ForeignKey('MonthSnapshot', on_delete=models.CASCADE, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # The month's fiscal period, joined on month_year (no column of its own)
+    fiscal_month = models.ForeignObject(
+        FiscalCalendar, on_delete=models.DO_NOTHING, from_fields=['month_year'], to_fields=['month_year'],
+        null=True, editable=False, related_name='+',
+    )
+
+    objects = CurrentSnapshotManager()
+    all_versions = models.Manager()
     
     def __str__(self):
         return f"{self.range_of_transactions} - {self.month_year}"
     
     class Meta:
         verbose_name_plural = "Transaction Data"
-        unique_together = ['month_year', 'range_of_transactions', 'form_of_instrument', 'type_of_transaction', 'geographical_location', 'channel_used']
+        unique_together = ['snapshot', 'range_of_transactions', 'form_of_instrument', 'type_of_transaction', 'geographical_location', 'channel_used']
+        indexes = [
+            models.Index(OpClass(Upper('range_of_transactions'), name='text_pattern_ops'), name='txdata_range_prefix_idx'),
+        ]
 
 class DataUploadLog(models.Model):
     upload_date = models.DateTimeField(auto_now_add=True)
     month_year = models.DateField()
-    data_type = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data')])
+    data_type = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data'), ('TOTAL_USER', 'Total User Data'), ('TOTAL_TRANSACTION', 'Total Transaction Data')])
     file_name = models.CharField(max_length=255)
     records_uploaded = models.IntegerField(default=0)
     status = models.CharField(max_length=20, choices=[('SUCCESS', 'Success'), ('FAILED', 'Failed'), ('PARTIAL', 'Partial')])
@@ -127,25 +243,143 @@ class DataUploadLog(models.Model):
         verbose_name_plural = "Data Upload Logs"
 
 
+class MonthSnapshot(models.Model):
+    """A numbered version of one month of one data type
+
+    Versions are immutable, except that admin edits are made in place in
+    the month's current version once it is an admin_edits version.
+    """
+    data_type = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data'), ('TOTAL_USER', 'Total User Data'), ('TOTAL_TRANSACTION', 'Total Transaction Data')])
+    month_year = models.DateField()
+    version = models.PositiveIntegerField()
+    upload_log = models.ForeignKey(DataUploadLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='snapshots')
+    # The detail version a derived total version was built from
+    derived_from = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='derived')
+    # Made by the admin to hold its edits to the month while it stays current
+    admin_edits = models.BooleanField(default=False)
+    row_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.data_type} - {self.month_year:%Y-%m} v{self.version}"
+
+    class Meta:
+        verbose_name_plural = "Month Snapshots"
+        unique_together = ['data_type', 'month_year', 'version']
+        ordering = ['data_type', '-month_year', '-version']
+
+
+class CurrentSnapshot(models.Model):
+    """Per-month pointer to the snapshot the read views see"""
+    data_type = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data'), ('TOTAL_USER', 'Total User Data'), ('TOTAL_TRANSACTION', 'Total Transaction Data')])
+    month_year = models.DateField()
+    snapshot = models.OneToOneField(MonthSnapshot, on_delete=models.PROTECT, related_name='current')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.data_type} - {self.month_year:%Y-%m} -> v{self.snapshot.version}"
+
+    class Meta:
+        unique_together = ['data_type', 'month_year']
+
+
+class DataAnomaly(models.Model):
+    """A value in an uploaded month that deviates sharply from its series' history"""
+    data_type = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data')])
+    month_year = models.DateField()
+    snapshot = models.ForeignKey(MonthSnapshot, on_delete=models.CASCADE, related_name='anomalies')
+    upload_log = models.ForeignKey(DataUploadLog, on_delete=models.CASCADE, null=True, blank=True, related_name='anomalies')
+    series = models.CharField(max_length=255)
+    measure = models.CharField(max_length=30)
+    value = models.FloatField()
+    expected = models.FloatField()
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.series} {self.measure} ({self.month_year:%Y-%m}, z={self.score:.1f})"
+
+    class Meta:
+        verbose_name_plural = "Data Anomalies"
+        indexes = [
+            models.Index(fields=['month_year', 'data_type'], name='anomaly_month_idx'),
+        ]
+
+
+class ReconciliationMismatch(models.Model):
+    """A dimension tuple where a month's detail rows do not add up to its totals"""
+    data_type = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer Data vs Total Users'), ('TRANSACTION', 'Transaction Data vs Total Transactions')])
+    month_year = models.DateField()
+    detail_snapshot = models.ForeignKey(MonthSnapshot, on_delete=models.CASCADE, related_name='detail_mismatches')
+    total_snapshot = models.ForeignKey(MonthSnapshot, on_delete=models.CASCADE, related_name='total_mismatches')
+    upload_log = models.ForeignKey(DataUploadLog, on_delete=models.CASCADE, null=True, blank=True, related_name='mismatches')
+    dimensions = models.CharField(max_length=255)
+    measure = models.CharField(max_length=30)
+    # expected is the total table's figure, actual the sum of the detail rows
+    expected = models.DecimalField(max_digits=17, decimal_places=2)
+    actual = models.DecimalField(max_digits=17, decimal_places=2)
+    difference = models.DecimalField(max_digits=17, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.dimensions} {self.measure} ({self.month_year:%Y-%m}, {self.difference:+})"
+
+    class Meta:
+        verbose_name_plural = "Reconciliation Mismatches"
+        indexes = [
+            models.Index(fields=['month_year', 'data_type'], name='mismatch_month_idx'),
+        ]
+
+
+class ArchivedMonth(models.Model):
+    data_type = models.CharField(max_length=20, choices=[('CUSTOMER', 'Customer Data'), ('TRANSACTION', 'Transaction Data')])
+    month_year = models.DateField()
+    file_name = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64)
+    row_count = models.PositiveIntegerField()
+    # Totals per status or transaction type (see archive.month_totals)
+    totals = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.data_type} - {self.month_year} ({self.row_count} rows)"
+
+    class Meta:
+        verbose_name_plural = "Archived Months"
+        unique_together = ['data_type', 'month_year']
+
+
 class TotalUser(models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
         ('inactive', 'Inactive'),
     ]
     fiscal_year = models.CharField(max_length=10)
+    fiscal_quarter = models.PositiveSmallIntegerField(null=True, blank=True)
     month_year = models.DateField()
     service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     count = models.PositiveIntegerField()
+    snapshot = models.ForeignKey('MonthSnapshot', on_delete=models.CASCADE, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CurrentSnapshotManager()
+    all_versions = models.Manager()
+
     def __str__(self):
         return f"{self.service_type} - {self.status} ({self.month_year})"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['month_year'], name='totaluser_month_idx'),
+            models.Index(fields=['fiscal_year', 'fiscal_quarter', 'month_year'], name='totaluser_fiscal_idx'),
+        ]
+
 
 class TotalTransaction(models.Model):
     fiscal_year = models.CharField(max_length=10)
+    fiscal_quarter = models.PositiveSmallIntegerField(null=True, blank=True)
     month_year = models.DateField()
     transaction_range = models.ForeignKey(TransactionRange, on_delete=models.CASCADE)
     type_of_transaction = models.ForeignKey(TransactionType, on_delete=models.CASCADE)
@@ -154,8 +388,18 @@ class TotalTransaction(models.Model):
     channel_used = models.ForeignKey(ChannelUsed, on_delete=models.CASCADE)
     number_of_transactions = models.PositiveIntegerField()
     amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))])
+    snapshot = models.ForeignKey('MonthSnapshot', on_delete=models.CASCADE, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CurrentSnapshotManager()
+    all_versions = models.Manager()
+
     def __str__(self):
-        return f"{self.transaction_range} - {self.type_of_transaction} - {self.month_year}"
\ No newline at end of file
+        return f"{self.transaction_range} - {self.type_of_transaction} - {self.month_year}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['month_year'], name='totaltx_month_idx'),
+            models.Index(fields=['fiscal_year', 'fiscal_quarter', 'month_year'], name='totaltx_fiscal_idx'),
+        ]
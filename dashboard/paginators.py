@@ -0,0 +1,63 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Sum
+from django.utils.functional import cached_property
+
+from .models import MonthSnapshot
+from .snapshots import SNAPSHOT_MODELS, data_type_for
+
+# Below this many rows an exact COUNT(*) is cheap enough to keep
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+def current_snapshot_row_count(model, using='default'):
+    """Rows visible through a fact model's current snapshots, from the snapshot row counts"""
+    return MonthSnapshot.objects.using(using).filter(
+        data_type=data_type_for(model), current__isnull=False
+    ).aggregate(total=Sum('row_count'))['total'] or 0
+
+
+def estimated_row_count(model, using='default'):
+    """Return the planner's row estimate for a model's table, or None"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if not row or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that skips the exact COUNT(*) on large unfiltered tables
+
+    Fact model querysets are only counted from the snapshot row counts when
+    marked as an unfiltered listing of the current rows (see
+    mark_unfiltered_listing).
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        model = getattr(self.object_list, 'model', None)
+        if model in SNAPSHOT_MODELS.values() and getattr(self.object_list, 'unfiltered_listing', False):
+            return current_snapshot_row_count(model, self.object_list.db)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+def mark_unfiltered_listing(queryset):
+    """Mark a fact model's default-manager queryset as listing every current row
+
+    The mark is not carried over to querysets derived from it.
+    """
+    queryset.unfiltered_listing = True
+    return queryset
@@ -0,0 +1,157 @@
+"""Fail-fast checks on an upload before anything is written
+
+The header and the first PREVALIDATION_SAMPLE_ROWS rows of each file are
+checked: every mapped column must be present, numbers must parse and be
+non-negative, statuses must be known, dimension values are looked up in
+the master tables (one query per table) and repeated keys are reported.
+A file with errors is rejected before the ingest opens its transaction,
+so a malformed file no longer costs a full load and rollback.
+"""
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+
+from .ingest import DimensionCache
+from .models import (
+    Branch, ChannelUsed, CustomerCategory, GeographicalLocation, InstrumentType, ServiceType,
+    TransactionRange, TransactionType
+)
+from .uploads import remap_row, resolve_headers
+
+PREVALIDATION_SAMPLE_ROWS = 500
+PREVIEW_ROWS = 10
+# Stop listing problems after this many; the file is rejected either way
+MAX_REPORTED_PROBLEMS = 10
+
+STATUSES = {'ACTIVE', 'INACTIVE'}
+
+# Column -> check: 'count' and 'amount' are non-negative numbers, 'status'
+# is ACTIVE/INACTIVE in any case, 'text' must not be empty and a
+# (model, field) pair must name an existing master row.
+UPLOAD_CHECKS = {
+    'CUSTOMER': {
+        'branch_code': (Branch, 'branch_code'),
+        'branch_name': 'text',
+        'customer_category': (CustomerCategory, 'category_name'),
+        'service_type': (ServiceType, 'service_name'),
+        'status': 'status',
+        'number_of_customers': 'count',
+    },
+    'TRANSACTION': {
+        # Kept as text; derived totals add any range the master table lacks
+        'range_of_transactions': 'text',
+        'form_of_instrument': (InstrumentType, 'instrument_type_name'),
+        'type_of_transaction': (TransactionType, 'transaction_type_name'),
+        'geographical_location': (GeographicalLocation, 'location_name'),
+        'channel_used': (ChannelUsed, 'channel_name'),
+        'number_of_transactions': 'count',
+        'amount': 'amount',
+    },
+    'TOTAL_USER': {
+        'service_type': (ServiceType, 'service_name'),
+        'status': 'status',
+        'count': 'count',
+    },
+    'TOTAL_TRANSACTION': {
+        'range_of_transactions': (TransactionRange, 'range_name'),
+        'type_of_transaction': (TransactionType, 'transaction_type_name'),
+        'form_of_instrument': (InstrumentType, 'instrument_type_name'),
+        'geographical_location': (GeographicalLocation, 'location_name'),
+        'channel_used': (ChannelUsed, 'channel_name'),
+        'number_of_transactions': 'count',
+        'amount': 'amount',
+    },
+}
+# Columns identifying a row; the detail processors keep the last of repeated
+# keys, while repeated total rows would be counted twice
+UPLOAD_KEYS = {
+    'CUSTOMER': ['branch_code', 'customer_category', 'service_type', 'status'],
+    'TRANSACTION': ['range_of_transactions', 'form_of_instrument', 'type_of_transaction', 'geographical_location', 'channel_used'],
+    'TOTAL_USER': ['service_type', 'status'],
+    'TOTAL_TRANSACTION': ['range_of_transactions', 'type_of_transaction', 'form_of_instrument', 'geographical_location', 'channel_used'],
+}
+DUPLICATES_REPLACE = {'CUSTOMER', 'TRANSACTION'}
+
+
+def _value_problem(check, value):
+    if check == 'count':
+        if not value.isdigit():
+            return 'is not a whole number of 0 or more'
+    elif check == 'amount':
+        try:
+            if Decimal(value) < 0:
+                return 'is negative'
+        except InvalidOperation:
+            return 'is not a number'
+    elif check == 'status':
+        if value.upper() not in STATUSES:
+            return 'must be Active or Inactive'
+    elif not value:
+        return 'is empty'
+    return None
+
+
+def prevalidate(data_type, rows, mapping, allow_new_values=False):
+    """Check an upload's header and sample rows
+
+    Returns (report, rows): report has 'errors', 'warnings', 'headers'
+    ({column: file header or None}), 'preview' (the first PREVIEW_ROWS
+    mapped rows) and 'sampled'; rows iterates over every row of the file,
+    sample included, keyed by column name.
+    """
+    rows = iter(rows)
+    sample = list(islice(rows, PREVALIDATION_SAMPLE_ROWS))
+    report = {'errors': [], 'warnings': [], 'headers': {}, 'preview': [], 'sampled': len(sample)}
+    if not sample:
+        report['errors'].append('The file has no data rows.')
+        return report, iter(())
+
+    headers = resolve_headers(sample[0].keys(), mapping)
+    report['headers'] = headers
+    missing = [mapping[column] for column, header in headers.items() if header is None]
+    if missing:
+        report['errors'].append(f"Missing column{'s' if len(missing) > 1 else ''}: {', '.join(missing)}.")
+        return report, iter(())
+
+    mapped = [remap_row(row, headers) for row in sample]
+    report['preview'] = mapped[:PREVIEW_ROWS]
+    checks = UPLOAD_CHECKS[data_type]
+    problems = []
+    unknown = {column: set() for column, check in checks.items() if isinstance(check, tuple)}
+    for line, row in enumerate(mapped, start=2):
+        for column, check in checks.items():
+            value = row[column].strip()
+            problem = _value_problem('text' if isinstance(check, tuple) else check, value)
+            if problem:
+                problems.append(f"Row {line}: {mapping[column]} '{value}' {problem}.")
+            elif isinstance(check, tuple):
+                unknown[column].add(value)
+
+    # Dimension values are matched like DimensionCache matches them on ingest
+    for column, values in unknown.items():
+        model, field = checks[column]
+        known = DimensionCache(model, field).ids
+        new_values = sorted(value for value in values if value.upper() not in known)
+        if new_values:
+            message = f"{mapping[column]} has values not in {model._meta.verbose_name_plural}: {', '.join(new_values[:5])}"
+            message += f" and {len(new_values) - 5} more." if len(new_values) > 5 else '.'
+            if allow_new_values:
+                report['warnings'].append(message + ' They will be added.')
+            else:
+                problems.append(message)
+
+    keys = Counter(
+        tuple(row[column].strip().upper() for column in UPLOAD_KEYS[data_type]) for row in mapped
+    )
+    repeated = sum(count - 1 for count in keys.values() if count > 1)
+    if repeated:
+        message = f"{repeated} sampled {'rows repeat' if repeated > 1 else 'row repeats'} an earlier row's {', '.join(mapping[column] for column in UPLOAD_KEYS[data_type])}"
+        if data_type in DUPLICATES_REPLACE:
+            report['warnings'].append(message + '; the last of each is kept.')
+        else:
+            problems.append(message + ' and would be counted twice.')
+
+    report['errors'] = problems[:MAX_REPORTED_PROBLEMS]
+    if len(problems) > MAX_REPORTED_PROBLEMS:
+        report['errors'].append(f"... and {len(problems) - MAX_REPORTED_PROBLEMS} more problems.")
+    return report, (remap_row(row, headers) for row in chain(sample, rows))
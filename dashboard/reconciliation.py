@@ -0,0 +1,142 @@
+"""Reconciliation of detail data against the monthly totals
+
+Customer Data and Total Users (and Transaction Data and Total
+Transactions) describe the same month at different grain. For each pair
+a single INSERT ... SELECT groups the current detail rows to the totals'
+grain, FULL OUTER JOINs them with the current totals and stores every
+dimension tuple whose figures differ, including tuples present on one
+side only.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    ChannelUsed, CustomerData, GeographicalLocation, InstrumentType, ReconciliationMismatch,
+    ServiceType, TotalTransaction, TotalUser, TransactionData, TransactionRange, TransactionType
+)
+from .snapshots import current_snapshot
+
+RECONCILIATION_SQL = """
+INSERT INTO {mismatch_table}
+    (data_type, month_year, detail_snapshot_id, total_snapshot_id, upload_log_id,
+     dimensions, measure, expected, actual, difference, created_at)
+SELECT %(data_type)s, %(month)s, %(detail_snapshot)s, %(total_snapshot)s, %(upload_log)s,
+       LEFT(CONCAT_WS(' / ', {labels}), 255), m.measure, m.expected, m.actual, m.actual - m.expected, %(now)s
+FROM (
+    SELECT {detail_keys}, {detail_measures}
+    FROM {detail_table} x
+    WHERE x.snapshot_id = %(detail_snapshot)s
+    GROUP BY {key_positions}
+) d
+FULL OUTER JOIN (
+    SELECT {total_keys}, {total_measures}
+    FROM {total_table} x{total_joins}
+    WHERE x.snapshot_id = %(total_snapshot)s
+    GROUP BY {key_positions}
+) t ON {join_condition}
+CROSS JOIN LATERAL (VALUES {measure_values}) m(measure, expected, actual){label_joins}
+WHERE m.expected <> m.actual
+"""
+
+# Detail type -> how its rows map onto the totals' grain. Keys are
+# (name, detail expression, total expression, label table, label column);
+# keys without a label table are shown as they are.
+RECONCILIATION_SPECS = {
+    'CUSTOMER': {
+        'total_type': 'TOTAL_USER',
+        'detail_model': CustomerData,
+        'total_model': TotalUser,
+        'total_joins': '',
+        'keys': [
+            ('service_type_id', 'x.service_type_id', 'x.service_type_id', ServiceType, 'service_name'),
+            ('status', 'LOWER(x.status)', 'x.status', None, None),
+        ],
+        'measures': [
+            ('customers', 'SUM(x.number_of_customers)', 'SUM(x.count)'),
+        ],
+    },
+    'TRANSACTION': {
+        'total_type': 'TOTAL_TRANSACTION',
+        'detail_model': TransactionData,
+        'total_model': TotalTransaction,
+        # Transaction Data keeps the range as text, so ranges are matched by name ignoring case
+        'total_joins': f' JOIN {TransactionRange._meta.db_table} r ON r.id = x.transaction_range_id',
+        'keys': [
+            ('range_name', 'UPPER(TRIM(x.range_of_transactions))', 'UPPER(r.range_name)', None, None),
+            ('type_of_transaction_id', 'x.type_of_transaction_id', 'x.type_of_transaction_id', TransactionType, 'transaction_type_name'),
+            ('form_of_instrument_id', 'x.form_of_instrument_id', 'x.form_of_instrument_id', InstrumentType, 'instrument_type_name'),
+            ('geographical_location_id', 'x.geographical_location_id', 'x.geographical_location_id', GeographicalLocation, 'location_name'),
+            ('channel_used_id', 'x.channel_used_id', 'x.channel_used_id', ChannelUsed, 'channel_name'),
+        ],
+        'measures': [
+            ('number_of_transactions', 'SUM(x.number_of_transactions)', 'SUM(x.number_of_transactions)'),
+            ('amount', 'SUM(x.amount)', 'SUM(x.amount)'),
+        ],
+    },
+}
+
+
+def _reconciliation_sql(spec):
+    keys, measures = spec['keys'], spec['measures']
+    labels, label_joins = [], []
+    for position, (name, _, _, table, column) in enumerate(keys):
+        if table is None:
+            labels.append(f'COALESCE(d.{name}, t.{name})')
+        else:
+            alias = f'l{position}'
+            label_joins.append(
+                f'\nLEFT JOIN {table._meta.db_table} {alias} ON {alias}.id = COALESCE(d.{name}, t.{name})'
+            )
+            labels.append(f'{alias}.{column}')
+    return RECONCILIATION_SQL.format(
+        mismatch_table=ReconciliationMismatch._meta.db_table,
+        detail_table=spec['detail_model']._meta.db_table,
+        total_table=spec['total_model']._meta.db_table,
+        total_joins=spec['total_joins'],
+        labels=', '.join(labels),
+        detail_keys=', '.join(f'{detail} AS {name}' for name, detail, _, _, _ in keys),
+        total_keys=', '.join(f'{total} AS {name}' for name, _, total, _, _ in keys),
+        detail_measures=', '.join(f'{detail} AS {name}' for name, detail, _ in measures),
+        total_measures=', '.join(f'{total} AS {name}' for name, _, total in measures),
+        key_positions=', '.join(str(position) for position in range(1, len(keys) + 1)),
+        join_condition=' AND '.join(f't.{name} = d.{name}' for name, *_ in keys),
+        measure_values=', '.join(
+            f"('{name}', COALESCE(t.{name}, 0)::numeric, COALESCE(d.{name}, 0)::numeric)"
+            for name, _, _ in measures
+        ),
+        label_joins=''.join(label_joins),
+    )
+
+
+def reconcile_month(data_type, month_year, upload_log=None):
+    """Replace the month's stored mismatches between a detail type and its totals
+
+    Returns the number of mismatches, or None when either side has no data
+    for the month.
+    """
+    spec = RECONCILIATION_SPECS[data_type]
+    month = month_year.replace(day=1)
+    detail = current_snapshot(data_type, month)
+    total = current_snapshot(spec['total_type'], month)
+    with transaction.atomic():
+        ReconciliationMismatch.objects.filter(data_type=data_type, month_year=month).delete()
+        if detail is None or total is None:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(_reconciliation_sql(spec), {
+                'data_type': data_type,
+                'month': month,
+                'detail_snapshot': detail.pk,
+                'total_snapshot': total.pk,
+                'upload_log': upload_log and upload_log.pk,
+                'now': timezone.now(),
+            })
+            return cursor.rowcount
+
+
+def reconciled_type(data_type):
+    """The detail type an upload of any of the four types is reconciled under"""
+    for detail_type, spec in RECONCILIATION_SPECS.items():
+        if data_type in (detail_type, spec['total_type']):
+            return detail_type
+    raise KeyError(data_type)
@@ -0,0 +1,204 @@
+"""Monthly MIS report pack: one sheet per breakdown, as XLSX and as a zip of CSVs
+
+Each sheet is a single aggregate query over the month's current data and
+the sheets are built concurrently on a thread pool. Finished packs are
+kept under MEDIA_ROOT/reports keyed by the month's current snapshot ids,
+so a pack is only rebuilt after the month's data changes.
+"""
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q, Sum
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .fiscal import calendar_month
+from .models import CurrentSnapshot, CustomerData, TotalTransaction, TotalUser
+from .shedding import statement_timeout
+
+REPORT_DIR = 'reports'
+REPORT_WORKERS = 4
+# Superseded packs are kept this long so downloads that just looked them up can still open them
+STALE_PACK_GRACE_SECONDS = 300
+
+
+def _rows(queryset, fields, *aggregates):
+    return [
+        [row[field] for field in fields] + [row[name] for name in aggregates]
+        for row in queryset.order_by(*fields)
+    ]
+
+
+def users_by_service(month_year):
+    queryset = TotalUser.objects.filter(month_year=month_year).values(
+        'service_type__service_name'
+    ).annotate(
+        active=Sum('count', filter=Q(status='active')),
+        inactive=Sum('count', filter=Q(status='inactive')),
+        total=Sum('count'),
+    )
+    return (
+        ['Service Type', 'Active', 'Inactive', 'Total'],
+        _rows(queryset, ['service_type__service_name'], 'active', 'inactive', 'total'),
+    )
+
+
+def _transactions_by(field, heading):
+    def build(month_year):
+        queryset = TotalTransaction.objects.filter(month_year=month_year).values(field).annotate(
+            transactions=Sum('number_of_transactions'), amount=Sum('amount'),
+        )
+        return [heading, 'Number of Transactions', 'Amount'], _rows(queryset, [field], 'transactions', 'amount')
+    return build
+
+
+def branch_customers(month_year):
+    queryset = CustomerData.objects.filter(month_year=month_year).values(
+        'branch_code__branch_code', 'branch_code__branch_name',
+        'customer_category__category_name', 'service_type__service_name',
+    ).annotate(
+        active=Sum('number_of_customers', filter=Q(status='ACTIVE')),
+        inactive=Sum('number_of_customers', filter=Q(status='INACTIVE')),
+        total=Sum('number_of_customers'),
+    )
+    fields = [
+        'branch_code__branch_code', 'branch_code__branch_name',
+        'customer_category__category_name', 'service_type__service_name',
+    ]
+    return (
+        ['Branch Code', 'Branch Name', 'Customer Category', 'Service Type', 'Active', 'Inactive', 'Total'],
+        _rows(queryset, fields, 'active', 'inactive', 'total'),
+    )
+
+
+def branch_totals(month_year):
+    queryset = CustomerData.objects.filter(month_year=month_year).values(
+        'branch_code__branch_code', 'branch_code__branch_name'
+    ).annotate(
+        active=Sum('number_of_customers', filter=Q(status='ACTIVE')),
+        inactive=Sum('number_of_customers', filter=Q(status='INACTIVE')),
+        total=Sum('number_of_customers'),
+    )
+    return (
+        ['Branch Code', 'Branch Name', 'Active', 'Inactive', 'Total'],
+        _rows(queryset, ['branch_code__branch_code', 'branch_code__branch_name'], 'active', 'inactive', 'total'),
+    )
+
+
+# Sheet name -> builder returning (header, rows) for a month
+REPORT_SHEETS = {
+    'Users by Service': users_by_service,
+    'Transactions by Range': _transactions_by('transaction_range__range_name', 'Range of Transactions'),
+    'Transactions by Type': _transactions_by('type_of_transaction__transaction_type_name', 'Type of Transaction'),
+    'Transactions by Instrument': _transactions_by('form_of_instrument__instrument_type_name', 'Form of Instrument'),
+    'Transactions by Location': _transactions_by('geographical_location__location_name', 'Geographical Location'),
+    'Transactions by Channel': _transactions_by('channel_used__channel_name', 'Channel Used'),
+    'Branch Totals': branch_totals,
+    'Branch Customers': branch_customers,
+}
+
+
+def data_version(month_year):
+    """Identifies the month's current data; changes on every upload or rollback"""
+    snapshot_ids = CurrentSnapshot.objects.filter(month_year=month_year).order_by('snapshot_id').values_list(
+        'snapshot_id', flat=True
+    )
+    return hashlib.sha1(','.join(map(str, snapshot_ids)).encode()).hexdigest()[:12]
+
+
+def _build_sheet(builder, month_year):
+    try:
+        # The view's statement timeout only covers the request thread's connections
+        with statement_timeout(settings.VIEW_BUDGETS['report_pack']['statement_timeout']):
+            return builder(month_year)
+    finally:
+        # Pool threads open their own connections; do not leave them behind
+        connections.close_all()
+
+
+def build_sheets(month_year):
+    """Run every sheet's query concurrently and return {sheet name: (header, rows)}"""
+    with ThreadPoolExecutor(max_workers=REPORT_WORKERS) as pool:
+        futures = {name: pool.submit(_build_sheet, builder, month_year) for name, builder in REPORT_SHEETS.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def _summary(month_year, version):
+    fiscal_month = calendar_month(month_year)
+    return ['Item', 'Value'], [
+        ['Month', f"{month_year:%Y-%m}"],
+        ['Fiscal Year', fiscal_month.fiscal_year],
+        ['Fiscal Quarter', f"Q{fiscal_month.fiscal_quarter}"],
+        ['Nepali Month', f"{fiscal_month.nepali_month_name} {fiscal_month.nepali_year}"],
+        ['Data Version', version],
+        ['Generated At', timezone.localtime().strftime('%Y-%m-%d %H:%M')],
+    ]
+
+
+def _write_xlsx(sheets, path):
+    workbook = Workbook(write_only=True)
+    for name, (header, rows) in sheets.items():
+        worksheet = workbook.create_sheet(title=name[:31])
+        worksheet.append(header)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(path)
+
+
+def _write_csv_bundle(sheets, path, month_year):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        for name, (header, rows) in sheets.items():
+            text = io.StringIO()
+            writer = csv.writer(text)
+            writer.writerow(header)
+            writer.writerows(rows)
+            bundle.writestr(f"{month_year:%Y-%m}_{name.lower().replace(' ', '_')}.csv", text.getvalue())
+
+
+def report_pack(month_year):
+    """Return {'xlsx': path, 'zip': path} for the month, building the pack if its data changed"""
+    month_year = month_year.replace(day=1)
+    version = data_version(month_year)
+    directory = Path(settings.MEDIA_ROOT) / REPORT_DIR
+    stem = f"mis_report_{month_year:%Y-%m}"
+    paths = {extension: directory / f"{stem}_{version}.{extension}" for extension in ('xlsx', 'zip')}
+    if all(path.exists() for path in paths.values()):
+        return paths
+
+    sheets = {'Summary': _summary(month_year, version), **build_sheets(month_year)}
+    directory.mkdir(parents=True, exist_ok=True)
+    for extension, path in paths.items():
+        # Each build writes its own hidden temp file, so concurrent builds of
+        # a month never share one and the stale-pack glob below skips them
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{path.name}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            if extension == 'xlsx':
+                _write_xlsx(sheets, temp_path)
+            else:
+                _write_csv_bundle(sheets, temp_path, month_year)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    # Packs built from superseded data are never looked up again
+    cutoff = time.time() - STALE_PACK_GRACE_SECONDS
+    for stale in directory.glob(f"{stem}_*"):
+        if stale in paths.values():
+            continue
+        try:
+            if stale.stat().st_mtime < cutoff:
+                stale.unlink()
+        except FileNotFoundError:
+            pass
+    return paths
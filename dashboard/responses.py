@@ -0,0 +1,64 @@
+import gzip
+import json
+import re
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_LENGTH = 200
+
+accepts_gzip = re.compile(r'\bgzip\b').search
+accepts_brotli = re.compile(r'\bbr\b').search
+
+
+def _orjson_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+class ChartJSONEncoder(DjangoJSONEncoder):
+    """Stdlib fallback that emits Decimals as numbers, like the orjson path"""
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
+
+
+def dumps(data):
+    """Serialize data to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_orjson_default)
+    return json.dumps(data, cls=ChartJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def fast_json_response(request, data, status=200):
+    """JSON response encoded with dumps() and compressed per Accept-Encoding"""
+    body = dumps(data)
+    response = HttpResponse(body, content_type='application/json', status=status)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if len(body) < MIN_COMPRESS_LENGTH:
+        return response
+
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if brotli is not None and accepts_brotli(accept_encoding):
+        response.content = brotli.compress(body, quality=5)
+        response['Content-Encoding'] = 'br'
+    elif accepts_gzip(accept_encoding):
+        response.content = gzip.compress(body, compresslevel=6)
+        response['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,123 @@
+"""Read/write routing between the primary database and an optional read replica
+
+Views wrapped in use_replica send their dashboard-model reads to
+settings.REPLICA_DATABASE_ALIAS. Everything else, and every write, uses
+the primary. A user is pinned to the primary for REPLICA_STICKY_SECONDS
+after their own upload, requests passing ?fresh=1 always read the
+primary, and the replica is skipped while it is down or
+lagging more than REPLICA_MAX_LAG_SECONDS.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connections
+
+from .shedding import is_statement_timeout
+
+STICKY_SESSION_KEY = 'replica_pinned_until'
+# Requests that must see just-committed data (e.g. live refreshes) pass ?fresh=1
+FRESH_PARAM = 'fresh'
+
+# Seconds of replay lag on the replica, 0 when it is caught up or is not a standby
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_read_alias = ContextVar('dashboard_read_alias', default=None)
+_replica_health = {'checked_at': None, 'healthy': False}
+
+
+def replica_alias():
+    return getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+
+
+def mark_replica_unhealthy():
+    _replica_health.update(checked_at=time.monotonic(), healthy=False)
+
+
+def replica_available():
+    """Return whether the replica is configured, reachable and caught up
+
+    The result is cached per process for REPLICA_HEALTH_CHECK_INTERVAL seconds.
+    """
+    alias = replica_alias()
+    if alias not in settings.DATABASES:
+        return False
+
+    now = time.monotonic()
+    checked_at = _replica_health['checked_at']
+    if checked_at is not None and now - checked_at < getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 5):
+        return _replica_health['healthy']
+
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL if connection.vendor == 'postgresql' else 'SELECT 0')
+            lag = cursor.fetchone()[0]
+        healthy = lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 10)
+    except DatabaseError:
+        connection.close()
+        healthy = False
+    _replica_health.update(checked_at=now, healthy=healthy)
+    return healthy
+
+
+def pin_to_primary(request):
+    """Serve this user's reads from the primary for the sticky window after a write"""
+    request.session[STICKY_SESSION_KEY] = time.time() + getattr(settings, 'REPLICA_STICKY_SECONDS', 30)
+
+
+def is_pinned_to_primary(request):
+    if request.GET.get(FRESH_PARAM):
+        return True
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def use_replica(view_func):
+    """Route a read-only view's dashboard queries to the replica when it is safe to"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        alias = None
+        if not is_pinned_to_primary(request) and replica_available():
+            alias = replica_alias()
+
+        token = _read_alias.set(alias)
+        try:
+            return view_func(request, *args, **kwargs)
+        except OperationalError as e:
+            # A query cancelled by its statement timeout would be just as slow on the primary
+            if alias is None or is_statement_timeout(e):
+                raise
+            # The replica went away mid-request; retry the read on the primary
+            mark_replica_unhealthy()
+            connections[alias].close()
+            _read_alias.set(None)
+            return view_func(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Sends dashboard reads inside use_replica views to the replica"""
+
+    route_app_labels = {'dashboard'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.route_app_labels:
+            return _read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
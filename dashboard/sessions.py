@@ -0,0 +1,40 @@
+"""Session engine: cached_db with an upper bound on how long a cache entry lives
+
+Sessions are read from the cache and fall back to the database on a miss;
+every write goes to both. Cache entries expire after
+SESSION_CACHE_MAX_AGE seconds (when set) instead of with the session, so a
+per-process cache cannot keep serving a session that was logged out or
+cycled in another process for longer than that.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class _CappedCache:
+    """Cache proxy that shortens set() timeouts to a maximum"""
+
+    def __init__(self, cache, max_age):
+        self._cache = cache
+        self._max_age = max_age
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def _timeout(self, timeout):
+        return self._max_age if timeout is None else min(timeout, self._max_age)
+
+    def set(self, key, value, timeout=None, **kwargs):
+        return self._cache.set(key, value, self._timeout(timeout), **kwargs)
+
+    async def aset(self, key, value, timeout=None, **kwargs):
+        return await self._cache.aset(key, value, self._timeout(timeout), **kwargs)
+
+
+class SessionStore(CachedDBStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        if settings.SESSION_CACHE_MAX_AGE:
+            self._cache = _CappedCache(self._cache, settings.SESSION_CACHE_MAX_AGE)
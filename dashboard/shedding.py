@@ -0,0 +1,95 @@
+"""Load shedding for the heavy report and upload views
+
+Views wrapped in shed_load(budget) run every query under the budget's
+Postgres statement_timeout and are limited to the budget's number of
+concurrent requests per process. Requests over the limit get an
+immediate 503 with Retry-After instead of queueing for a worker and a
+database connection, and queries cancelled by the timeout come back as a
+"narrow your filters" message. Budgets live in settings.VIEW_BUDGETS.
+"""
+import threading
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
+from django.shortcuts import render
+
+# SQLSTATE for a statement cancelled by statement_timeout
+QUERY_CANCELED = '57014'
+
+BUSY_MESSAGE = 'The server is busy with other reports. Please try again in a few seconds.'
+TIMEOUT_MESSAGE = (
+    'This report took too long to run. Please narrow your filters '
+    '(for example pick a month, fiscal year or transaction type) and try again.'
+)
+
+
+def is_statement_timeout(exc):
+    """Return whether a database error is a query cancelled by statement_timeout"""
+    cause = exc.__cause__ if exc.__cause__ is not None else exc
+    return getattr(cause, 'pgcode', None) == QUERY_CANCELED
+
+
+@contextmanager
+def statement_timeout(milliseconds):
+    """Run every Postgres query inside the block with the given statement_timeout"""
+    applied = []
+
+    def set_timeout(execute, sql, params, many, context):
+        connection = context['connection']
+        if connection.vendor == 'postgresql' and connection not in applied:
+            # The raw cursor skips the execute wrappers
+            context['cursor'].cursor.execute('SET statement_timeout = %s', [milliseconds])
+            applied.append(connection)
+        return execute(sql, params, many, context)
+
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(set_timeout))
+            yield
+    finally:
+        for connection in applied:
+            if connection.connection is None:
+                continue
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET statement_timeout')
+            except DatabaseError:
+                connection.close()
+
+
+def _error_response(request, message, as_json, retry_after=None):
+    if as_json:
+        response = JsonResponse({'error': message}, status=503)
+    else:
+        response = render(request, 'dashboard/busy.html', {'message': message}, status=503)
+    if retry_after:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+def shed_load(budget, as_json=False):
+    """Apply a VIEW_BUDGETS entry to a view: statement timeout plus a per-view concurrency cap"""
+    limits = settings.VIEW_BUDGETS[budget]
+    # One semaphore per decorated view, shared by the threads of this process
+    in_flight = threading.BoundedSemaphore(limits['max_concurrent'])
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not in_flight.acquire(blocking=False):
+                return _error_response(request, BUSY_MESSAGE, as_json, settings.LOAD_SHED_RETRY_AFTER)
+            try:
+                with statement_timeout(limits['statement_timeout']):
+                    return view_func(request, *args, **kwargs)
+            except DatabaseError as e:
+                if not is_statement_timeout(e):
+                    raise
+                return _error_response(request, TIMEOUT_MESSAGE, as_json)
+            finally:
+                in_flight.release()
+        return wrapper
+    return decorator
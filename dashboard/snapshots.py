@@ -0,0 +1,163 @@
+"""Versioned month snapshots
+
+Every successful ingest writes its rows under a new MonthSnapshot and then
+moves the month's CurrentSnapshot pointer to it. The fact models' default
+managers only return rows of current snapshots, so rolling a month back
+is a single pointer update and older versions stay untouched until
+prune_snapshots removes them. Total versions derived from a detail version
+remember it, so rolling the detail month back takes its totals with it.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    CurrentSnapshot, CustomerData, MonthSnapshot, TotalTransaction, TotalUser, TransactionData
+)
+
+# Detail type -> the total type derive_totals builds from it
+DERIVED_TYPES = {
+    'CUSTOMER': 'TOTAL_USER',
+    'TRANSACTION': 'TOTAL_TRANSACTION',
+}
+
+SNAPSHOT_MODELS = {
+    'CUSTOMER': CustomerData,
+    'TRANSACTION': TransactionData,
+    'TOTAL_USER': TotalUser,
+    'TOTAL_TRANSACTION': TotalTransaction,
+}
+
+
+def data_type_for(model):
+    for data_type, snapshot_model in SNAPSHOT_MODELS.items():
+        if snapshot_model is model:
+            return data_type
+    raise KeyError(model)
+
+
+def new_snapshot(data_type, month_year, upload_log=None, derived_from=None, admin_edits=False):
+    """Create the month's next version; it is not visible until publish()
+
+    Concurrent ingests of the same month wait here until the first one's
+    transaction ends, so each is given its own version number.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(hashtext(%s))', [f'snapshot:{data_type}:{month_year:%Y-%m-%d}']
+            )
+        latest = MonthSnapshot.objects.filter(
+            data_type=data_type, month_year=month_year
+        ).aggregate(latest=Max('version'))['latest']
+        return MonthSnapshot.objects.create(
+            data_type=data_type, month_year=month_year, version=(latest or 0) + 1, upload_log=upload_log,
+            derived_from=derived_from, admin_edits=admin_edits
+        )
+
+
+def publish(snapshot, row_count=None):
+    """Make a snapshot its month's current version"""
+    if row_count is not None:
+        snapshot.row_count = row_count
+        snapshot.save(update_fields=['row_count'])
+    CurrentSnapshot.objects.update_or_create(
+        data_type=snapshot.data_type, month_year=snapshot.month_year, defaults={'snapshot': snapshot}
+    )
+
+
+def current_snapshot(data_type, month_year):
+    pointer = CurrentSnapshot.objects.select_related('snapshot').filter(
+        data_type=data_type, month_year=month_year
+    ).first()
+    return pointer.snapshot if pointer else None
+
+
+def copy_rows(source, target, exclude=()):
+    """Copy a snapshot's rows, except the ids in exclude, into another snapshot
+
+    Rows whose key the target already holds are skipped. Returns the
+    number of rows copied.
+    """
+    model = SNAPSHOT_MODELS[source.data_type]
+    columns = ', '.join(
+        field.column for field in model._meta.concrete_fields
+        if not field.primary_key and field.name != 'snapshot'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {model._meta.db_table} ({columns}, snapshot_id)
+            SELECT {columns}, %s FROM {model._meta.db_table}
+            WHERE snapshot_id = %s AND NOT (id = ANY(%s))
+            ON CONFLICT DO NOTHING
+        """, [target.pk, source.pk, list(exclude)])
+        return cursor.rowcount
+
+
+def link_upload_log(snapshot, upload_log):
+    MonthSnapshot.objects.filter(pk=snapshot.pk).update(upload_log=upload_log)
+
+
+def previous_snapshot(snapshot):
+    return MonthSnapshot.objects.filter(
+        data_type=snapshot.data_type, month_year=snapshot.month_year, version__lt=snapshot.version
+    ).order_by('-version').first()
+
+
+def _current_pointer(data_type, month_year):
+    return CurrentSnapshot.objects.select_for_update().select_related('snapshot').filter(
+        data_type=data_type, month_year=month_year
+    ).first()
+
+
+def rollback(data_type, month_year):
+    """Point a month back at its previous version
+
+    If the month's current totals were derived from the version being
+    rolled back, they go back too: to the latest total version derived
+    from the restored detail version, or else to their own previous
+    version. Returns the snapshots made current, the month's first.
+    """
+    with transaction.atomic():
+        pointer = _current_pointer(data_type, month_year)
+        previous = previous_snapshot(pointer.snapshot) if pointer else None
+        if previous is None:
+            raise ValueError(f"{data_type} {month_year:%Y-%m} has no earlier version to roll back to")
+        rolled_back = pointer.snapshot
+        pointer.snapshot = previous
+        pointer.save(update_fields=['snapshot', 'updated_at'])
+        restored = [previous]
+
+        derived_type = DERIVED_TYPES.get(data_type)
+        derived_pointer = derived_type and _current_pointer(derived_type, month_year)
+        if derived_pointer and derived_pointer.snapshot.derived_from_id == rolled_back.pk:
+            derived = previous.derived.filter(data_type=derived_type).order_by('-version').first()
+            derived = derived or previous_snapshot(derived_pointer.snapshot)
+            if derived is not None:
+                derived_pointer.snapshot = derived
+                derived_pointer.save(update_fields=['snapshot', 'updated_at'])
+                restored.append(derived)
+    return restored
+
+
+def drop_month(data_type, month_year):
+    """Delete every version of a month, e.g. once it has been archived"""
+    CurrentSnapshot.objects.filter(data_type=data_type, month_year=month_year).delete()
+    MonthSnapshot.objects.filter(data_type=data_type, month_year=month_year).delete()
+
+
+def prune_snapshots(retention_days, dry_run=False):
+    """Delete non-current snapshots older than the retention period along with their rows"""
+    stale = MonthSnapshot.objects.filter(
+        current__isnull=True, created_at__lt=timezone.now() - timedelta(days=retention_days)
+    )
+    if dry_run:
+        return list(stale)
+    pruned = list(stale)
+    for snapshot in pruned:
+        with transaction.atomic():
+            SNAPSHOT_MODELS[snapshot.data_type].all_versions.filter(snapshot=snapshot).delete()
+            snapshot.delete()
+    return pruned
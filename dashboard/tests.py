@@ -1,3 +1,1237 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from openpyxl import Workbook, load_workbook
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .fiscal import calendar_month, fiscal_period, rollup_by_period
+from .anomalies import detect_anomalies, robust_scores
+from .comparisons import compare_total_users
+from .dedupe import dedupe_master
+from .ingest import derive_total_users, process_total_transaction_data, process_total_user_data
+from .leaderboard import branch_leaderboard
+from .loadtest import compare_results, percentile
+from .models import (
+    ArchivedMonth, Branch, ChannelUsed, CustomerCategory, CustomerData, DataUploadLog, FiscalCalendar,
+    GeographicalLocation, InstrumentType, MonthSnapshot, ReconciliationMismatch, ServiceType, TotalUser,
+    TransactionData, TransactionRange, TransactionType
+)
+from . import archive, events, prevalidation, reports, routers, shedding
+from .paginators import EstimatedCountPaginator, mark_unfiltered_listing
+from .prevalidation import prevalidate
+from .reconciliation import reconcile_month
+from .snapshots import current_snapshot, new_snapshot, publish, rollback
+from .uploads import column_mapping, resolve_headers
+from .views import merge_archived
+
+MONTH = date(2040, 12, 1)
+
+
+def customer_month(month_year, customers, status='ACTIVE'):
+    """Publish a CUSTOMER version of a month with one row per (branch code, customers) pair"""
+    category, _ = CustomerCategory.objects.get_or_create(category_name='Individual')
+    service, _ = ServiceType.objects.get_or_create(service_name='Mobile Banking')
+    snapshot = new_snapshot('CUSTOMER', month_year)
+    for code, count in customers:
+        branch, _ = Branch.objects.get_or_create(branch_code=code, defaults={'branch_name': f'Branch {code}'})
+        CustomerData.all_versions.create(
+            branch_code=branch, customer_category=category, service_type=service, status=status,
+            month_year=month_year, snapshot=snapshot, number_of_customers=count,
+        )
+    publish(snapshot, len(customers))
+    return snapshot
+
+
+def transaction_month(month_year, transactions, type_name='Deposit'):
+    """Publish a TRANSACTION version of a month with one row per (range, count, amount)"""
+    dimensions = {
+        'form_of_instrument': InstrumentType.objects.get_or_create(instrument_type_name='Cheque')[0],
+        'type_of_transaction': TransactionType.objects.get_or_create(transaction_type_name=type_name)[0],
+        'geographical_location': GeographicalLocation.objects.get_or_create(location_name='Kathmandu')[0],
+        'channel_used': ChannelUsed.objects.get_or_create(channel_name='Branch')[0],
+    }
+    snapshot = new_snapshot('TRANSACTION', month_year)
+    for range_name, count, amount in transactions:
+        TransactionData.all_versions.create(
+            range_of_transactions=range_name, number_of_transactions=count, amount=amount,
+            month_year=month_year, snapshot=snapshot, **dimensions,
+        )
+    publish(snapshot, len(transactions))
+    return snapshot
+
+
+def log_in(client):
+    client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+
+class FactAdminTests(TestCase):
+    def setUp(self):
+        log_in(self.client)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        customer_month(MONTH, [('B1', 1)])
+        url = '/admin/dashboard/customerdata/'
+        # Warms the cached session and user
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as one_row:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        customer_month(date(2040, 11, 1), [(f'B{index}', index) for index in range(2, 12)])
+        with CaptureQueriesContext(connection) as many_rows:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(many_rows), len(one_row))
+
+    def test_month_and_fiscal_year_searches_use_exact_lookups(self):
+        request = RequestFactory().get('/')
+        admin = site._registry[TotalUser]
+        queryset, _ = admin.get_search_results(request, TotalUser.objects.all(), '2040-12')
+        self.assertIn('"month_year" >= 2040-12-01', str(queryset.query))
+        self.assertIn('"month_year" < 2041-01-01', str(queryset.query))
+        queryset, _ = admin.get_search_results(request, TotalUser.objects.all(), '2082/83')
+        self.assertIn('"fiscal_year" = 2082/83', str(queryset.query))
+        self.assertNotIn('UPPER', str(queryset.query))
+
+
+    def change(self, row, **fields):
+        data = {
+            'branch_code': row.branch_code_id, 'customer_category': row.customer_category_id,
+            'service_type': row.service_type_id, 'status': row.status,
+            'number_of_customers': row.number_of_customers, 'month_year': row.month_year,
+        }
+        data.update(fields)
+        response = self.client.post(f'/admin/dashboard/customerdata/{row.pk}/change/', data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_later_edits_change_the_admin_version_in_place(self):
+        uploaded = customer_month(MONTH, [('B1', 1), ('B2', 2), ('B3', 3)])
+        self.change(CustomerData.objects.get(branch_code__branch_code='B1'), number_of_customers=10)
+        edited = current_snapshot('CUSTOMER', MONTH)
+        self.assertEqual((edited.version, edited.admin_edits, edited.row_count), (2, True, 3))
+        self.assertEqual(CustomerData.all_versions.filter(snapshot=uploaded).count(), 3)
+
+        self.change(CustomerData.objects.get(branch_code__branch_code='B2'), number_of_customers=20)
+        self.client.post(
+            f'/admin/dashboard/customerdata/{CustomerData.objects.get(branch_code__branch_code="B3").pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertEqual(MonthSnapshot.objects.count(), 2)
+        edited.refresh_from_db()
+        self.assertEqual(edited.row_count, 2)
+        self.assertEqual(
+            dict(CustomerData.objects.values_list('branch_code__branch_code', 'number_of_customers')),
+            {'B1': 10, 'B2': 20},
+        )
+
+        self.assertEqual(rollback('CUSTOMER', MONTH), [uploaded])
+        self.assertEqual(CustomerData.objects.count(), 3)
+        # A restored version is copied again rather than changed
+        self.change(CustomerData.objects.get(branch_code__branch_code='B1'), number_of_customers=5)
+        self.assertEqual(current_snapshot('CUSTOMER', MONTH).version, 3)
+        self.assertEqual(CustomerData.all_versions.get(snapshot=edited, branch_code__branch_code='B1').number_of_customers, 10)
+
+    def test_edits_are_dated_on_the_first_of_the_month(self):
+        customer_month(MONTH, [('B1', 1)])
+        row = CustomerData.objects.get()
+        self.change(row, month_year='2040-12-15', status='INACTIVE')
+        self.change(CustomerData.objects.get(status='INACTIVE'), month_year='2040-12-20', status='ACTIVE')
+        self.assertEqual(list(CustomerData.objects.values_list('month_year', 'status')), [(MONTH, 'ACTIVE')])
+        self.assertEqual(current_snapshot('CUSTOMER', MONTH).row_count, 1)
+
+
+class SnapshotRollbackTests(TestCase):
+    def test_rollback_restores_the_previous_version(self):
+        first = customer_month(MONTH, [('B1', 10)])
+        second = customer_month(MONTH, [('B1', 20)])
+        self.assertEqual(second.version, first.version + 1)
+        self.assertEqual(rollback('CUSTOMER', MONTH), [first])
+        self.assertEqual(current_snapshot('CUSTOMER', MONTH), first)
+        self.assertEqual(CustomerData.objects.get().number_of_customers, 10)
+        with self.assertRaises(ValueError):
+            rollback('CUSTOMER', MONTH)
+
+    def test_rollback_takes_derived_totals_with_it(self):
+        customer_month(MONTH, [('B1', 10)])
+        derive_total_users(MONTH)
+        customer_month(MONTH, [('B1', 20)])
+        derive_total_users(MONTH)
+        self.assertEqual(TotalUser.objects.get().count, 20)
+
+        restored = rollback('CUSTOMER', MONTH)
+        self.assertEqual([snapshot.data_type for snapshot in restored], ['CUSTOMER', 'TOTAL_USER'])
+        self.assertEqual(TotalUser.objects.get().count, 10)
+
+    def test_rollback_leaves_uploaded_totals_alone(self):
+        customer_month(MONTH, [('B1', 10)])
+        customer_month(MONTH, [('B1', 20)])
+        totals = new_snapshot('TOTAL_USER', MONTH)
+        publish(totals)
+        rollback('CUSTOMER', MONTH)
+        self.assertEqual(current_snapshot('TOTAL_USER', MONTH), totals)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def paginator(self, queryset):
+        return EstimatedCountPaginator(queryset.order_by('pk'), 10)
+
+    def test_only_marked_listings_count_from_snapshot_row_counts(self):
+        snapshot = customer_month(MONTH, [('B1', 1), ('B2', 2)])
+        snapshot.row_count = 50
+        snapshot.save(update_fields=['row_count'])
+
+        listing = mark_unfiltered_listing(CustomerData.objects.order_by('pk'))
+        self.assertEqual(EstimatedCountPaginator(listing, 10).count, 50)
+        self.assertEqual(self.paginator(CustomerData.objects.filter(branch_code__branch_code='B1')).count, 1)
+        self.assertEqual(self.paginator(CustomerData.objects.all()).count, 2)
+
+
+class MasterDataApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ChannelUsed.objects.bulk_create(ChannelUsed(channel_name=f'Channel {index:02}') for index in range(30))
+        ChannelUsed.objects.create(channel_name='ATM')
+
+    def setUp(self):
+        log_in(self.client)
+
+    def get(self, table, **params):
+        return self.client.get(f'/api/master-data/{table}/', params)
+
+    def test_pages_without_counting(self):
+        first = self.get('channels-used', page_size=20).json()
+        self.assertEqual(first['columns'], ['channel_name'])
+        self.assertEqual(first['results'][:2], [['ATM'], ['Channel 00']])
+        self.assertTrue(first['has_next'])
+        second = self.get('channels-used', page_size=20, page=2).json()
+        self.assertEqual(len(second['results']), 11)
+        self.assertFalse(second['has_next'])
+        self.assertEqual(self.get('channels-used', page_size=1000).json()['page_size'], 100)
+
+    def test_short_terms_match_a_prefix_and_long_terms_anywhere(self):
+        self.assertEqual(self.get('channels-used', q='at').json()['results'], [['ATM']])
+        self.assertEqual(len(self.get('channels-used', q='nel 1').json()['results']), 10)
+
+    def test_unknown_table(self):
+        self.assertEqual(self.get('users').status_code, 404)
+
+
+class DedupeMasterTests(TestCase):
+    def test_duplicates_are_merged_and_colliding_rows_summed(self):
+        branch = Branch.objects.create(branch_code='B1', branch_name='Head Office')
+        category = CustomerCategory.objects.create(category_name='Individual')
+        kept = ServiceType.objects.create(service_name='Mobile Banking')
+        duplicate = ServiceType.objects.create(service_name=' mobile banking ')
+        other = ServiceType.objects.create(service_name='Internet Banking')
+        snapshot = new_snapshot('CUSTOMER', MONTH)
+        for service, customers in ((kept, 5), (duplicate, 7), (other, 1)):
+            CustomerData.all_versions.create(
+                branch_code=branch, customer_category=category, service_type=service,
+                status='ACTIVE', month_year=MONTH, snapshot=snapshot, number_of_customers=customers,
+            )
+        publish(snapshot, 3)
+
+        self.assertEqual(
+            dedupe_master(ServiceType, dry_run=True), {'duplicates': 1, 'repointed': 0, 'folded': 0}
+        )
+        self.assertEqual(ServiceType.objects.count(), 3)
+
+        self.assertEqual(dedupe_master(ServiceType), {'duplicates': 1, 'repointed': 0, 'folded': 1})
+        self.assertEqual(
+            sorted(ServiceType.objects.values_list('service_name', flat=True)),
+            ['Internet Banking', 'Mobile Banking'],
+        )
+        self.assertEqual(
+            dict(CustomerData.all_versions.values_list('service_type__service_name', 'number_of_customers')),
+            {'Mobile Banking': 12, 'Internet Banking': 1},
+        )
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.row_count, 2)
+
+    def test_rows_without_a_collision_are_repointed(self):
+        customer_month(MONTH, [('B1', 5)])
+        Branch.objects.create(branch_code='B2', branch_name='Branch B2')
+        duplicate = Branch.objects.create(branch_code='b2 ', branch_name='Branch B2')
+        CustomerData.objects.update(branch_code=duplicate)
+        stdout = StringIO()
+        call_command('dedupe_master_tables', stdout=stdout)
+        self.assertIn('removed 1 duplicates, re-pointed 1 rows, folded 0 colliding rows', stdout.getvalue())
+        self.assertEqual(CustomerData.objects.get().branch_code.branch_code, 'B2')
+        self.assertEqual(current_snapshot('CUSTOMER', MONTH).row_count, 1)
+
+
+class TotalsIngestTests(TestCase):
+    def test_bulk_load_fills_the_fiscal_period(self):
+        rows = [
+            {'service_type': 'Mobile Banking ', 'status': 'Active', 'count': '3'},
+            {'service_type': 'mobile banking', 'status': 'INACTIVE', 'count': '4'},
+        ]
+        result = process_total_user_data(iter(rows), date(2025, 7, 1))
+        self.assertEqual(result['status'], 'SUCCESS')
+        self.assertEqual(result['records_uploaded'], 2)
+        self.assertEqual(
+            list(TotalUser.objects.order_by('status').values_list('fiscal_year', 'fiscal_quarter', 'status', 'count')),
+            [('2082/83', 1, 'active', 3), ('2082/83', 1, 'inactive', 4)],
+        )
+        self.assertEqual(ServiceType.objects.count(), 1)
+
+    def test_derive_sums_the_current_detail_rows(self):
+        customer_month(MONTH, [('B1', 1), ('B2', 2)])
+        customer_month(MONTH, [('B1', 10), ('B2', 20)])
+        self.assertEqual(derive_total_users(MONTH), 1)
+        total = TotalUser.objects.get()
+        self.assertEqual((total.status, total.count), ('active', 30))
+        self.assertEqual(total.snapshot.derived_from, current_snapshot('CUSTOMER', MONTH))
+
+    def test_derive_without_detail_data_keeps_existing_totals(self):
+        with self.assertRaises(ValueError):
+            derive_total_users(MONTH)
+        self.assertIsNone(current_snapshot('TOTAL_USER', MONTH))
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('derive_totals', '2040-12', stdout=stdout, stderr=stderr)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertIn('TotalUser: No Customer Data uploaded for 2040-12', stderr.getvalue())
+        self.assertIn('TotalTransaction: No Transaction Data uploaded for 2040-12', stderr.getvalue())
+
+
+class DataUploadTests(TestCase):
+    CUSTOMER_CSV = (
+        b'Branch code,Branch name,Categorization of customers,Mobile Banking,Status,Number of customers\n'
+        b'B1,Head Office,Individual,Mobile Banking,ACTIVE,5\n'
+    )
+
+    def setUp(self):
+        log_in(self.client)
+        Branch.objects.create(branch_code='B1', branch_name='Head Office')
+        CustomerCategory.objects.create(category_name='Individual')
+        ServiceType.objects.create(service_name='Mobile Banking')
+
+    def upload(self, data_type, content, name='upload.csv', **fields):
+        response = self.client.post('/data-upload/', {
+            'data_type': data_type,
+            'month_year': '2040-12',
+            'data_file': SimpleUploadedFile(name, content),
+            **fields,
+        }, follow=True)
+        return [(message.level_tag, message.message) for message in response.context['messages']]
+
+    def test_gzip_and_excel_files(self):
+        messages = self.upload('CUSTOMER', gzip.compress(self.CUSTOMER_CSV), name='customers.csv.gz')
+        self.assertIn(('success', 'Successfully uploaded 1 records.'), messages)
+
+        workbook = Workbook()
+        for row in self.CUSTOMER_CSV.decode().splitlines():
+            workbook.active.append([int(cell) if cell.isdigit() else cell for cell in row.split(',')])
+        workbook.active.append([None] * 6)
+        workbook.active.append(['B1', 'Head Office', 'Individual', 'Mobile Banking', 'INACTIVE', 2.0])
+        content = BytesIO()
+        workbook.save(content)
+        messages = self.upload('CUSTOMER', content.getvalue(), name='customers.xlsx')
+        self.assertIn(('success', 'Successfully uploaded 2 records.'), messages)
+        self.assertEqual(
+            list(CustomerData.objects.order_by('status').values_list('status', 'number_of_customers')),
+            [('ACTIVE', 5), ('INACTIVE', 2)],
+        )
+
+    def zip_of(self, *names):
+        content = BytesIO()
+        with zipfile.ZipFile(content, 'w') as archive:
+            for name in names:
+                archive.writestr(name, self.CUSTOMER_CSV)
+            archive.writestr('__MACOSX/._customers_2040-10.csv', b'')
+        return content.getvalue()
+
+    def test_zip_members_are_loaded_for_the_month_in_their_name(self):
+        messages = self.upload('CUSTOMER', self.zip_of('customers_2040-10.csv', 'nested/2040_11.csv', 'undated.csv'))
+        self.assertEqual(len([message for level, message in messages if level == 'success']), 3)
+        self.assertEqual(
+            sorted(CustomerData.objects.dates('month_year', 'month')),
+            [date(2040, 10, 1), date(2040, 11, 1), MONTH],
+        )
+
+    def test_zip_with_two_files_for_one_month_is_rejected(self):
+        messages = self.upload('CUSTOMER', self.zip_of('customers_2040-12.csv', 'undated.csv'))
+        self.assertEqual(messages, [(
+            'error',
+            'Upload failed: customers_2040-12.csv and undated.csv are both for 2040-12; '
+            'each month can only be uploaded once per zip file.',
+        )])
+        self.assertFalse(CustomerData.all_versions.exists())
+
+    def test_failed_derivation_is_a_warning_on_the_saved_upload(self):
+        with mock.patch('dashboard.views.derive_total_users', side_effect=ValueError('no detail data')):
+            messages = self.upload('CUSTOMER', self.CUSTOMER_CSV, derive_totals='on')
+        self.assertIn(('success', 'Successfully uploaded 1 records.'), messages)
+        self.assertIn(('warning', 'Totals not derived: no detail data. Existing totals kept.'), messages)
+        self.assertFalse([message for level, message in messages if level == 'error'])
+        self.assertEqual(CustomerData.objects.get().number_of_customers, 5)
+
+
+class FiscalCalendarTests(TestCase):
+    def test_month_is_assigned_by_its_month_end(self):
+        # 30 June 2025 is still Asar 2082, the last month of 2081/82
+        june = fiscal_period(date(2025, 6, 1))
+        self.assertEqual((june['fiscal_year'], june['fiscal_quarter'], june['fiscal_month']), ('2081/82', 4, 12))
+        # 31 July 2025 is in Shrawan 2082, the first month of 2082/83
+        july = fiscal_period(date(2025, 7, 15))
+        self.assertEqual(july['month_year'], date(2025, 7, 1))
+        self.assertEqual((july['fiscal_year'], july['fiscal_quarter'], july['fiscal_month']), ('2082/83', 1, 1))
+        self.assertEqual(july['nepali_month_name'], 'Shrawan')
+
+    def test_calendar_month_only_reads(self):
+        call_command('build_fiscal_calendar', start='2025-07', end='2025-07', stdout=StringIO())
+        with self.assertNumQueries(1):
+            self.assertEqual(calendar_month(date(2025, 7, 20)).fiscal_year, '2082/83')
+        with self.assertNumQueries(1):
+            outside = calendar_month(date(2040, 12, 1))
+        self.assertIsNone(outside.pk)
+        self.assertEqual(outside.fiscal_year, fiscal_period(date(2040, 12, 1))['fiscal_year'])
+        self.assertEqual(FiscalCalendar.objects.count(), 1)
+
+    def test_rollup_sums_flows_and_keeps_latest_stock(self):
+        rows = [
+            {'month_year': date(2025, 7, 1), 'amount': 10, 'customers': 100},
+            {'month_year': date(2025, 8, 1), 'amount': None, 'customers': 110},
+            {'month_year': date(2025, 10, 1), 'amount': 5, 'customers': 120},
+        ]
+        quarters = rollup_by_period(rows, 'quarter', sum_fields=['amount'], last_fields=['customers'])
+        self.assertEqual(quarters, [
+            {'fiscal_year': '2082/83', 'fiscal_quarter': 1, 'period_end': date(2025, 8, 1), 'amount': 10, 'customers': 110},
+            {'fiscal_year': '2082/83', 'fiscal_quarter': 2, 'period_end': date(2025, 10, 1), 'amount': 5, 'customers': 120},
+        ])
+        years = rollup_by_period(rows, 'year', sum_fields=['amount'], last_fields=['customers'])
+        self.assertEqual(years, [
+            {'fiscal_year': '2082/83', 'period_end': date(2025, 10, 1), 'amount': 15, 'customers': 120},
+        ])
+
+
+class ResolveHeadersTests(SimpleTestCase):
+    def test_matches_ignoring_case_and_spaces(self):
+        mapping = {'service_type': 'Service type', 'status': 'Status', 'count': 'Count'}
+        self.assertEqual(
+            resolve_headers([' SERVICE TYPE', 'status ', None, 'Other'], mapping),
+            {'service_type': ' SERVICE TYPE', 'status': 'status ', 'count': None},
+        )
+
+
+class PrevalidateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ServiceType.objects.create(service_name='Mobile Banking')
+
+    def check(self, data_type, rows, **kwargs):
+        return prevalidate(data_type, rows, column_mapping(data_type), **kwargs)
+
+    def test_valid_rows_pass_and_every_row_is_returned(self):
+        rows = [
+            {'Service type': 'mobile banking', 'Status': 'Active', 'Count': '3'},
+            {'Service type': 'Mobile Banking', 'Status': 'inactive', 'Count': '4'},
+            {'Service type': 'Mobile Banking', 'Status': 'ACTIVE', 'Count': '5'},
+        ]
+        with mock.patch.object(prevalidation, 'PREVALIDATION_SAMPLE_ROWS', 1):
+            report, mapped = self.check('TOTAL_USER', iter(rows))
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(report['sampled'], 1)
+        self.assertEqual([row['count'] for row in mapped], ['3', '4', '5'])
+
+    def test_missing_column_is_rejected(self):
+        report, mapped = self.check('TOTAL_USER', [{'Service type': 'Mobile Banking', 'Status': 'active'}])
+        self.assertEqual(report['errors'], ['Missing column: Count.'])
+        self.assertEqual(list(mapped), [])
+
+    def test_bad_values_are_reported_by_row(self):
+        report, _ = self.check('TOTAL_USER', [
+            {'Service type': 'Mobile Banking', 'Status': 'active', 'Count': '-1'},
+            {'Service type': 'Mobile Banking', 'Status': 'closed', 'Count': '1'},
+        ])
+        self.assertEqual(report['errors'], [
+            "Row 2: Count '-1' is not a whole number of 0 or more.",
+            "Row 3: Status 'closed' must be Active or Inactive.",
+        ])
+
+    def test_unknown_master_values_are_errors_unless_allowed(self):
+        rows = [{'Service type': 'Branchless Banking', 'Status': 'active', 'Count': '1'}]
+        report, _ = self.check('TOTAL_USER', rows)
+        self.assertEqual(len(report['errors']), 1)
+        self.assertIn('Branchless Banking', report['errors'][0])
+        report, _ = self.check('TOTAL_USER', rows, allow_new_values=True)
+        self.assertEqual(report['errors'], [])
+        self.assertIn('Branchless Banking', report['warnings'][0])
+
+    def test_repeated_keys_are_errors_for_totals_only(self):
+        row = {'Service type': 'Mobile Banking', 'Status': 'active', 'Count': '1'}
+        report, _ = self.check('TOTAL_USER', [row, dict(row, Status='ACTIVE')])
+        self.assertIn('counted twice', report['errors'][0])
+
+        Branch.objects.create(branch_code='B1', branch_name='Head Office')
+        CustomerCategory.objects.create(category_name='Individual')
+        customer = {
+            'Branch code': 'B1', 'Branch name': 'Head Office', 'Categorization of customers': 'Individual',
+            'Mobile Banking': 'Mobile Banking', 'Status': 'ACTIVE', 'Number of customers': '1',
+        }
+        report, _ = self.check('CUSTOMER', [customer, customer])
+        self.assertEqual(report['errors'], [])
+        self.assertIn('the last of each is kept', report['warnings'][0])
+
+    def test_transaction_ranges_are_not_looked_up(self):
+        TransactionRange.objects.create(range_name='0-1000')
+        InstrumentType.objects.create(instrument_type_name='Cheque')
+        TransactionType.objects.create(transaction_type_name='Deposit')
+        GeographicalLocation.objects.create(location_name='Kathmandu')
+        ChannelUsed.objects.create(channel_name='Branch')
+        row = {
+            'Range of transactions': '1000+', 'Form of instrument': 'Cheque', 'Type of transaction': 'Deposit',
+            'Geographical location': 'Kathmandu', 'Channel used': 'Branch',
+            'Number of transactions': '1', 'Amount': '2000.00',
+        }
+        report, _ = self.check('TRANSACTION', [row])
+        self.assertEqual((report['errors'], report['warnings']), ([], []))
+        # Total Transactions still point at the range table
+        report, _ = self.check('TOTAL_TRANSACTION', [row])
+        self.assertIn("Range of transactions has values not in Transaction Ranges: 1000+.", report['errors'])
+        report, _ = self.check('TRANSACTION', [dict(row, **{'Range of transactions': ' '})])
+        self.assertEqual(report['errors'], ["Row 2: Range of transactions '' is empty."])
+
+
+class DashboardPeriodTests(TestCase):
+    def setUp(self):
+        call_command('build_fiscal_calendar', start='2025-01', end='2025-12', stdout=StringIO())
+        customer_month(date(2025, 6, 1), [('B1', 90)])
+        customer_month(date(2025, 7, 1), [('B1', 100)])
+        customer_month(date(2025, 8, 1), [('B1', 50), ('B2', 60)])
+        customer_month(date(2025, 10, 1), [('B1', 120)])
+        transaction_month(date(2025, 7, 1), [('0-1000', 1, '10.50')])
+        transaction_month(date(2025, 8, 1), [('0-1000', 2, '20.00'), ('1000+', 3, '1000.00')])
+        transaction_month(date(2025, 10, 1), [('0-1000', 4, '5.00')])
+
+    def test_quarters_are_grouped_in_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/dashboard-data/', {'period': 'quarter'}).json()
+        self.assertEqual(data['monthly_customers'], [
+            {'fiscal_year': '2081/82', 'fiscal_quarter': 4, 'period_end': '2025-06-01', 'total_customers': 90},
+            {'fiscal_year': '2082/83', 'fiscal_quarter': 1, 'period_end': '2025-08-01', 'total_customers': 110},
+            {'fiscal_year': '2082/83', 'fiscal_quarter': 2, 'period_end': '2025-10-01', 'total_customers': 120},
+        ])
+        self.assertEqual(data['monthly_transactions'], [
+            {'fiscal_year': '2082/83', 'fiscal_quarter': 1, 'period_end': '2025-08-01', 'total_amount': '1030.50', 'total_transactions': 6},
+            {'fiscal_year': '2082/83', 'fiscal_quarter': 2, 'period_end': '2025-10-01', 'total_amount': '5.00', 'total_transactions': 4},
+        ])
+        grouped = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "dashboard_fiscalcalendar"."fiscal_year" AS "fiscal_year", '
+                                       '"dashboard_fiscalcalendar"."fiscal_quarter" AS "fiscal_quarter"')
+        ]
+        self.assertEqual(len(grouped), 2)
+        for sql in grouped:
+            self.assertIn('JOIN "dashboard_fiscalcalendar" ON', sql)
+            self.assertTrue(sql.endswith('GROUP BY 1, 2 ORDER BY 1 ASC, 2 ASC'))
+
+    def test_years_are_grouped_in_sql(self):
+        data = self.client.get('/api/dashboard-data/', {'period': 'year'}).json()
+        self.assertEqual(data['monthly_customers'], [
+            {'fiscal_year': '2081/82', 'period_end': '2025-06-01', 'total_customers': 90},
+            {'fiscal_year': '2082/83', 'period_end': '2025-10-01', 'total_customers': 120},
+        ])
+        self.assertEqual(data['monthly_transactions'], [
+            {'fiscal_year': '2082/83', 'period_end': '2025-10-01', 'total_amount': '1035.50', 'total_transactions': 10},
+        ])
+
+
+class ChartApiV2Tests(TestCase):
+    def setUp(self):
+        log_in(self.client)
+        customer_month(date(2040, 11, 1), [('B1', 5), ('B2', 7)])
+        customer_month(MONTH, [('B1', 6)], status='INACTIVE')
+        transaction_month(MONTH, [('0-1000', 2, '10.25'), ('1000+', 1, '2000.00')])
+
+    def get(self, **params):
+        return self.client.get('/api/v2/dashboard-data/', params)
+
+    def test_series_are_columnar(self):
+        data = self.get().json()
+        self.assertEqual(data['customer_status'], {'status': ['ACTIVE', 'INACTIVE'], 'customers': [12, 6]})
+        self.assertEqual(data['monthly_customers'], {'month': ['2040-11-01', '2040-12-01'], 'customers': [12, 6]})
+        self.assertEqual(data['transaction_types'], {'type': ['Deposit'], 'amount': [2010.25], 'count': [3]})
+        self.assertEqual(data['monthly_transactions'], {'month': ['2040-12-01'], 'amount': [2010.25], 'count': [3]})
+
+    def test_filters_and_month_range(self):
+        branch = Branch.objects.get(branch_code='B2').pk
+        data = self.get(branch=branch).json()
+        self.assertEqual(data['customer_status'], {'status': ['ACTIVE'], 'customers': [7]})
+        data = self.get(start='2040-12', end='2040-12', range_of_transactions='1000+').json()
+        self.assertEqual(data['monthly_customers'], {'month': ['2040-12-01'], 'customers': [6]})
+        self.assertEqual(data['monthly_transactions'], {'month': ['2040-12-01'], 'amount': [2000.0], 'count': [1]})
+
+    def test_large_bodies_are_compressed(self):
+        response = self.client.get('/api/v2/dashboard-data/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.get().json())
+
+    def test_malformed_filters_are_rejected(self):
+        for params, error in (
+            ({'start': '2040-13'}, 'Invalid month format. Use YYYY-MM.'),
+            ({'branch': 'B1'}, "'branch' must be an id."),
+            ({'channel_used': '1 OR 1=1'}, "'channel_used' must be an id."),
+        ):
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': error})
+
+
+@override_settings(REPLICA_DATABASE_ALIAS='default', REPLICA_HEALTH_CHECK_INTERVAL=60)
+class ReplicaRoutingTests(TestCase):
+    """The primary stands in for the replica, so its health check runs for real"""
+
+    def setUp(self):
+        routers._replica_health.update(checked_at=None, healthy=False)
+        self.addCleanup(routers._replica_health.update, checked_at=None, healthy=False)
+
+    def request(self, path='/', session=None):
+        request = RequestFactory().get(path)
+        request.session = session if session is not None else {}
+        return request
+
+    @staticmethod
+    @routers.use_replica
+    def read_alias(request):
+        return routers.ReplicaRouter().db_for_read(CustomerData)
+
+    def test_reads_go_to_a_caught_up_replica(self):
+        self.assertEqual(self.read_alias(self.request()), 'default')
+        # Outside use_replica views reads stay on the primary
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(CustomerData))
+        self.assertEqual(routers.ReplicaRouter().db_for_write(CustomerData), 'default')
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(User))
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=-1)
+    def test_lagging_replica_is_skipped_until_the_next_check(self):
+        self.assertIsNone(self.read_alias(self.request()))
+        with override_settings(REPLICA_MAX_LAG_SECONDS=10), self.assertNumQueries(0):
+            self.assertIsNone(self.read_alias(self.request()))
+
+    @override_settings(REPLICA_DATABASE_ALIAS='replica')
+    def test_unconfigured_replica_is_never_used(self):
+        self.assertIsNone(self.read_alias(self.request()))
+
+    def test_writers_and_fresh_requests_read_the_primary(self):
+        session = {}
+        routers.pin_to_primary(self.request(session=session))
+        self.assertIsNone(self.read_alias(self.request(session=session)))
+        self.assertIsNone(self.read_alias(self.request('/?fresh=1')))
+
+    def test_lost_replica_is_retried_on_the_primary(self):
+        aliases = []
+
+        @routers.use_replica
+        def view(request):
+            aliases.append(routers.ReplicaRouter().db_for_read(CustomerData))
+            if len(aliases) == 1:
+                raise OperationalError('server closed the connection unexpectedly')
+            return aliases
+
+        # The lost connection is closed; here it is the test's own
+        with mock.patch.object(connection, 'close') as close:
+            self.assertEqual(view(self.request()), ['default', None])
+        close.assert_called_once_with()
+        self.assertFalse(routers._replica_health['healthy'])
+
+    def test_statement_timeouts_are_not_retried(self):
+        calls = []
+
+        @routers.use_replica
+        def view(request):
+            calls.append(request)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SET LOCAL statement_timeout = 1')
+                cursor.execute('SELECT pg_sleep(1)')
+
+        with self.assertRaises(OperationalError):
+            view(self.request())
+        self.assertEqual(len(calls), 1)
+
+
+class DataChangedEventTests(TransactionTestCase):
+    """Notifications are only delivered once committed, so these tests commit"""
+
+    def setUp(self):
+        patcher = mock.patch.object(events, 'KEEPALIVE_SECONDS', 0.2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.wait_for_listeners)
+
+    def wait_for_listeners(self):
+        # Closed streams' listener threads stop within a keepalive interval
+        for listener in events._listeners.values():
+            if listener.thread is not None:
+                listener.thread.join(5)
+
+    def open_stream(self):
+        stream = events.data_changed_events()
+        self.addCleanup(stream.close)
+        messages = iter(stream)
+        self.assertEqual(next(messages), 'retry: 3000\n\n')
+        return stream, messages
+
+    def next_event(self, messages, snapshot):
+        # Notifications sent before the listener runs LISTEN are lost, so keep sending
+        for _ in range(50):
+            events.notify_data_changed(snapshot)
+            message = next(messages)
+            if message != ': keepalive\n\n':
+                return message
+        self.fail('No notification received')
+
+    def test_streams_share_one_listener_and_carry_the_snapshot_version(self):
+        snapshot = customer_month(MONTH, [('B1', 1)])
+        snapshot = customer_month(MONTH, [('B1', 2)])
+        _, first = self.open_stream()
+        _, second = self.open_stream()
+        self.assertEqual(len(events._listeners), 1)
+        payload = '{"data_type": "CUSTOMER", "month_year": "2040-12", "version": 2}'
+        self.assertEqual(
+            self.next_event(first, snapshot), f'id: 2\nevent: data-updated\ndata: {payload}\n\n'
+        )
+        self.assertIn(f'data: {payload}', self.next_event(second, snapshot))
+
+    def test_payload_without_a_version_has_no_event_id(self):
+        stream, messages = self.open_stream()
+        stream.subscriber.put('{"data_type": "CUSTOMER", "month_year": "2040-12"}')
+        self.assertEqual(
+            next(messages), 'event: data-updated\ndata: {"data_type": "CUSTOMER", "month_year": "2040-12"}\n\n'
+        )
+
+    def test_streams_beyond_the_cap_are_turned_away(self):
+        client = self.client
+        log_in(client)
+        with mock.patch.object(events, '_stream_slots', threading.BoundedSemaphore(1)):
+            stream = events.data_changed_events()
+            self.assertIsNone(events.data_changed_events())
+            response = client.get('/api/events/')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '5')
+            stream.close()
+            stream.close()
+            response = client.get('/api/events/')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            response.close()
+            stream = events.data_changed_events()
+            self.assertIsNotNone(stream)
+            stream.close()
+
+
+@override_settings(
+    SESSION_ENGINE='dashboard.sessions', AUTHENTICATION_BACKENDS=['dashboard.auth.CachedModelBackend'],
+)
+class FastAuthTests(TestCase):
+    url = '/api/compare/users/'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+        # Warms the cached session and user
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_a_warm_request_makes_no_session_or_user_queries(self):
+        # Only the view's lookup of the latest month and the reset of its statement timeout
+        with self.assertNumQueries(2) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertIn(TotalUser._meta.db_table, queries.captured_queries[0]['sql'])
+        self.assertFalse(any(
+            table in query['sql'] for query in queries.captured_queries
+            for table in ('django_session', 'auth_user', 'auth_permission')
+        ))
+
+    def test_a_saved_user_is_loaded_again(self):
+        self.user.is_superuser = False
+        self.user.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertTrue(any('"auth_user"' in query['sql'] for query in queries.captured_queries))
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_logging_out_ends_the_cached_session(self):
+        self.client.get('/logout/')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(
+    VIEW_BUDGETS={'test': {'statement_timeout': 50, 'max_concurrent': 1}}, LOAD_SHED_RETRY_AFTER=7
+)
+class SheddingTests(TestCase):
+    def request(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        return request
+
+    def show_timeout(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            return cursor.fetchone()[0]
+
+    def test_timeout_applies_inside_the_block_only(self):
+        before = self.show_timeout()
+        with shedding.statement_timeout(1234):
+            self.assertEqual(self.show_timeout(), '1234ms')
+        self.assertEqual(self.show_timeout(), before)
+
+    def test_cancelled_query_asks_to_narrow_the_filters(self):
+        @shedding.shed_load('test', as_json=True)
+        def slow_view(request):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SELECT pg_sleep(1)')
+
+        response = slow_view(self.request())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.content), {'error': shedding.TIMEOUT_MESSAGE})
+        self.assertFalse(response.has_header('Retry-After'))
+
+    def test_requests_over_the_cap_are_turned_away(self):
+        started, finish = threading.Event(), threading.Event()
+
+        @shedding.shed_load('test')
+        def view(request):
+            started.set()
+            finish.wait(5)
+            return HttpResponse('done')
+
+        responses = []
+        worker = threading.Thread(target=lambda: responses.append(view(self.request())))
+        worker.start()
+        self.addCleanup(worker.join)
+        self.addCleanup(finish.set)
+        started.wait(5)
+
+        busy = view(self.request())
+        self.assertEqual(busy.status_code, 503)
+        self.assertEqual(busy['Retry-After'], '7')
+        self.assertContains(busy, 'The server is busy', status_code=503)
+
+        finish.set()
+        worker.join()
+        self.assertEqual(responses[0].content, b'done')
+        # The slot is free again
+        finish.clear()
+        threading.Timer(0.1, finish.set).start()
+        self.assertEqual(view(self.request()).status_code, 200)
+
+
+class BranchLeaderboardTests(TestCase):
+    def setUp(self):
+        customer_month(date(2040, 11, 1), [('B1', 100), ('B2', 50), ('B3', 10)])
+        # Superseded by the next version of the month
+        customer_month(MONTH, [('B1', 1000), ('B2', 1), ('B3', 1)])
+        snapshot = customer_month(MONTH, [('B1', 110), ('B2', 100), ('B3', 40), ('B4', 5)])
+        row = CustomerData.objects.get(month_year=MONTH, branch_code__branch_code='B3')
+        row.pk, row.status, row.number_of_customers = None, 'INACTIVE', 500
+        row.snapshot = snapshot
+        CustomerData.all_versions.bulk_create([row])
+
+    def ranking(self, **kwargs):
+        return [
+            (row['rank'], row['branch_code'], row[kwargs.get('metric', 'customers')])
+            for row in branch_leaderboard(MONTH, **kwargs)
+        ]
+
+    def test_ranks_the_current_version_by_each_metric(self):
+        self.assertEqual(self.ranking(limit=2), [(1, 'B3', 540), (2, 'B1', 110)])
+        self.assertEqual(self.ranking(order='bottom', limit=1), [(1, 'B4', 5)])
+        status = {'status': 'ACTIVE'}
+        self.assertEqual(
+            self.ranking(metric='share', filters=status),
+            [(1, 'B1', 43.14), (2, 'B2', 39.22), (3, 'B3', 15.69), (4, 'B4', 1.96)],
+        )
+        # B4 has no previous month to grow from
+        self.assertEqual(
+            self.ranking(metric='growth', filters=status), [(1, 'B2', 50), (2, 'B3', 30), (3, 'B1', 10)]
+        )
+        self.assertEqual(
+            self.ranking(metric='growth_pct', filters=status), [(1, 'B3', 300.0), (2, 'B2', 100.0), (3, 'B1', 10.0)]
+        )
+
+    def test_api_validates_and_returns_the_ranking(self):
+        log_in(self.client)
+        url = '/api/leaderboard/branches/'
+        data = self.client.get(url, {'month_year': '2040-12', 'metric': 'growth', 'status': 'active', 'limit': 1}).json()
+        self.assertEqual((data['month_year'], data['metric'], data['order']), ('2040-12', 'growth', 'top'))
+        self.assertEqual([(row['branch_code'], row['growth']) for row in data['results']], [('B2', 50)])
+        for params in ({'metric': 'size'}, {'order': 'middle'}, {'limit': 'ten'}, {'status': 'dormant'},
+                       {'service_type': 'Mobile'}, {'month_year': '2040/12'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+
+class ReconciliationTests(TestCase):
+    def test_customer_tuples_that_differ_or_are_missing_are_stored(self):
+        customer_month(MONTH, [('B1', 10), ('B2', 5)])
+        self.assertIsNone(reconcile_month('CUSTOMER', MONTH))
+        process_total_user_data(iter([{'service_type': 'Mobile Banking', 'status': 'active', 'count': '15'}]), MONTH)
+        self.assertEqual(reconcile_month('CUSTOMER', MONTH), 0)
+
+        process_total_user_data(iter([
+            {'service_type': 'Mobile Banking', 'status': 'active', 'count': '12'},
+            {'service_type': 'Mobile Banking', 'status': 'inactive', 'count': '3'},
+        ]), MONTH)
+        stdout = StringIO()
+        call_command('reconcile', '2040-12', '--type', 'customer', stdout=stdout)
+        self.assertEqual(stdout.getvalue(), 'CUSTOMER 2040-12: 2 mismatches\n')
+        self.assertEqual(
+            sorted(ReconciliationMismatch.objects.values_list('dimensions', 'expected', 'actual', 'difference')),
+            [('Mobile Banking / active', 12, 15, 3), ('Mobile Banking / inactive', 3, 0, -3)],
+        )
+        # Re-checking replaces the month's mismatches rather than adding to them
+        self.assertEqual(reconcile_month('CUSTOMER', MONTH), 2)
+        self.assertEqual(ReconciliationMismatch.objects.count(), 2)
+
+    def test_transaction_ranges_are_matched_by_name(self):
+        transaction_month(MONTH, [('0-1000 ', 2, '10.25'), ('0-1000', 1, '5.00'), ('1000+', 1, '2000.00')])
+        row = {
+            'type_of_transaction': 'Deposit', 'form_of_instrument': 'Cheque',
+            'geographical_location': 'Kathmandu', 'channel_used': 'Branch',
+        }
+        process_total_transaction_data(iter([
+            {**row, 'range_of_transactions': '0-1000', 'number_of_transactions': '3', 'amount': '15.25'},
+            {**row, 'range_of_transactions': '1000+', 'number_of_transactions': '1', 'amount': '2500.00'},
+        ]), MONTH)
+        self.assertEqual(reconcile_month('TRANSACTION', MONTH), 1)
+        mismatch = ReconciliationMismatch.objects.get()
+        self.assertEqual(mismatch.dimensions, '1000+ / Deposit / Cheque / Kathmandu / Branch')
+        self.assertEqual((mismatch.measure, mismatch.difference), ('amount', Decimal('-500.00')))
+
+
+class ComparisonTests(TestCase):
+    def total_users(self, month_year, active, inactive=None):
+        rows = [{'service_type': 'Mobile Banking', 'status': 'active', 'count': active}]
+        if inactive is not None:
+            rows.append({'service_type': 'Mobile Banking', 'status': 'inactive', 'count': inactive})
+        self.assertEqual(process_total_user_data(rows, month_year)['status'], 'SUCCESS')
+
+    def test_missing_previous_month_is_null_not_an_older_month(self):
+        self.total_users(date(2039, 12, 1), 80, 20)
+        self.total_users(date(2040, 10, 1), 90)
+        self.total_users(MONTH, 999)
+        # Only the current version of a month is compared
+        self.total_users(MONTH, 100, 25)
+        self.assertEqual(compare_total_users(MONTH), [
+            {
+                'name': 'Mobile Banking', 'status': 'active', 'users': 100, 'users_previous': None,
+                'users_last_year': 80, 'users_mom_pct': None, 'users_yoy_pct': 25.0,
+            },
+            {
+                'name': 'Mobile Banking', 'status': 'inactive', 'users': 25, 'users_previous': None,
+                'users_last_year': 20, 'users_mom_pct': None, 'users_yoy_pct': 25.0,
+            },
+        ])
+
+    def test_month_over_month(self):
+        self.total_users(date(2040, 11, 1), 80)
+        self.total_users(MONTH, 100)
+        log_in(self.client)
+        data = self.client.get('/api/compare/users/').json()
+        self.assertEqual(data['month_year'], '2040-12')
+        self.assertEqual(
+            [(row['users_previous'], row['users_mom_pct'], row['users_last_year']) for row in data['results']],
+            [(80, 25.0, None)],
+        )
+        self.assertEqual(self.client.get('/api/compare/transactions/', {'by': 'branch'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/compare/transactions/').json()['results'], [])
+
+
+class MergeArchivedTests(SimpleTestCase):
+    def test_adds_archived_totals_and_orders_by_key(self):
+        rows = [('INACTIVE', 5), ('ACTIVE', None)]
+        self.assertEqual(
+            merge_archived(rows, {'ACTIVE': 10, 'DORMANT': 1}),
+            [('ACTIVE', 10), ('DORMANT', 1), ('INACTIVE', 5)],
+        )
+
+    def test_tuple_measures_and_none_key_last(self):
+        rows = [(None, 1.0, 2), ('Cash', 3.0, 4)]
+        self.assertEqual(
+            merge_archived(rows, {'Cash': (1.5, 1), 'Card': (2.0, 2)}),
+            [('Card', 2.0, 2), ('Cash', 4.5, 5), (None, 1.0, 2)],
+        )
+
+
+class GroupSumTests(SimpleTestCase):
+    def test_sums_each_measure_per_key(self):
+        keys = np.array(['b', 'a', 'b', 'a', 'c'])
+        unique, (first, second) = archive._group_sum(keys, np.array([1, 2, 3, 4, 5]), np.array([10, 20, 30, 40, 50]))
+        self.assertEqual(unique.tolist(), ['a', 'b', 'c'])
+        self.assertEqual(first.tolist(), [6, 4, 5])
+        self.assertEqual(second.tolist(), [60, 40, 50])
+
+    def test_sums_stay_exact_beyond_float_precision(self):
+        big = 2 ** 53
+        _, (totals,) = archive._group_sum(np.array([1, 1]), np.array([big, 1], dtype=np.int64))
+        self.assertEqual(totals.tolist(), [big + 1])
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_archives_every_row_of_the_current_version(self):
+        month = date(2020, 12, 1)
+        customer_month(month, [('B1', 1)])
+        snapshot = customer_month(month, [('B1', 5), ('B2', 7)])
+        # Saved through the admin with another day of the month
+        CustomerData.all_versions.create(
+            branch_code=Branch.objects.get(branch_code='B1'), customer_category=CustomerCategory.objects.get(),
+            service_type=ServiceType.objects.get(), status='INACTIVE', month_year=date(2020, 12, 15),
+            snapshot=snapshot, number_of_customers=3,
+        )
+        stdout = StringIO()
+        call_command('archive_months', stdout=stdout)
+        self.assertIn('Archived CUSTOMER 2020-12: 3 rows', stdout.getvalue())
+
+        self.assertFalse(CustomerData.all_versions.exists())
+        self.assertIsNone(current_snapshot('CUSTOMER', month))
+        archived = ArchivedMonth.objects.get()
+        self.assertEqual((archived.month_year, archived.row_count), (month, 3))
+        self.assertEqual(archived.totals, {'status': {'ACTIVE': 12, 'INACTIVE': 3}})
+        self.assertEqual(
+            archive.customer_aggregates(), ({month: 15}, {'ACTIVE': 12, 'INACTIVE': 3})
+        )
+        branch = Branch.objects.get(branch_code='B2').pk
+        self.assertEqual(
+            archive.customer_aggregates(filters={'branch_code_id': branch}), ({month: 7}, {'ACTIVE': 7})
+        )
+
+    def test_unfiltered_reads_do_not_open_the_files(self):
+        transaction_month(MONTH, [('0-1000', 2, '10.25'), ('1000+', 1, '2000.00')])
+        self.assertEqual(archive.archive_month('TRANSACTION', date(2040, 12, 20)), 2)
+        (Path(settings.MEDIA_ROOT) / ArchivedMonth.objects.get().file_name).unlink()
+        for cache in archive._column_caches.values():
+            cache.cache_clear()
+
+        self.assertEqual(
+            archive.transaction_aggregates(),
+            ({MONTH: (Decimal('2010.25'), 3)}, {'Deposit': (Decimal('2010.25'), 3)}),
+        )
+        log_in(self.client)
+        data = self.client.get('/api/dashboard-data/').json()
+        self.assertEqual(data['monthly_transactions'], [
+            {'month_year': '2040-12-01', 'total_amount': '2010.25', 'total_transactions': 3},
+        ])
+        with self.assertRaises(FileNotFoundError):
+            archive.transaction_aggregates(filters={'range_of_transactions': '1000+'})
+
+    def test_a_month_without_a_current_version_is_not_archived(self):
+        with self.assertRaises(ValueError):
+            archive.archive_month('CUSTOMER', MONTH)
+        self.assertFalse(ArchivedMonth.objects.exists())
+
+
+class LoadTestTests(TestCase):
+    UPLOAD_MONTH = date(2000, 1, 1)
+
+    RESULTS = {
+        'summary': {'requests': 0, 'errors': 0, 'throughput_rps': 0.0, 'login_failures': 0},
+        'endpoints': {},
+    }
+
+    def fake_run(self, *args, **kwargs):
+        """Stands in for the HTTP run: uploads the scratch month twice with a new service type"""
+        for _ in range(2):
+            rows = [{'service_type': 'Load test', 'status': 'active', 'count': '1'}]
+            process_total_user_data(iter(rows), self.UPLOAD_MONTH)
+            DataUploadLog.objects.create(
+                month_year=self.UPLOAD_MONTH, data_type='TOTAL_USER', file_name='load_test.csv', status='SUCCESS'
+            )
+        return self.RESULTS
+
+    def test_the_upload_month_is_removed_after_the_run(self):
+        customer_month(MONTH, [('B1', 5)])
+        with mock.patch('dashboard.management.commands.load_test.run_load_test', side_effect=self.fake_run):
+            call_command('load_test', '--password', 'x', stdout=StringIO())
+
+        self.assertFalse(MonthSnapshot.objects.filter(month_year=self.UPLOAD_MONTH).exists())
+        self.assertFalse(DataUploadLog.objects.filter(month_year=self.UPLOAD_MONTH).exists())
+        self.assertEqual(list(ServiceType.objects.values_list('service_name', flat=True)), ['Mobile Banking'])
+        self.assertEqual(CustomerData.objects.get().number_of_customers, 5)
+
+    def test_a_month_with_data_is_refused(self):
+        process_total_user_data(iter([{'service_type': 'Mobile', 'status': 'active', 'count': '1'}]), self.UPLOAD_MONTH)
+        with mock.patch('dashboard.management.commands.load_test.run_load_test') as run:
+            with self.assertRaisesMessage(CommandError, '2000-01 already has TOTAL_USER data'):
+                call_command('load_test', '--password', 'x', stdout=StringIO())
+            run.assert_not_called()
+            # Without the write scenario the month is left alone
+            run.return_value = self.RESULTS
+            call_command('load_test', '--password', 'x', '--mix', 'data_upload=0', stdout=StringIO())
+        self.assertEqual(TotalUser.objects.filter(month_year=self.UPLOAD_MONTH).count(), 1)
+
+    def test_regressions_against_a_baseline(self):
+        self.assertEqual(percentile([10, 20, 30, 40], 95), 40)
+        self.assertEqual(percentile([10, 20, 30, 40], 50), 20)
+        baseline = {'endpoints': {'home': {
+            'p95_ms': 100, 'p99_ms': 200, 'throughput_rps': 10, 'error_rate': 0.0, 'requests': 50,
+        }}}
+        current = {'endpoints': {'home': {
+            'p95_ms': 115, 'p99_ms': 300, 'throughput_rps': 7, 'error_rate': 0.02, 'requests': 40,
+        }}}
+        self.assertEqual(compare_results(baseline, current, 0.2), [
+            'home: p99_ms 200 -> 300', 'home: throughput_rps 10 -> 7', 'home: error_rate 0.0 -> 0.02',
+        ])
+
+
+class RobustScoresTests(SimpleTestCase):
+    def test_outlier_scores_high_and_steady_series_low(self):
+        matrix = np.array([
+            [100, 102, 98, 101, 99, 100],
+            [100, 102, 98, 101, 99, 200],
+        ], dtype=float)
+        indices, expected, scores = robust_scores(matrix)
+        self.assertEqual(indices.tolist(), [0, 1])
+        self.assertEqual(expected.tolist(), [100, 100])
+        self.assertLess(abs(scores[0]), 1)
+        self.assertGreater(scores[1], 3.5)
+
+    def test_series_without_enough_history_or_current_value_are_skipped(self):
+        matrix = np.array([
+            [np.nan, np.nan, 10, 10, 12],
+            [10, 11, 12, 10, np.nan],
+            [10, 11, 12, 10, 11],
+        ])
+        indices, _, _ = robust_scores(matrix, min_history=3)
+        self.assertEqual(indices.tolist(), [2])
+
+    def test_flat_zero_history_does_not_divide_by_zero(self):
+        _, expected, scores = robust_scores(np.array([[0, 0, 0, 0, 5]], dtype=float))
+        self.assertEqual(expected.tolist(), [0])
+        self.assertEqual(scores.tolist(), [5])
+
+
+class DetectAnomaliesTests(TestCase):
+    # The twelve months before MONTH
+    HISTORY = [date(2039 + (index + 11) // 12, (index + 11) % 12 + 1, 1) for index in range(12)]
+
+    def test_jumps_are_flagged_with_their_series(self):
+        for index, month in enumerate(self.HISTORY):
+            customer_month(month, [('B1', 100 + index % 3), ('B2', 50 + index % 2)])
+        snapshot = customer_month(MONTH, [('B1', 400), ('B2', 51), ('B3', 7)])
+        self.assertEqual(detect_anomalies('CUSTOMER', MONTH, snapshot), 1)
+        anomaly = snapshot.anomalies.get()
+        self.assertEqual(anomaly.series, 'B1 - Branch B1 / Individual / Mobile Banking / ACTIVE')
+        self.assertEqual((anomaly.value, anomaly.expected), (400, 101))
+
+        # A month without rows of its own flags nothing
+        empty = new_snapshot('CUSTOMER', date(2041, 1, 1))
+        publish(empty)
+        self.assertEqual(detect_anomalies('CUSTOMER', date(2041, 1, 1), empty), 0)
+
+    def test_transaction_measures_are_scored_separately(self):
+        for index, month in enumerate(self.HISTORY):
+            transaction_month(month, [('0-1000', 10 + index % 2, '500.00'), ('1000+', 3, '9000.00')])
+        snapshot = transaction_month(MONTH, [('0-1000', 11, '500.00'), ('1000+', 3, '90000.00')])
+        self.assertEqual(detect_anomalies('TRANSACTION', MONTH, snapshot), 1)
+        anomaly = snapshot.anomalies.get()
+        self.assertEqual((anomaly.measure, anomaly.value), ('amount', 90000))
+        self.assertTrue(anomaly.series.startswith('1000+ / Cheque / Deposit'))
+
+    def test_tens_of_thousands_of_series_score_well_under_a_second(self):
+        # 100 branches x 2 categories x 50 service types x 2 statuses, over 13 months
+        Branch.objects.bulk_create(Branch(branch_code=f'B{index}', branch_name=f'B{index}') for index in range(100))
+        CustomerCategory.objects.bulk_create(CustomerCategory(category_name=name) for name in ('Individual', 'Firm'))
+        ServiceType.objects.bulk_create(ServiceType(service_name=f'Service {index}') for index in range(50))
+        for index, month in enumerate(self.HISTORY + [MONTH]):
+            snapshot = new_snapshot('CUSTOMER', month)
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    INSERT INTO {CustomerData._meta.db_table}
+                        (branch_code_id, customer_category_id, service_type_id, status, number_of_customers,
+                         month_year, snapshot_id, created_at, updated_at)
+                    SELECT b.id, c.id, s.id, status, 100 + (b.id + s.id + %s) %% 5, %s, %s, NOW(), NOW()
+                    FROM {Branch._meta.db_table} b, {CustomerCategory._meta.db_table} c,
+                         {ServiceType._meta.db_table} s, (VALUES ('ACTIVE'), ('INACTIVE')) AS statuses (status)
+                """, [index, month, snapshot.pk])
+                publish(snapshot, cursor.rowcount)
+        self.assertEqual(snapshot.row_count, 20000)
+        CustomerData.all_versions.filter(snapshot=snapshot, branch_code__branch_code='B7').update(number_of_customers=900)
+
+        began = time.perf_counter()
+        flagged = detect_anomalies('CUSTOMER', MONTH, snapshot)
+        elapsed = time.perf_counter() - began
+        self.assertEqual(flagged, 200)
+        self.assertLess(elapsed, 1.0)
+
+
+class ReportPackTests(TransactionTestCase):
+    """Sheets are queried from pool threads on their own connections, so these tests commit"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_a_pack_is_reused_until_the_month_changes(self):
+        customer_month(MONTH, [('B1', 3), ('B2', 4)])
+        paths = reports.report_pack(date(2040, 12, 15))
+        workbook = load_workbook(paths['xlsx'], read_only=True)
+        self.assertEqual(workbook.sheetnames[0], 'Summary')
+        self.assertEqual(list(workbook['Branch Totals'].values), [
+            ('Branch Code', 'Branch Name', 'Active', 'Inactive', 'Total'),
+            ('B1', 'Branch B1', 3, None, 3),
+            ('B2', 'Branch B2', 4, None, 4),
+        ])
+        workbook.close()
+        with zipfile.ZipFile(paths['zip']) as bundle:
+            self.assertIn('2040-12_branch_totals.csv', bundle.namelist())
+            self.assertEqual(
+                bundle.read('2040-12_branch_totals.csv').decode().splitlines()[1], 'B1,Branch B1,3,,3'
+            )
+
+        with mock.patch.object(reports, 'build_sheets') as build_sheets:
+            self.assertEqual(reports.report_pack(MONTH), paths)
+            build_sheets.assert_not_called()
+
+        customer_month(MONTH, [('B1', 5)])
+        # Superseded packs are only removed once past the grace period
+        with mock.patch.object(reports, 'STALE_PACK_GRACE_SECONDS', -60):
+            rebuilt = reports.report_pack(MONTH)
+        self.assertNotEqual(rebuilt, paths)
+        self.assertFalse(any(path.exists() for path in paths.values()))
+        self.assertEqual(
+            sorted(path.name for path in rebuilt['xlsx'].parent.iterdir()),
+            sorted(path.name for path in rebuilt.values()),
+        )
+
+    def test_command_copies_the_pack(self):
+        customer_month(MONTH, [('B1', 3)])
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        stdout = StringIO()
+        call_command('build_report_pack', '2040-12', '--output-dir', output_dir, stdout=stdout)
+        self.assertEqual(
+            sorted(path.name for path in Path(output_dir).iterdir()),
+            ['mis_report_2040-12.xlsx', 'mis_report_2040-12.zip'],
+        )
+        self.assertIn(output_dir, stdout.getvalue())
+        with self.assertRaisesMessage(CommandError, 'Invalid month format'):
+            call_command('build_report_pack', '2040-13', stdout=StringIO())
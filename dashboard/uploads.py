@@ -0,0 +1,190 @@
+"""Streaming readers for uploaded data files
+
+Uploads may be plain CSV, gzip-compressed CSV, Excel (.xlsx) or a zip of
+any of those. Rows are read incrementally as dicts keyed by the header
+row, so the processors never hold a whole decompressed file in memory.
+Headers are then mapped to the processors' column names through the
+column-mapping profile chosen for the upload (settings.UPLOAD_PROFILES).
+"""
+import csv
+import gzip
+import io
+import re
+import zipfile
+from collections import namedtuple
+from datetime import date
+from itertools import islice
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from openpyxl import load_workbook
+
+SUPPORTED_EXTENSIONS = ('.csv', '.csv.gz', '.xlsx', '.zip')
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+# Month in a file name such as customers_2025-07.csv or 2025_07.xlsx
+MONTH_IN_NAME = re.compile(r'(?<!\d)(\d{4})[-_](\d{2})(?!\d)')
+
+UploadSource = namedtuple('UploadSource', ['name', 'month_year', 'rows'])
+
+# Column name used by the processors -> header in the standard upload files
+UPLOAD_COLUMNS = {
+    'CUSTOMER': {
+        'branch_code': 'Branch code',
+        'branch_name': 'Branch name',
+        'customer_category': 'Categorization of customers',
+        'service_type': 'Mobile Banking',
+        'status': 'Status',
+        'number_of_customers': 'Number of customers',
+    },
+    'TRANSACTION': {
+        'range_of_transactions': 'Range of transactions',
+        'form_of_instrument': 'Form of instrument',
+        'type_of_transaction': 'Type of transaction',
+        'geographical_location': 'Geographical location',
+        'channel_used': 'Channel used',
+        'number_of_transactions': 'Number of transactions',
+        'amount': 'Amount',
+    },
+    'TOTAL_USER': {
+        'service_type': 'Service type',
+        'status': 'Status',
+        'count': 'Count',
+    },
+    'TOTAL_TRANSACTION': {
+        'range_of_transactions': 'Range of transactions',
+        'type_of_transaction': 'Type of transaction',
+        'form_of_instrument': 'Form of instrument',
+        'geographical_location': 'Geographical location',
+        'channel_used': 'Channel used',
+        'number_of_transactions': 'Number of transactions',
+        'amount': 'Amount',
+    },
+}
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def month_from_name(name, default):
+    match = MONTH_IN_NAME.search(PurePosixPath(name).name)
+    if match:
+        year, month = int(match.group(1)), int(match.group(2))
+        if 1 <= month <= 12:
+            return date(year, month, 1)
+    return default
+
+
+def column_mapping(data_type, profile='default'):
+    """{column name: file header} for a data type under an UPLOAD_PROFILES profile"""
+    return {**UPLOAD_COLUMNS[data_type], **settings.UPLOAD_PROFILES[profile].get(data_type, {})}
+
+
+def resolve_headers(names, mapping):
+    """{column name: the file's header for it, or None}
+
+    Headers match ignoring case and surrounding spaces.
+    """
+    by_name = {name.strip().lower(): name for name in names if name is not None}
+    return {column: by_name.get(header.strip().lower()) for column, header in mapping.items()}
+
+
+def remap_row(row, headers):
+    return {column: row.get(header) or '' for column, header in headers.items()}
+
+
+def csv_rows(binary_file):
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    yield from csv.DictReader(text)
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Excel stores whole numbers as floats; keep them parseable by int()
+        return str(int(value))
+    return str(value)
+
+
+def xlsx_rows(binary_file):
+    """Rows of the first worksheet, read with openpyxl's read-only row iterator"""
+    workbook = load_workbook(binary_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_cell_text(cell).strip() for cell in next(rows, ())]
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            yield {column: _cell_text(value) for column, value in zip(header, values)}
+    finally:
+        workbook.close()
+
+
+def _file_rows(name, binary_file, head):
+    if head.startswith(GZIP_MAGIC):
+        return csv_rows(gzip.GzipFile(fileobj=binary_file))
+    if name.lower().endswith('.xlsx'):
+        return xlsx_rows(binary_file)
+    return csv_rows(binary_file)
+
+
+def _is_data_member(member):
+    path = PurePosixPath(member.filename)
+    return (
+        not member.is_dir()
+        and '__MACOSX' not in path.parts
+        and not path.name.startswith('.')
+        and path.name.lower().endswith(SUPPORTED_EXTENSIONS[:-1])
+    )
+
+
+def iter_upload_sources(uploaded_file, month_year):
+    """Yield an UploadSource per data file in the upload
+
+    A zip yields one source per contained CSV/.csv.gz/.xlsx file, each for
+    the month in its file name (falling back to month_year). Each file
+    publishes its month, so a zip with two files for the same month is
+    rejected with ValueError before any is read. Any other upload is a
+    single source for month_year.
+    """
+    binary_file = uploaded_file.file
+    binary_file.seek(0)
+    head = binary_file.read(4)
+    binary_file.seek(0)
+
+    if head.startswith(ZIP_MAGIC) and not uploaded_file.name.lower().endswith('.xlsx'):
+        with zipfile.ZipFile(binary_file) as archive:
+            members = sorted(filter(_is_data_member, archive.infolist()), key=lambda member: member.filename)
+            if not members:
+                raise ValueError('The zip file contains no CSV or Excel files.')
+            months = {}
+            for member in members:
+                month = month_from_name(member.filename, month_year)
+                if month in months:
+                    raise ValueError(
+                        f"{months[month]} and {member.filename} are both for {month:%Y-%m}; "
+                        f"each month can only be uploaded once per zip file."
+                    )
+                months[month] = member.filename
+            for member in members:
+                if member.filename.lower().endswith('.xlsx'):
+                    # openpyxl seeks around the workbook, which is slow on a compressed stream
+                    member_file = io.BytesIO(archive.read(member))
+                else:
+                    member_file = archive.open(member)
+                with member_file:
+                    head = member_file.read(4)
+                    member_file.seek(0)
+                    yield UploadSource(
+                        member.filename,
+                        month_from_name(member.filename, month_year),
+                        _file_rows(member.filename, member_file, head),
+                    )
+        return
+
+    yield UploadSource(uploaded_file.name, month_year, _file_rows(uploaded_file.name, binary_file, head))
@@ -4,13 +4,20 @@ from . import views
 urlpatterns = [
     path('', views.dashboard_home, name='dashboard_home'),
     path('master-parameters/', views.master_parameters, name='master_parameters'),
+    path('api/master-data/<slug:table>/', views.api_master_data, name='api_master_data'),
     path('data-upload/', views.data_upload, name='data_upload'),
     path('data-tables/', views.data_tables, name='data_tables'),
     path('api/dashboard-data/', views.api_dashboard_data, name='api_dashboard_data'),
+    path('api/v2/dashboard-data/', views.api_dashboard_data_v2, name='api_dashboard_data_v2'),
+    path('api/events/', views.dashboard_events, name='dashboard_events'),
+    path('api/compare/users/', views.api_compare_users, name='api_compare_users'),
+    path('api/compare/transactions/', views.api_compare_transactions, name='api_compare_transactions'),
+    path('api/leaderboard/branches/', views.api_branch_leaderboard, name='api_branch_leaderboard'),
     path('total-users/', views.total_user_list, name='total_user_list'),
     path('total-user-summary/', views.total_user_summary, name='total_user_summary'),
     path('total-transaction-summary/', views.total_transaction_summary, name='total_transaction_summary'),
     path('total-transactions/', views.total_transaction_list, name='total_transaction_list'),
+    path('reports/pack/', views.report_pack_download, name='report_pack'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
 ]
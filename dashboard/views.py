@@ -1,27 +1,44 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Q, Max, FloatField
+from django.db.models.functions import Abs, Cast
 from django.db import models
 from django.db import transaction
-from django.core.serializers import serialize
 from datetime import datetime
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
-from django.urls import reverse
-from django.forms.models import model_to_dict
-import csv
-import io
-import json
-from django.utils import timezone
-from datetime import timedelta
+from django.conf import settings
+from decimal import Decimal
 from .models import (
     Branch, CustomerCategory, ServiceType,TransactionRange, TransactionType,
     InstrumentType, GeographicalLocation, ChannelUsed,
-    CustomerData, TransactionData, DataUploadLog, TotalUser, TotalTransaction
+    CustomerData, TransactionData, DataUploadLog, TotalUser, TotalTransaction, DataAnomaly
 )
+from .fiscal import merge_period_totals, period_totals, rollup_by_period
+from .responses import fast_json_response
+from .routers import use_replica, pin_to_primary
+from .shedding import shed_load
+from .events import notify_data_changed, data_changed_events
+from .uploads import batched, iter_upload_sources, column_mapping
+from .prevalidation import prevalidate
+from .anomalies import detect_anomalies
+from .reconciliation import reconcile_month, reconciled_type
+from .reports import report_pack
+from .archive import customer_aggregates, transaction_aggregates, drop_archive
+from .comparisons import compare_total_users, compare_total_transactions, TRANSACTION_DIMENSIONS
+from .leaderboard import branch_leaderboard, LEADERBOARD_METRICS, LEADERBOARD_FILTERS, LEADERBOARD_MAX_LIMIT
+from .snapshots import current_snapshot, new_snapshot, publish, link_upload_log
+from .ingest import (
+    BULK_BATCH_SIZE, DimensionCache, process_total_user_data, process_total_transaction_data,
+    derive_total_users, derive_total_transactions
+)
+
+
+# Branches shown in the dashboard's leaderboard widget
+LEADERBOARD_SIZE = 5
 
 # @login_required
 # def dashboard_home(request):
@@ -39,6 +56,8 @@ from .models import (
 #         'records': data
 #     })
 @login_required
+@shed_load('report')
+@use_replica
 def dashboard_home(request):
     # ======== Users Data ========
     selected_month = request.GET.get('month_year')
@@ -54,110 +73,273 @@ def dashboard_home(request):
         latest_user_month = TotalUser.objects.latest('month_year').month_year
         latest_tx_month = latest_user_month
 
-    user_aggregated = (
-        TotalUser.objects
-        .filter(month_year=latest_user_month)
-        .values('service_type__service_name', 'status')
-        .annotate(total_count=Sum('count'))
-    )
-
+    # Each card set is one window-function query that also returns last month's figures
     user_cards = {}
-    for record in user_aggregated:
-        service_name = record['service_type__service_name']
-        status = record['status']
-        total_count = record['total_count']
+    for record in compare_total_users(latest_user_month):
+        service_name = record['name']
         if service_name not in user_cards:
-            user_cards[service_name] = {'active': 0, 'inactive': 0}
-        user_cards[service_name][status] = total_count
+            user_cards[service_name] = {'active': 0, 'inactive': 0, 'previous_total': 0}
+        user_cards[service_name][record['status']] = record['users']
+        user_cards[service_name]['previous_total'] += record['users_previous'] or 0
 
     for service_name, counts in user_cards.items():
         counts['total'] = counts['active'] + counts['inactive']
+        previous_total = counts['previous_total']
+        counts['mom_pct'] = round(100.0 * (counts['total'] - previous_total) / previous_total, 2) if previous_total else None
 
     # ======== Transactions Data ========
-    tx_aggregated = (
-        TotalTransaction.objects
-        .filter(month_year=latest_tx_month)
-        .values('form_of_instrument__instrument_type_name')
-        .annotate(
-            total_transactions=Sum('number_of_transactions'),
-            total_amount=Sum('amount')
-        )
-    )
-
     transaction_cards = {}
-    for record in tx_aggregated:
-        instrument_name = record['form_of_instrument__instrument_type_name']
-        transaction_cards[instrument_name] = {
-            'total_transactions': record['total_transactions'],
-            'total_amount': record['total_amount']
+    for record in compare_total_transactions(latest_tx_month, by='instrument'):
+        transaction_cards[record['name']] = {
+            'total_transactions': record['transactions'],
+            'total_amount': record['amount'],
+            'amount_mom_pct': record['amount_mom_pct'],
+            'amount_yoy_pct': record['amount_yoy_pct'],
         }
 
-    return render(request, 'dashboard/index.html', {
+    # Unusual values in the current versions of the month's uploads
+    anomalies = DataAnomaly.objects.filter(
+        month_year=latest_user_month.replace(day=1), snapshot__current__isnull=False
+    ).annotate(magnitude=Abs('score')).order_by('-magnitude')
+
+    # Branches that gained the most active customers over last month
+    leaderboard = branch_leaderboard(
+        latest_user_month, metric='growth', limit=LEADERBOARD_SIZE, filters={'status': 'ACTIVE'}
+    )
+
+    # The live-refresh script re-fetches just the cards for an updated month
+    template = 'dashboard/dashboard_cards.html' if request.GET.get('partial') else 'dashboard/index.html'
+    return render(request, template, {
         'latest_user_month': latest_user_month.strftime('%Y-%m'),
         'user_cards': user_cards,
         'latest_tx_month': latest_tx_month.strftime('%Y-%m'),
-        'transaction_cards': transaction_cards
+        'transaction_cards': transaction_cards,
+        'leaderboard': leaderboard,
+        'anomalies': anomalies[:10],
+        'anomaly_count': anomalies.count(),
+        'month_selected': bool(selected_month),
     })
+
+
+@login_required
+def dashboard_events(request):
+    """Server-Sent Events stream announcing newly committed uploads"""
+    stream = data_changed_events()
+    if stream is None:
+        # The page keeps working without live refresh and retries later
+        response = HttpResponse(status=503)
+        response['Retry-After'] = str(settings.LOAD_SHED_RETRY_AFTER)
+        return response
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Master tables served by api_master_data: url key -> (model, columns)
+MASTER_TABLES = {
+    'branches': (Branch, ['branch_code', 'branch_name']),
+    'customer-categories': (CustomerCategory, ['category_name']),
+    'service-types': (ServiceType, ['service_name']),
+    'transaction-ranges': (TransactionRange, ['range_name']),
+    'transaction-types': (TransactionType, ['transaction_type_name']),
+    'instrument-types': (InstrumentType, ['instrument_type_name']),
+    'geographical-locations': (GeographicalLocation, ['location_name']),
+    'channels-used': (ChannelUsed, ['channel_name']),
+}
+MASTER_PAGE_SIZE = 25
+MASTER_MAX_PAGE_SIZE = 100
+
+
 @login_required
 def master_parameters(request):
     """View for managing master parameters"""
+    # Only the tab headers are rendered; rows are fetched from api_master_data
+    master_tables = []
+    for key, (model, columns) in MASTER_TABLES.items():
+        master_tables.append({
+            'key': key,
+            'title': model._meta.verbose_name_plural,
+            'headers': [model._meta.get_field(column).verbose_name.title() for column in columns],
+        })
     context = {
-        'branches': Branch.objects.all(),
-        'customer_categories': CustomerCategory.objects.all(),
-        'service_types': ServiceType.objects.all(),
-        'transaction_types': TransactionType.objects.all(),
-        'instrument_types': InstrumentType.objects.all(),
-        'geographical_locations': GeographicalLocation.objects.all(),
-        'channels_used': ChannelUsed.objects.all(),
+        'master_tables': master_tables,
+        'page_size': MASTER_PAGE_SIZE,
     }
     return render(request, 'dashboard/master_parameters.html', context)
+
+
+@login_required
+def api_master_data(request, table):
+    """Paginated, searchable JSON listing of a single master table"""
+    if table not in MASTER_TABLES:
+        return JsonResponse({'error': 'Unknown master table'}, status=404)
+    model, columns = MASTER_TABLES[table]
+
+    queryset = model.objects.order_by(columns[0], 'pk')
+    search = request.GET.get('q', '').strip()
+    if search:
+        # Terms shorter than a trigram are matched as a prefix
+        lookup = 'icontains' if len(search) >= 3 else 'istartswith'
+        q = Q()
+        for column in columns:
+            q |= Q(**{f'{column}__{lookup}': search})
+        queryset = queryset.filter(q)
+
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    try:
+        page_size = min(max(int(request.GET.get('page_size', MASTER_PAGE_SIZE)), 1), MASTER_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = MASTER_PAGE_SIZE
+
+    # Fetch one extra row to know whether a next page exists without a COUNT(*)
+    offset = (page - 1) * page_size
+    rows = list(queryset.values_list(*columns)[offset:offset + page_size + 1])
+
+    return JsonResponse({
+        'table': table,
+        'columns': columns,
+        'page': page,
+        'page_size': page_size,
+        'has_next': len(rows) > page_size,
+        'results': [list(row) for row in rows[:page_size]],
+    })
+
+
 @login_required
+@shed_load('upload')
 def data_upload(request):
     """View for uploading data files"""
     if request.method == 'POST':
         data_type = request.POST.get('data_type')
         month_year = request.POST.get('month_year')
         uploaded_file = request.FILES.get('data_file')
+        derive_totals = request.POST.get('derive_totals') == 'on'
+        profile = request.POST.get('profile') or 'default'
+        allow_new_values = request.POST.get('allow_new_values') == 'on'
+        preview = 'preview' in request.POST
         
         if not all([data_type, month_year, uploaded_file]):
             messages.error(request, 'All fields are required.')
             return redirect('data_upload')
         
+        processors = {
+            'CUSTOMER': process_customer_data,
+            'TRANSACTION': process_transaction_data,
+            'TOTAL_USER': process_total_user_data,
+            'TOTAL_TRANSACTION': process_total_transaction_data,
+        }
+        if data_type not in processors:
+            messages.error(request, 'Invalid data type.')
+            return redirect('data_upload')
+        if profile not in settings.UPLOAD_PROFILES:
+            messages.error(request, 'Invalid source system profile.')
+            return redirect('data_upload')
+
         try:
             month_year_date = datetime.strptime(month_year, '%Y-%m').date()
-            
-            if data_type == 'CUSTOMER':
-                result = process_customer_data(uploaded_file, month_year_date)
-            elif data_type == 'TRANSACTION':
-                result = process_transaction_data(uploaded_file, month_year_date)
-            else:
-                messages.error(request, 'Invalid data type.')
-                return redirect('data_upload')
-            
-            # Log the upload
-            DataUploadLog.objects.create(
-                month_year=month_year_date,
-                data_type=data_type,
-                file_name=uploaded_file.name,
-                records_uploaded=result['records_uploaded'],
-                status=result['status'],
-                error_message=result.get('error_message', '')
-            )
-            
-            if result['status'] == 'SUCCESS':
-                messages.success(request, f"Successfully uploaded {result['records_uploaded']} records.")
-            else:
-                messages.error(request, f"Upload failed: {result.get('error_message', 'Unknown error')}")
-                
         except ValueError:
             messages.error(request, 'Invalid date format. Use YYYY-MM.')
+            return redirect('data_upload')
+
+        try:
+            # Keep this user's reads on the primary until the replica catches up
+            pin_to_primary(request)
+
+            mapping = column_mapping(data_type, profile)
+            previews = []
+            # A zip upload fans out into one ingest per contained file
+            for source in iter_upload_sources(uploaded_file, month_year_date):
+                label = f"{source.name}: " if source.name != uploaded_file.name else ''
+                # Header and sample checks run before the ingest writes anything
+                report, rows = prevalidate(data_type, source.rows, mapping, allow_new_values)
+                if preview:
+                    previews.append({
+                        'name': source.name,
+                        'month_year': source.month_year,
+                        'headers': [(mapping[column], header) for column, header in report['headers'].items()],
+                        'rows': [[row[column] for column in mapping] for row in report['preview']],
+                        **{key: report[key] for key in ('errors', 'warnings', 'sampled')},
+                    })
+                    continue
+                if report['errors']:
+                    error_message = ' '.join(report['errors'])
+                    DataUploadLog.objects.create(
+                        month_year=source.month_year,
+                        data_type=data_type,
+                        file_name=source.name,
+                        records_uploaded=0,
+                        status='FAILED',
+                        error_message=error_message
+                    )
+                    messages.error(request, f"{label}Upload failed before any data was written: {error_message}")
+                    continue
+                for warning in report['warnings']:
+                    messages.warning(request, f"{label}{warning}")
+
+                result = processors[data_type](rows, source.month_year)
+
+                # Log the upload
+                upload_log = DataUploadLog.objects.create(
+                    month_year=source.month_year,
+                    data_type=data_type,
+                    file_name=source.name,
+                    records_uploaded=result['records_uploaded'],
+                    status=result['status'],
+                    error_message=result.get('error_message', '')
+                )
+
+                if result['status'] == 'SUCCESS':
+                    link_upload_log(result['snapshot'], upload_log)
+                    messages.success(request, f"{label}Successfully uploaded {result['records_uploaded']} records.")
+                    if data_type in ('CUSTOMER', 'TRANSACTION'):
+                        # A re-uploaded month supersedes its archived copy
+                        drop_archive(data_type, source.month_year)
+                        flagged = detect_anomalies(data_type, source.month_year, result['snapshot'], upload_log)
+                        if flagged:
+                            messages.warning(request, f"{label}{flagged} values look unusual compared with earlier months; see the dashboard.")
+                    notify_data_changed(result['snapshot'])
+                    try:
+                        if derive_totals and data_type == 'CUSTOMER':
+                            rows = derive_total_users(source.month_year, upload_log)
+                            notify_data_changed(current_snapshot('TOTAL_USER', source.month_year))
+                            messages.success(request, f"Derived {rows} total user records for {source.month_year:%Y-%m}.")
+                        elif derive_totals and data_type == 'TRANSACTION':
+                            rows = derive_total_transactions(source.month_year, upload_log)
+                            notify_data_changed(current_snapshot('TOTAL_TRANSACTION', source.month_year))
+                            messages.success(request, f"Derived {rows} total transaction records for {source.month_year:%Y-%m}.")
+                    except ValueError as e:
+                        # The upload itself is already saved; only the totals were not derived
+                        messages.warning(request, f"{label}Totals not derived: {e}. Existing totals kept.")
+                    # Check the month's detail rows still add up to its totals
+                    mismatches = reconcile_month(reconciled_type(data_type), source.month_year, upload_log)
+                    if mismatches:
+                        messages.warning(request, f"{label}{mismatches} figures differ between the detail and total data for {source.month_year:%Y-%m}; see the Data Upload Log.")
+                else:
+                    messages.error(request, f"{label}Upload failed: {result.get('error_message', 'Unknown error')}")
+
+            if preview:
+                return render(request, 'dashboard/data_upload.html', {
+                    'profiles': list(settings.UPLOAD_PROFILES),
+                    'previews': previews,
+                    'columns': list(mapping.values()),
+                    'form': request.POST,
+                })
+
         except Exception as e:
             messages.error(request, f'Upload failed: {str(e)}')
         
         return redirect('data_upload')
     
-    return render(request, 'dashboard/data_upload.html')
+    return render(request, 'dashboard/data_upload.html', {'profiles': list(settings.UPLOAD_PROFILES)})
+
+
 @login_required
+@shed_load('report')
+@use_replica
 def data_tables(request):
     """View for displaying data tables"""
     data_type = request.GET.get('type', 'customer')
@@ -184,122 +366,179 @@ def data_tables(request):
     }
     return render(request, template, context)
 
-def process_customer_data(uploaded_file, month_year):
-    """Process uploaded customer data CSV file"""
+
+def process_customer_data(rows, month_year):
+    """Process uploaded customer data rows"""
     try:
-        file_data = uploaded_file.read().decode('utf-8')
-        csv_data = csv.DictReader(io.StringIO(file_data))
-        
         records_uploaded = 0
         
         with transaction.atomic():
-            for row in csv_data:
-                # Create or get related objects
-                branch, _ = Branch.objects.get_or_create(
-                    branch_code=row['Branch code'],
-                    defaults={'branch_name': row['Branch name']}
-                )
-                
-                category, _ = CustomerCategory.objects.get_or_create(
-                    category_name=row['Categorization of customers']
-                )
-                
-                service, _ = ServiceType.objects.get_or_create(
-                    service_name=row['Mobile Banking']
-                )
-                
-                # Create customer data record
-                CustomerData.objects.update_or_create(
-                    branch_code=branch,
-                    customer_category=category,
-                    service_type=service,
-                    status=row['Status'].upper(),
-                    month_year=month_year,
-                    defaults={
-                        'number_of_customers': int(row['Number of customers'])
-                    }
+            snapshot = new_snapshot('CUSTOMER', month_year)
+            branches = DimensionCache(Branch, 'branch_code')
+            categories = DimensionCache(CustomerCategory, 'category_name')
+            services = DimensionCache(ServiceType, 'service_name')
+            for batch in batched(rows, BULK_BATCH_SIZE):
+                # A repeated key replaces the earlier row: within a batch here,
+                # across batches through the insert's ON CONFLICT update
+                records = {}
+                for row in batch:
+                    branch_id = branches.get(row['branch_code'], branch_name=row['branch_name'])
+                    category_id = categories.get(row['customer_category'])
+                    service_id = services.get(row['service_type'])
+                    status = row['status'].strip().upper()
+                    records[(branch_id, category_id, service_id, status)] = CustomerData(
+                        branch_code_id=branch_id,
+                        customer_category_id=category_id,
+                        service_type_id=service_id,
+                        status=status,
+                        month_year=month_year,
+                        snapshot=snapshot,
+                        number_of_customers=int(row['number_of_customers'])
+                    )
+                CustomerData.all_versions.bulk_create(
+                    records.values(),
+                    update_conflicts=True,
+                    unique_fields=CustomerData._meta.unique_together[0],
+                    update_fields=['number_of_customers'],
                 )
-                records_uploaded += 1
+                records_uploaded += len(batch)
+
+            publish(snapshot, CustomerData.all_versions.filter(snapshot=snapshot).count())
         
-        return {'status': 'SUCCESS', 'records_uploaded': records_uploaded}
+        return {'status': 'SUCCESS', 'records_uploaded': records_uploaded, 'snapshot': snapshot}
     
     except Exception as e:
         return {'status': 'FAILED', 'records_uploaded': 0, 'error_message': str(e)}
 
-def process_transaction_data(uploaded_file, month_year):
-    """Process uploaded transaction data CSV file"""
+
+def process_transaction_data(rows, month_year):
+    """Process uploaded transaction data rows"""
     try:
-        file_data = uploaded_file.read().decode('utf-8')
-        csv_data = csv.DictReader(io.StringIO(file_data))
-        
         records_uploaded = 0
         
         with transaction.atomic():
-            for row in csv_data:
-                # Create or get related objects
-                instrument, _ = InstrumentType.objects.get_or_create(
-                    instrument_type_name=row['Form of instrument']
-                )
-                
-                trans_type, _ = TransactionType.objects.get_or_create(
-                    transaction_type_name=row['Type of transaction']
+            snapshot = new_snapshot('TRANSACTION', month_year)
+            instruments = DimensionCache(InstrumentType, 'instrument_type_name')
+            types = DimensionCache(TransactionType, 'transaction_type_name')
+            locations = DimensionCache(GeographicalLocation, 'location_name')
+            channels = DimensionCache(ChannelUsed, 'channel_name')
+            for batch in batched(rows, BULK_BATCH_SIZE):
+                # A repeated key replaces the earlier row: within a batch here,
+                # across batches through the insert's ON CONFLICT update
+                records = {}
+                for row in batch:
+                    instrument_id = instruments.get(row['form_of_instrument'])
+                    type_id = types.get(row['type_of_transaction'])
+                    location_id = locations.get(row['geographical_location'])
+                    channel_id = channels.get(row['channel_used'])
+                    key = (row['range_of_transactions'], instrument_id, type_id, location_id, channel_id)
+                    records[key] = TransactionData(
+                        month_year=month_year,
+                        range_of_transactions=row['range_of_transactions'],
+                        form_of_instrument_id=instrument_id,
+                        type_of_transaction_id=type_id,
+                        geographical_location_id=location_id,
+                        channel_used_id=channel_id,
+                        snapshot=snapshot,
+                        number_of_transactions=int(row['number_of_transactions']),
+                        amount=Decimal(row['amount'])
+                    )
+                TransactionData.all_versions.bulk_create(
+                    records.values(),
+                    update_conflicts=True,
+                    unique_fields=TransactionData._meta.unique_together[0],
+                    update_fields=['number_of_transactions', 'amount'],
                 )
-                
-                location, _ = GeographicalLocation.objects.get_or_create(
-                    location_name=row['Geographical location']
-                )
-                
-                channel, _ = ChannelUsed.objects.get_or_create(
-                    channel_name=row['Channel used']
-                )
-                
-                # Create transaction data record
-                TransactionData.objects.update_or_create(
-                    month_year=month_year,
-                    range_of_transactions=row['Range of transactions'],
-                    form_of_instrument=instrument,
-                    type_of_transaction=trans_type,
-                    geographical_location=location,
-                    channel_used=channel,
-                    defaults={
-                        'number_of_transactions': int(row['Number of transactions']),
-                        'amount': float(row['Amount'])
-                    }
-                )
-                records_uploaded += 1
+                records_uploaded += len(batch)
+
+            publish(snapshot, TransactionData.all_versions.filter(snapshot=snapshot).count())
         
-        return {'status': 'SUCCESS', 'records_uploaded': records_uploaded}
+        return {'status': 'SUCCESS', 'records_uploaded': records_uploaded, 'snapshot': snapshot}
     
     except Exception as e:
         return {'status': 'FAILED', 'records_uploaded': 0, 'error_message': str(e)}
 
+
 @csrf_exempt
+@shed_load('report', as_json=True)
+@use_replica
 def api_dashboard_data(request):
     """API endpoint for dashboard charts data"""
     if request.method == 'GET':
+        period = request.GET.get('period', 'month')
+
+        # Months moved to cold storage are read back from their archive files
+        archived_customer_months, archived_customer_statuses = customer_aggregates()
+        archived_transaction_months, archived_transaction_types = transaction_aggregates()
+
         # Customer data by status
-        customer_status_data = CustomerData.objects.values('status').annotate(
-            total=Sum('number_of_customers')
-        )
+        customer_status_data = [
+            {'status': status, 'total': total}
+            for status, total in merge_archived(
+                CustomerData.objects.values_list('status').annotate(total=Sum('number_of_customers')).order_by(),
+                archived_customer_statuses
+            )
+        ]
         
         # Transaction data by type
-        transaction_type_data = TransactionData.objects.values(
-            'type_of_transaction__transaction_type_name'
-        ).annotate(
-            total_amount=Sum('amount'),
-            total_count=Sum('number_of_transactions')
-        )
-        
-        # Monthly trends
-        monthly_customer_data = CustomerData.objects.values('month_year').annotate(
-            total_customers=Sum('number_of_customers')
-        ).order_by('month_year')
-        
-        monthly_transaction_data = TransactionData.objects.values('month_year').annotate(
-            total_amount=Sum('amount'),
-            total_transactions=Sum('number_of_transactions')
-        ).order_by('month_year')
+        transaction_type_data = [
+            {'type_of_transaction__transaction_type_name': name, 'total_amount': amount, 'total_count': count}
+            for name, amount, count in merge_archived(
+                TransactionData.objects.values_list('type_of_transaction__transaction_type_name').annotate(
+                    total_amount=Sum('amount'),
+                    total_count=Sum('number_of_transactions')
+                ).order_by(),
+                archived_transaction_types
+            )
+        ]
         
+        if period in ('quarter', 'year'):
+            # Grouped by the fiscal calendar in SQL; only the few archived
+            # months are rolled up here
+            monthly_customer_data = merge_period_totals(
+                period_totals(CustomerData.objects.all(), period, stock=True, total_customers=Sum('number_of_customers')),
+                rollup_by_period(
+                    [{'month_year': month, 'total_customers': total} for month, total in sorted(archived_customer_months.items())],
+                    period, last_fields=['total_customers']
+                ),
+            )
+            monthly_transaction_data = merge_period_totals(
+                period_totals(
+                    TransactionData.objects.all(), period,
+                    total_amount=Sum('amount'), total_transactions=Sum('number_of_transactions')
+                ),
+                rollup_by_period(
+                    [
+                        {'month_year': month, 'total_amount': amount, 'total_transactions': count}
+                        for month, (amount, count) in sorted(archived_transaction_months.items())
+                    ],
+                    period, sum_fields=['total_amount', 'total_transactions']
+                ),
+                sum_fields=['total_amount', 'total_transactions'],
+            )
+        else:
+            # Monthly trends
+            monthly_customer_data = [
+                {'month_year': month, 'total_customers': total}
+                for month, total in merge_archived(
+                    CustomerData.objects.values_list('month_year').annotate(
+                        total_customers=Sum('number_of_customers')
+                    ).order_by('month_year'),
+                    archived_customer_months
+                )
+            ]
+
+            monthly_transaction_data = [
+                {'month_year': month, 'total_amount': amount, 'total_transactions': count}
+                for month, amount, count in merge_archived(
+                    TransactionData.objects.values_list('month_year').annotate(
+                        total_amount=Sum('amount'),
+                        total_transactions=Sum('number_of_transactions')
+                    ).order_by('month_year'),
+                    archived_transaction_months
+                )
+            ]
+
         data = {
             'customer_status': list(customer_status_data),
             'transaction_types': list(transaction_type_data),
@@ -310,6 +549,261 @@ def api_dashboard_data(request):
         return JsonResponse(data)
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+# api_dashboard_data_v2 filters: GET parameter -> lookup on CustomerData / TransactionData
+CUSTOMER_CHART_FILTERS = {
+    'branch': 'branch_code_id',
+    'customer_category': 'customer_category_id',
+    'service_type': 'service_type_id',
+    'status': 'status',
+}
+TRANSACTION_CHART_FILTERS = {
+    'range_of_transactions': 'range_of_transactions',
+    'type_of_transaction': 'type_of_transaction_id',
+    'form_of_instrument': 'form_of_instrument_id',
+    'geographical_location': 'geographical_location_id',
+    'channel_used': 'channel_used_id',
+}
+
+
+def columnar(rows, names):
+    """Turn values_list tuples into {name: [values...]} series"""
+    columns = list(zip(*rows)) or [()] * len(names)
+    return {name: list(values) for name, values in zip(names, columns)}
+
+
+def merge_archived(rows, archived):
+    """Add archived {key: measure or (measures...)} totals into (key, measures...) rows, ordered by key"""
+    merged = {row[0]: list(row[1:]) for row in rows}
+    for key, measures in archived.items():
+        measures = measures if isinstance(measures, tuple) else (measures,)
+        current = merged.setdefault(key, [0] * len(measures))
+        for index, value in enumerate(measures):
+            current[index] = (current[index] or 0) + value
+    return [(key, *merged[key]) for key in sorted(merged, key=lambda key: (key is None, key))]
+
+
+def chart_filters(request, filter_map):
+    """Return (start, end, {lookup: value}) from the query string's month range and dimension filters
+
+    Raises ValueError with a message for the client on a malformed month or id.
+    """
+    months = []
+    for param in ('start', 'end'):
+        value = request.GET.get(param)
+        try:
+            months.append(datetime.strptime(value, '%Y-%m').date() if value else None)
+        except ValueError:
+            raise ValueError('Invalid month format. Use YYYY-MM.')
+    filters = {}
+    for param, lookup in filter_map.items():
+        value = request.GET.get(param)
+        if not value:
+            continue
+        if lookup.endswith('_id'):
+            if not value.isdigit():
+                raise ValueError(f"'{param}' must be an id.")
+            value = int(value)
+        filters[lookup] = value
+    return months[0], months[1], filters
+
+
+def chart_q(start, end, filters):
+    q = Q(**filters)
+    if start:
+        q &= Q(month_year__gte=start)
+    if end:
+        q &= Q(month_year__lte=end)
+    return q
+
+
+@login_required
+@shed_load('report', as_json=True)
+@use_replica
+def api_dashboard_data_v2(request):
+    """Columnar dashboard chart series with month-range and dimension filters"""
+    if request.method != 'GET':
+        return fast_json_response(request, {'error': 'Method not allowed'}, status=405)
+    try:
+        customer_start, customer_end, customer_filters = chart_filters(request, CUSTOMER_CHART_FILTERS)
+        transaction_start, transaction_end, transaction_filters = chart_filters(request, TRANSACTION_CHART_FILTERS)
+    except ValueError as e:
+        return fast_json_response(request, {'error': str(e)}, status=400)
+
+    customers = CustomerData.objects.filter(chart_q(customer_start, customer_end, customer_filters))
+    transactions = TransactionData.objects.filter(chart_q(transaction_start, transaction_end, transaction_filters))
+    # Amounts are summed as floats in SQL so no Decimal reaches the encoder
+    totals = {
+        'amount': Cast(Sum('amount'), FloatField()),
+        'count': Sum('number_of_transactions'),
+    }
+
+    # Archived months in the requested range are read back from their archive files
+    archived_customer_months, archived_customer_statuses = customer_aggregates(
+        customer_start, customer_end, customer_filters
+    )
+    archived_transaction_months, archived_transaction_types = transaction_aggregates(
+        transaction_start, transaction_end, transaction_filters
+    )
+    archived_transaction_months = {
+        month: (float(amount), count) for month, (amount, count) in archived_transaction_months.items()
+    }
+    archived_transaction_types = {
+        name: (float(amount), count) for name, (amount, count) in archived_transaction_types.items()
+    }
+
+    data = {
+        'customer_status': columnar(
+            merge_archived(
+                customers.values_list('status').annotate(customers=Sum('number_of_customers')).order_by('status'),
+                archived_customer_statuses
+            ),
+            ['status', 'customers']
+        ),
+        'transaction_types': columnar(
+            merge_archived(
+                transactions.values_list('type_of_transaction__transaction_type_name')
+                .annotate(**totals)
+                .order_by('type_of_transaction__transaction_type_name'),
+                archived_transaction_types
+            ),
+            ['type', 'amount', 'count']
+        ),
+        'monthly_customers': columnar(
+            merge_archived(
+                customers.values_list('month_year').annotate(customers=Sum('number_of_customers')).order_by('month_year'),
+                archived_customer_months
+            ),
+            ['month', 'customers']
+        ),
+        'monthly_transactions': columnar(
+            merge_archived(
+                transactions.values_list('month_year')
+                .annotate(**totals)
+                .order_by('month_year'),
+                archived_transaction_months
+            ),
+            ['month', 'amount', 'count']
+        ),
+    }
+    return fast_json_response(request, data)
+
+
+def parse_month_param(request, model):
+    """Return the requested YYYY-MM month, or the latest month loaded in model"""
+    month_year = request.GET.get('month_year')
+    if month_year:
+        return datetime.strptime(month_year, '%Y-%m').date()
+    return model.objects.latest('month_year').month_year
+
+
+@login_required
+@shed_load('report', as_json=True)
+@use_replica
+def api_compare_users(request):
+    """Users per service type and status with month-over-month and year-over-year changes"""
+    try:
+        month_year = parse_month_param(request, TotalUser)
+    except ValueError:
+        return fast_json_response(request, {'error': 'Invalid month format. Use YYYY-MM.'}, status=400)
+    except TotalUser.DoesNotExist:
+        return fast_json_response(request, {'month_year': None, 'results': []})
+    return fast_json_response(request, {
+        'month_year': month_year.strftime('%Y-%m'),
+        'results': compare_total_users(month_year),
+    })
+
+
+@login_required
+@shed_load('report', as_json=True)
+@use_replica
+def api_compare_transactions(request):
+    """Transaction count and amount per instrument, channel or location with
+    month-over-month and year-over-year changes"""
+    by = request.GET.get('by', 'instrument')
+    if by not in TRANSACTION_DIMENSIONS:
+        return fast_json_response(request, {'error': f"'by' must be one of {', '.join(TRANSACTION_DIMENSIONS)}."}, status=400)
+    try:
+        month_year = parse_month_param(request, TotalTransaction)
+    except ValueError:
+        return fast_json_response(request, {'error': 'Invalid month format. Use YYYY-MM.'}, status=400)
+    except TotalTransaction.DoesNotExist:
+        return fast_json_response(request, {'month_year': None, 'by': by, 'results': []})
+    return fast_json_response(request, {
+        'month_year': month_year.strftime('%Y-%m'),
+        'by': by,
+        'results': compare_total_transactions(month_year, by=by),
+    })
+
+
+@login_required
+@shed_load('report', as_json=True)
+@use_replica
+def api_branch_leaderboard(request):
+    """Top or bottom N branches by customers, share of total or month-over-month growth"""
+    metric = request.GET.get('metric', 'customers')
+    if metric not in LEADERBOARD_METRICS:
+        return fast_json_response(request, {'error': f"'metric' must be one of {', '.join(LEADERBOARD_METRICS)}."}, status=400)
+    order = request.GET.get('order', 'top')
+    if order not in ('top', 'bottom'):
+        return fast_json_response(request, {'error': "'order' must be 'top' or 'bottom'."}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), LEADERBOARD_MAX_LIMIT)
+    except ValueError:
+        return fast_json_response(request, {'error': "'limit' must be a number."}, status=400)
+
+    filters = {}
+    for name in LEADERBOARD_FILTERS:
+        value = request.GET.get(name)
+        if not value:
+            continue
+        if name == 'status':
+            value = value.upper()
+            if value not in ('ACTIVE', 'INACTIVE'):
+                return fast_json_response(request, {'error': "'status' must be ACTIVE or INACTIVE."}, status=400)
+        elif not value.isdigit():
+            return fast_json_response(request, {'error': f"'{name}' must be an id."}, status=400)
+        filters[name] = value
+
+    try:
+        month_year = parse_month_param(request, CustomerData)
+    except ValueError:
+        return fast_json_response(request, {'error': 'Invalid month format. Use YYYY-MM.'}, status=400)
+    except CustomerData.DoesNotExist:
+        return fast_json_response(request, {'month_year': None, 'metric': metric, 'order': order, 'results': []})
+    return fast_json_response(request, {
+        'month_year': month_year.strftime('%Y-%m'),
+        'metric': metric,
+        'order': order,
+        'results': branch_leaderboard(month_year, metric=metric, order=order, limit=limit, filters=filters),
+    })
+
+
+@login_required
+@shed_load('report_pack')
+def report_pack_download(request):
+    """Download the month's MIS report pack as one XLSX workbook or a zip of CSVs"""
+    file_format = request.GET.get('format', 'xlsx')
+    if file_format not in ('xlsx', 'zip'):
+        messages.error(request, "Report pack format must be 'xlsx' or 'zip'.")
+        return redirect('dashboard_home')
+    try:
+        month_year = parse_month_param(request, TotalUser)
+    except ValueError:
+        messages.error(request, 'Invalid month format. Use YYYY-MM.')
+        return redirect('dashboard_home')
+    except TotalUser.DoesNotExist:
+        messages.error(request, 'No data has been uploaded yet.')
+        return redirect('dashboard_home')
+
+    path = report_pack(month_year)[file_format]
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True,
+        filename=f"mis_report_{month_year:%Y-%m}.{file_format}",
+    )
+
+
 def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
@@ -326,12 +820,17 @@ def login_view(request):
         else:
             messages.error(request, 'Invalid username or password.')
     return render(request, 'login.html')  # your SB Admin login template
+
+
 @login_required
 def logout_view(request):
     from django.contrib.auth import logout
     logout(request)
     return redirect('login')
 
+
+@shed_load('report')
+@use_replica
 def total_user_list(request):
     status_filter = request.GET.get('status')
 
@@ -347,6 +846,10 @@ def total_user_list(request):
         'page_obj': page_obj,
         'status_filter': status_filter
     })
+
+
+@shed_load('report')
+@use_replica
 def total_transaction_list(request):
     transaction_type_filter = request.GET.get('transaction_type')
 
@@ -370,9 +873,13 @@ def total_transaction_list(request):
         'transaction_types': transaction_types
     })
 
+
+@shed_load('report')
+@use_replica
 def total_user_summary(request):
     fiscal_year = request.GET.get('fiscal_year')
     month_year = request.GET.get('month_year')
+    period = request.GET.get('period', 'month')
 
     queryset = TotalUser.objects.all()
 
@@ -389,10 +896,16 @@ def total_user_summary(request):
         except ValueError:
             pass  # invalid format, ignore filter or handle error as you want
 
+    if period in ('quarter', 'year'):
+        # User counts are a stock: a fiscal quarter/year reports its latest loaded month
+        period_fields = ['fiscal_year', 'fiscal_quarter'] if period == 'quarter' else ['fiscal_year']
+        period_ends = queryset.values(*period_fields).annotate(period_end=Max('month_year')).values('period_end')
+        queryset = queryset.filter(month_year__in=period_ends)
+
     # Group and aggregate count of active and inactive by service_type and month_year
     summary = (
         queryset
-        .values('service_type__service_name', 'month_year')
+        .values('service_type__service_name', 'fiscal_year', 'fiscal_quarter', 'month_year')
         .annotate(
             active_count=Sum('count', filter=models.Q(status='active')),
             inactive_count=Sum('count', filter=models.Q(status='inactive'))
@@ -408,10 +921,14 @@ def total_user_summary(request):
         'page_obj': page_obj,
         'fiscal_year': fiscal_year,
         'month_year': month_year,
+        'period': period,
     }
 
     return render(request, 'dashboard/total_user_summary.html', context)
 
+
+@shed_load('report')
+@use_replica
 def total_transaction_summary(request):
     # Filters from GET
     
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'dashboard',
 ]
 
@@ -88,6 +89,87 @@ DATABASES = {
     }
 }
 
+# Optional read replica for the dashboard and report views (see dashboard.routers)
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_REPLICA_NAME') or os.getenv('DB_NAME'),
+        'USER': os.getenv('DB_REPLICA_USER') or os.getenv('DB_USER'),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD') or os.getenv('DB_PASSWORD'),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT') or os.getenv('DB_PORT'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['dashboard.routers.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 30))
+REPLICA_MAX_LAG_SECONDS = int(os.getenv('REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+
+# Load shedding for heavy views (see dashboard.shedding): statement_timeout in
+# milliseconds and the number of concurrent requests per view in each process
+VIEW_BUDGETS = {
+    'report': {
+        'statement_timeout': int(os.getenv('REPORT_STATEMENT_TIMEOUT_MS', 5000)),
+        'max_concurrent': int(os.getenv('REPORT_MAX_CONCURRENT', 4)),
+    },
+    'upload': {
+        'statement_timeout': int(os.getenv('UPLOAD_STATEMENT_TIMEOUT_MS', 300000)),
+        'max_concurrent': int(os.getenv('UPLOAD_MAX_CONCURRENT', 2)),
+    },
+    'report_pack': {
+        'statement_timeout': int(os.getenv('REPORT_PACK_STATEMENT_TIMEOUT_MS', 60000)),
+        'max_concurrent': int(os.getenv('REPORT_PACK_MAX_CONCURRENT', 2)),
+    },
+}
+LOAD_SHED_RETRY_AFTER = 5
+# Live-refresh streams (dashboard.events) served at once per process; each
+# holds a server thread, so keep this well below the worker thread count
+EVENT_STREAMS_MAX_CONCURRENT = int(os.getenv('EVENT_STREAMS_MAX_CONCURRENT', 20))
+
+# Authenticated requests without auth/session queries: sessions are read from
+# the cache with the database as fallback, users come from a per-process
+# cache (dashboard.auth) and messages travel in a cookie. FAST_AUTH=false
+# restores Django's database sessions and uncached users.
+FAST_AUTH = os.getenv('FAST_AUTH', 'true').lower() != 'false'
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+if FAST_AUTH:
+    SESSION_ENGINE = 'dashboard.sessions'
+    AUTHENTICATION_BACKENDS = ['dashboard.auth.CachedModelBackend']
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+# Seconds a cached session lives in the cache before it is re-read from the
+# database. Without a shared cache (REDIS_URL) each process has its own, so
+# this bounds how long a logout takes to reach the other processes.
+SESSION_CACHE_MAX_AGE = int(os.getenv('SESSION_CACHE_MAX_AGE', 0 if os.getenv('REDIS_URL') else 60))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))
+
+# Superseded month snapshots are kept this long for rollback (see prune_snapshots)
+SNAPSHOT_RETENTION_DAYS = int(os.getenv('SNAPSHOT_RETENTION_DAYS', 30))
+
+# Column-mapping profiles offered on the upload page, one per source system:
+# data type -> {column name: that system's header}, overriding the standard
+# headers in dashboard.uploads.UPLOAD_COLUMNS
+UPLOAD_PROFILES = {
+    'default': {},
+    # Exports whose customer columns are shifted, as in sample_customer_data.csv:
+    # "Mobile Banking" holds the branch name, "Branch name" the category and
+    # "Categorization of customers" the service type
+    'shifted_customer_columns': {
+        'CUSTOMER': {
+            'branch_name': 'Mobile Banking',
+            'customer_category': 'Branch name',
+            'service_type': 'Categorization of customers',
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators